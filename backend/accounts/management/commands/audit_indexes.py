@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connection
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the main query of every API viewset and flag full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose querysets are explained (defaults to the first user)')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the full plan for every query')
+        parser.add_argument('--fail-on-scan', action='store_true', help='Exit with an error if any full scan is found')
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User '{username}' does not exist")
+        # Plans do not depend on the user existing
+        return User.objects.order_by('id').first() or User(id=0)
+
+    def viewset_querysets(self, user):
+        from finance_tracker.api_urls import router
+
+        factory = APIRequestFactory()
+        for prefix, viewset, basename in router.registry:
+            request = Request(factory.get(f'/api/{prefix}/'))
+            request.user = user
+            view = viewset(request=request, action='list', kwargs={}, format_kwarg=None)
+            yield f'{prefix} (list)', view.get_queryset()[:api_settings.PAGE_SIZE]
+
+        from categories.models import BudgetAlert
+        yield 'budget-alerts (unread)', BudgetAlert.objects.filter(budget__user=user, is_read=False)
+
+    def full_scans(self, plan):
+        """Plan lines that read a whole table"""
+        if connection.vendor == 'postgresql':
+            return [line.strip() for line in plan.splitlines() if 'Seq Scan' in line]
+        if connection.vendor == 'sqlite':
+            return [
+                line.strip() for line in plan.splitlines()
+                if ' SCAN ' in f' {line} ' and 'COVERING INDEX' not in line
+            ]
+        return [line.strip() for line in plan.splitlines() if 'ALL' in line.split()]
+
+    def sorts(self, plan):
+        """Plan lines that sort rows outside an index"""
+        markers = ('TEMP B-TREE', 'Sort Key', 'Using filesort')
+        return [line.strip() for line in plan.splitlines() if any(marker in line for marker in markers)]
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        self.stdout.write(f"Explaining API querysets on {connection.vendor}\n")
+
+        flagged = 0
+        for label, queryset in self.viewset_querysets(user):
+            plan = queryset.explain()
+            scans = self.full_scans(plan)
+            if scans:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f"SCAN  {label}"))
+                for line in scans:
+                    self.stdout.write(f"        {line}")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"OK    {label}"))
+            for line in self.sorts(plan):
+                self.stdout.write(f"        sort: {line}")
+            if options['verbose_plans']:
+                for line in plan.splitlines():
+                    self.stdout.write(f"        | {line}")
+
+        self.stdout.write(f"\n{flagged} queryset(s) with full table scans")
+        if connection.vendor == 'postgresql':
+            self.stdout.write("Note: the planner prefers sequential scans on small tables; audit against production-sized data.")
+        if flagged and options['fail_on_scan']:
+            raise CommandError(f"{flagged} queryset(s) use full table scans")
@@ -0,0 +1,79 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from accounts.models import USAccount, KenyaAccount, AccountBalanceSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Fill in missing daily balance snapshots, carrying balances over days without changes (run daily from a scheduler)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day to fill (YYYY-MM-DD); defaults to 31 days before --date')
+        parser.add_argument('--date', help='Fill up to this day (YYYY-MM-DD) instead of today')
+        parser.add_argument('--batch-size', type=int, default=500, help='Accounts per batch')
+
+    def parse_date(self, value, name):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'--{name} must be YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        today = self.parse_date(options['date'], 'date') if options['date'] else timezone.now().date()
+        since = self.parse_date(options['since'], 'since') if options['since'] else today - timedelta(days=31)
+        if since > today:
+            raise CommandError('--since must not be after --date')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        created = 0
+        for model in (USAccount, KenyaAccount):
+            last_id = 0
+            while True:
+                account_ids = list(
+                    model.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:options['batch_size']]
+                )
+                if not account_ids:
+                    break
+                last_id = account_ids[-1]
+                with transaction.atomic():
+                    created += self.fill(model, account_ids, since, today)
+
+        self.stdout.write(self.style.SUCCESS(f"Created {created} balance snapshots from {since} to {today}"))
+
+    def fill(self, model, account_ids, since, today):
+        """Write the missing days for a batch of accounts of one type"""
+        field = AccountBalanceSnapshot.ACCOUNT_FIELDS[model]
+        snapshots = AccountBalanceSnapshot.objects.filter(**{f'{field}_id__in': account_ids})
+
+        # Balance carried into the window, and the live balance for today
+        accounts = model.objects.filter(id__in=account_ids).annotate(
+            carried=Subquery(
+                AccountBalanceSnapshot.objects.filter(
+                    **{field: OuterRef('pk')}, date__lt=since
+                ).order_by('-date').values('balance')[:1]
+            )
+        ).values_list('id', 'carried', model.balance_field)
+
+        known = {}
+        for account_id, day, balance in snapshots.filter(date__gte=since, date__lte=today).values_list(f'{field}_id', 'date', 'balance'):
+            known.setdefault(account_id, {})[day] = balance
+
+        missing = []
+        for account_id, balance, live_balance in accounts:
+            days = known.get(account_id, {})
+            day = since
+            while day <= today:
+                if day in days:
+                    balance = days[day]
+                elif day == today:
+                    missing.append(AccountBalanceSnapshot(**{f'{field}_id': account_id}, date=day, balance=live_balance))
+                elif balance is not None:
+                    missing.append(AccountBalanceSnapshot(**{f'{field}_id': account_id}, date=day, balance=balance))
+                day += timedelta(days=1)
+
+        # Rows recorded by a concurrent save() win over filled-in ones
+        AccountBalanceSnapshot.objects.bulk_create(missing, batch_size=1000, ignore_conflicts=True)
+        return len(missing)
@@ -1,5 +1,7 @@
-from django.db import models
+from datetime import timedelta
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class USAccount(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='us_accounts')
@@ -9,8 +11,17 @@ class USAccount(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    balance_field = 'balance'
+    
     def __str__(self):
         return f"{self.account_name} - ${self.balance}"
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = USAccount.objects.filter(pk=self.pk).values_list('balance', flat=True).first() if self.pk else None
+            super().save(*args, **kwargs)
+            if previous is None or previous != self.balance:
+                AccountBalanceSnapshot.record([self])
 
 class KenyaAccount(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='kenya_accounts')
@@ -20,5 +31,100 @@ class KenyaAccount(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    balance_field = 'balance_kes'
+    
     def __str__(self):
-        return f"{self.account_name} - KES {self.balance_kes}"
\ No newline at end of file
+        return f"{self.account_name} - KES {self.balance_kes}"
+    
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = KenyaAccount.objects.filter(pk=self.pk).values_list('balance_kes', flat=True).first() if self.pk else None
+            super().save(*args, **kwargs)
+            if previous is None or previous != self.balance_kes:
+                AccountBalanceSnapshot.record([self])
+
+
+class AccountBalanceSnapshot(models.Model):
+    """
+    End-of-day balance of one account (a USAccount or a KenyaAccount).
+
+    Written by account save() whenever the balance changes, and by
+    record_accounts() after bulk F() updates; the snapshot_balances command
+    fills the days in between so a balance on any date is a single row.
+    """
+    us_account = models.ForeignKey(USAccount, on_delete=models.CASCADE, null=True, blank=True, related_name='balance_snapshots')
+    kenya_account = models.ForeignKey(KenyaAccount, on_delete=models.CASCADE, null=True, blank=True, related_name='balance_snapshots')
+    date = models.DateField()
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    
+    ACCOUNT_FIELDS = {USAccount: 'us_account', KenyaAccount: 'kenya_account'}
+    
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            # NULLs never conflict, so each constraint only covers its own account type
+            models.UniqueConstraint(fields=['us_account', 'date'], name='unique_us_account_snapshot'),
+            models.UniqueConstraint(fields=['kenya_account', 'date'], name='unique_kenya_account_snapshot'),
+            models.CheckConstraint(
+                check=models.Q(us_account__isnull=False, kenya_account__isnull=True) |
+                      models.Q(us_account__isnull=True, kenya_account__isnull=False),
+                name='snapshot_has_one_account'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.us_account_id or self.kenya_account_id} on {self.date}: {self.balance}"
+    
+    @classmethod
+    def record(cls, accounts, on=None):
+        """Upsert the in-memory balance of each account as its snapshot for the day"""
+        on = on or timezone.now().date()
+        by_field = {}
+        for account in accounts:
+            field = cls.ACCOUNT_FIELDS[type(account)]
+            by_field.setdefault(field, []).append(
+                cls(**{field: account}, date=on, balance=getattr(account, account.balance_field))
+            )
+        for field, snapshots in by_field.items():
+            cls.objects.bulk_create(
+                snapshots,
+                update_conflicts=True,
+                unique_fields=[field, 'date'],
+                update_fields=['balance']
+            )
+    
+    @classmethod
+    def record_accounts(cls, us_account_ids=(), kenya_account_ids=(), on=None):
+        """Snapshot balances as stored in the database, e.g. after F() updates"""
+        accounts = []
+        if us_account_ids:
+            accounts += USAccount.objects.filter(id__in=us_account_ids).only('id', 'balance')
+        if kenya_account_ids:
+            accounts += KenyaAccount.objects.filter(id__in=kenya_account_ids).only('id', 'balance_kes')
+        cls.record(accounts, on=on)
+    
+    @classmethod
+    def balance_on(cls, account, day):
+        """End-of-day balance on day, or None if the account has no snapshot by then"""
+        field = cls.ACCOUNT_FIELDS[type(account)]
+        return cls.objects.filter(**{field: account}, date__lte=day).order_by('-date').values_list('balance', flat=True).first()
+    
+    @classmethod
+    def series(cls, account, start, end):
+        """
+        [(date, balance)] for every day from start to end, carrying the last
+        known balance forward; None before the account's first snapshot.
+        Two indexed queries, whatever the length of the history.
+        """
+        field = cls.ACCOUNT_FIELDS[type(account)]
+        snapshots = cls.objects.filter(**{field: account})
+        balance = snapshots.filter(date__lt=start).order_by('-date').values_list('balance', flat=True).first()
+        known = dict(snapshots.filter(date__gte=start, date__lte=end).values_list('date', 'balance'))
+        
+        series = []
+        day = start
+        while day <= end:
+            balance = known.get(day, balance)
+            series.append((day, balance))
+            day += timedelta(days=1)
+        return series
@@ -1,3 +1,171 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
 from django.test import TestCase
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from decimal import Decimal
+from income.models import Income
+from money_transfer.models import MoneyTransfer
+from transaction.models import Transaction
+from .models import USAccount, KenyaAccount, AccountBalanceSnapshot
+from .views import USAccountViewSet
 
-# Create your tests here.
+class AuditIndexesTestCase(TestCase):
+    def test_ledger_lists_use_indexes(self):
+        out = StringIO()
+        call_command('audit_indexes', stdout=out)
+        output = out.getvalue()
+        for label in ('expenses (list)', 'incomes (list)', 'transactions (list)', 'money-transfers (list)'):
+            self.assertIn(f'OK    {label}', output)
+
+
+class BalanceSnapshotTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.today = date.today()
+        self.checking = USAccount.objects.create(user=self.user, account_name='Checking', balance=1000)
+        self.mpesa = KenyaAccount.objects.create(user=self.user, account_name='M-Pesa', balance_kes=0)
+
+    def snapshots(self, account):
+        return list(account.balance_snapshots.values_list('date', 'balance'))
+
+    def test_balance_changes_are_snapshotted(self):
+        self.assertEqual(self.snapshots(self.checking), [(self.today, 1000)])
+
+        transfer = MoneyTransfer.objects.create(
+            user=self.user, from_us_account=self.checking, to_kenya_account=self.mpesa,
+            amount=100, exchange_rate=130, scheduled_date=self.today
+        )
+        transfer.complete_transfer()
+        self.assertEqual(self.snapshots(self.checking), [(self.today, 900)])
+        self.assertEqual(self.snapshots(self.mpesa), [(self.today, 13000)])
+
+        # Saves that leave the balance alone do not write
+        self.checking.account_name = 'Main'
+        with mock.patch.object(AccountBalanceSnapshot, 'record') as record:
+            self.checking.save()
+        record.assert_not_called()
+
+    def test_catch_up_fills_gaps_and_history_endpoint(self):
+        start = self.today - timedelta(days=5)
+        AccountBalanceSnapshot.objects.filter(us_account=self.checking).update(date=start)
+        AccountBalanceSnapshot.objects.create(us_account=self.checking, date=start + timedelta(days=2), balance=800)
+        USAccount.objects.filter(pk=self.checking.pk).update(balance=750)
+        AccountBalanceSnapshot.objects.filter(kenya_account=self.mpesa).delete()
+
+        call_command('snapshot_balances', '--since', str(start), stdout=StringIO())
+        self.assertEqual(
+            [balance for _, balance in self.snapshots(self.checking)],
+            [1000, 1000, 800, 800, 800, 750]
+        )
+        self.assertEqual(self.snapshots(self.mpesa), [(self.today, 0)])
+        self.assertEqual(AccountBalanceSnapshot.balance_on(self.checking, start + timedelta(days=3)), 800)
+
+        # Running again writes nothing
+        out = StringIO()
+        call_command('snapshot_balances', '--since', str(start), stdout=out)
+        self.assertIn('Created 0 balance snapshots', out.getvalue())
+
+        response = self.client.get(
+            f'/api/us-accounts/{self.checking.id}/balance_history/?start={start - timedelta(days=1)}&end={start + timedelta(days=2)}'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['balance'] for row in response.data['balances']], [None, 1000, 1000, 800])
+
+        response = self.client.get(f'/api/kenya-accounts/{self.mpesa.id}/balance_history/?start=yesterday')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AccountStatementTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        with self.at(date(2024, 3, 1), 8):
+            self.checking = USAccount.objects.create(user=self.user, account_name='Checking', balance=1000)
+            self.mpesa = KenyaAccount.objects.create(user=self.user, account_name='M-Pesa', balance_kes=13000)
+        for day in range(1, 5):
+            on = date(2024, 3, day)
+            with self.at(on, 9):
+                Income.objects.create(user=self.user, source=f'Salary {day}', amount=100, date=on, us_account=self.checking, status='deposited')
+                Transaction.objects.create(
+                    user=self.user, transaction_type='expense', amount=30, date=on,
+                    description=f'Groceries {day}', us_account=self.checking
+                )
+        with self.at(date(2024, 3, 2), 9):
+            # Not on the statement: pending income, another account's transaction
+            Income.objects.create(user=self.user, source='Bonus', amount=500, date=date(2024, 3, 2), us_account=self.checking)
+            Transaction.objects.create(user=self.user, transaction_type='income', amount=7, date=date(2024, 3, 2), description='Other', currency='KES', kenya_account=self.mpesa)
+        # The second transfer completes two days after it was scheduled
+        for source, target, amount, scheduled, completed in [
+            ({'from_us_account': self.checking}, {'to_kenya_account': self.mpesa}, 50, date(2024, 3, 3), date(2024, 3, 3)),
+            ({'from_kenya_account': self.mpesa}, {'to_us_account': self.checking}, 1300, date(2024, 3, 2), date(2024, 3, 4)),
+        ]:
+            with self.at(completed, 12):
+                MoneyTransfer.objects.create(user=self.user, amount=amount, exchange_rate=130, scheduled_date=scheduled, **source, **target).complete_transfer()
+
+    @staticmethod
+    def at(day, hour):
+        return mock.patch('django.utils.timezone.now', return_value=datetime(day.year, day.month, day.day, hour, tzinfo=dt_timezone.utc))
+
+    def statement(self, query=''):
+        lines = []
+        url = f'/api/us-accounts/{self.checking.id}/statement/{query}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            lines.extend(response.data['results'])
+            url = response.data['next']
+        return lines
+
+    def test_running_balance(self):
+        lines = self.statement()
+        self.assertEqual(len(lines), 10)
+        self.assertEqual([line['date'] for line in lines], sorted(line['date'] for line in lines))
+        self.assertEqual(
+            [(line['type'], line['amount'], line['memo']) for line in lines if line['date'] == date(2024, 3, 4)],
+            [('income', 100, True), ('transaction', -30, True), ('transfer', 10, False)]
+        )
+        opening = self.client.get(f'/api/us-accounts/{self.checking.id}/statement/').data['opening_balance']
+        self.assertEqual(opening, Decimal('1000.00'))
+        # Only transfers move the balance
+        running = opening
+        for line in lines:
+            if not line['memo']:
+                running += line['amount']
+            self.assertEqual(line['balance'], running)
+
+        # The statement closes at the account's balance
+        self.checking.refresh_from_db()
+        self.assertEqual(lines[-1]['balance'], self.checking.balance)
+        self.mpesa.refresh_from_db()
+        kenya_lines = self.client.get(f'/api/kenya-accounts/{self.mpesa.id}/statement/').data['results']
+        self.assertEqual(kenya_lines[-1]['balance'], self.mpesa.balance_kes)
+
+    def test_balances_match_balance_history(self):
+        end_of_day = {line['date']: line['balance'] for line in self.statement()}
+        response = self.client.get(f'/api/us-accounts/{self.checking.id}/balance_history/?start=2024-03-01&end=2024-03-04')
+        history = {row['date']: row['balance'] for row in response.data['balances']}
+        self.assertEqual(end_of_day, history)
+        self.assertEqual(history[date(2024, 3, 3)], Decimal('950.00'))
+
+    def test_pages_and_start_date(self):
+        lines = self.statement()
+        with mock.patch.object(USAccountViewSet, 'statement_page_size', 3):
+            self.assertEqual(self.statement(), lines)
+
+            response = self.client.get(f'/api/us-accounts/{self.checking.id}/statement/')
+            with self.assertNumQueries(2):
+                self.client.get(response.data['next'])
+
+            from_third = self.statement('?start=2024-03-03')
+        self.assertEqual(from_third, lines[4:])
+
+        self.assertEqual(self.client.get(f'/api/us-accounts/{self.checking.id}/statement/?cursor=abc').status_code, status.HTTP_404_NOT_FOUND)
+        kenya_lines = self.client.get(f'/api/kenya-accounts/{self.mpesa.id}/statement/').data['results']
+        self.assertEqual([line['amount'] for line in kenya_lines], [7, 6500, -1300])
@@ -0,0 +1,198 @@
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, F, Sum, Value, Case, When, CharField, DecimalField, DateField, DateTimeField
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import AccountBalanceSnapshot
+
+AMOUNT = DecimalField(max_digits=14, decimal_places=2)
+
+
+class AccountStatement:
+    """
+    Chronological statement of one account: deposited incomes, transactions
+    and completed money transfers touching it, with a running balance.
+
+    A page is one SQL query: per source the next page_size + 1 lines after
+    the cursor (an index range scan on account and date), combined with
+    UNION ALL, and a SUM() OVER window adding up the amounts on top of the
+    balance carried in the cursor. A first page costs one SUM for the
+    opening balance. Lines are ordered by (date, time, type, id), which is
+    unique across sources; the time is created_at for incomes and
+    transactions and completed_at for transfers.
+
+    Only completed transfers move an account's balance, so they are the
+    only lines the running balance adds up. Transfers are dated by the
+    (UTC) day they completed, the day their balance snapshot is recorded,
+    and incomes and transactions are memo lines. The opening balance is
+    the current balance less the transfers from the start on, so the
+    statement closes at the account balance and agrees with the daily
+    snapshots.
+    """
+
+    TYPES = ('income', 'transaction', 'transfer')
+    COLUMNS = ('type', 'id', 'date', 'created_at', 'description', 'amount')
+    BALANCE_TYPES = ('transfer',)
+
+    def __init__(self, account):
+        self.account = account
+        self.field = AccountBalanceSnapshot.ACCOUNT_FIELDS[type(account)]
+
+    def sources(self):
+        """
+        type -> (date field, time field, queryset, column expressions); a
+        None date field dates lines by the UTC day of the time field
+        """
+        from income.models import Income
+        from money_transfer.models import MoneyTransfer
+        from transaction.models import Transaction
+
+        field = self.field
+        net = F('amount') - F('fee')
+        if field == 'us_account':
+            converted = Case(When(from_kenya_account__isnull=False, then=net / F('exchange_rate')), default=net, output_field=AMOUNT)
+        else:
+            converted = Case(When(from_us_account__isnull=False, then=net * F('exchange_rate')), default=net, output_field=AMOUNT)
+
+        return {
+            'income': ('date', 'created_at', Income.objects.filter(**{field: self.account}, status='deposited'), {
+                'description': F('source'),
+                'amount': F('amount'),
+            }),
+            'transaction': ('date', 'created_at', Transaction.objects.filter(**{field: self.account}), {
+                'description': F('description'),
+                'amount': Case(When(transaction_type='income', then=F('amount')), default=-F('amount'), output_field=AMOUNT),
+            }),
+            'transfer': (None, 'completed_at', MoneyTransfer.objects.filter(
+                Q(**{f'from_{field}': self.account}) | Q(**{f'to_{field}': self.account}),
+                status='completed', completed_at__isnull=False
+            ), {
+                'description': F('notes'),
+                'amount': (
+                    Case(When(**{f'from_{field}': self.account}, then=-F('amount')), default=Value(0), output_field=AMOUNT) +
+                    Case(When(**{f'to_{field}': self.account}, then=converted), default=Value(0), output_field=AMOUNT)
+                ),
+            }),
+        }
+
+    @staticmethod
+    def date_filter(date_field, time_field, lookup, day):
+        """Q for the line date <lookup> day, as a range on the time field when lines are dated by it"""
+        if date_field:
+            return Q(**{date_field if lookup == 'exact' else f'{date_field}__{lookup}': day})
+        day_start = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+        day_end = day_start + timedelta(days=1)
+        return {
+            'gt': Q(**{f'{time_field}__gte': day_end}),
+            'gte': Q(**{f'{time_field}__gte': day_start}),
+            'lt': Q(**{f'{time_field}__lt': day_start}),
+            'exact': Q(**{f'{time_field}__gte': day_start, f'{time_field}__lt': day_end}),
+        }[lookup]
+
+    @classmethod
+    def position_filter(cls, name, date_field, time_field, cursor):
+        """Lines of this source strictly after the cursor in statement order"""
+        cursor_date, cursor_time, cursor_type, cursor_id = cursor
+        on_day = cls.date_filter(date_field, time_field, 'exact', cursor_date)
+        after = cls.date_filter(date_field, time_field, 'gt', cursor_date) | (on_day & Q(**{f'{time_field}__gt': cursor_time}))
+        same_time = on_day & Q(**{time_field: cursor_time})
+        if name > cursor_type:
+            return after | same_time
+        if name == cursor_type:
+            return after | (same_time & Q(id__gt=cursor_id))
+        return after
+
+    def line_queryset(self, name, date_field, time_field, queryset, columns):
+        columns = {
+            'type': Value(name, output_field=CharField()),
+            'id': F('id'),
+            'date': F(date_field) if date_field else TruncDate(time_field, tzinfo=dt_timezone.utc),
+            'created_at': F(time_field),
+            **columns,
+        }
+        return queryset.annotate(
+            **{f'line_{column}': expression for column, expression in columns.items()}
+        ).values(*[f'line_{column}' for column in self.COLUMNS])
+
+    def opening_balance(self, start=None):
+        """Balance before the first line dated start or later (before every line without start)"""
+        total = Decimal('0')
+        for name, (date_field, time_field, queryset, columns) in self.sources().items():
+            if name not in self.BALANCE_TYPES:
+                continue
+            if start:
+                queryset = queryset.filter(self.date_filter(date_field, time_field, 'gte', start))
+            total += queryset.aggregate(total=Sum(columns['amount']))['total'] or 0
+        balance = getattr(self.account, self.account.balance_field)
+        return (Decimal(str(balance)) - Decimal(str(total))).quantize(Decimal('0.01'))
+
+    def page(self, cursor=None, start=None, size=50):
+        """
+        The balance before the page, up to size lines after cursor (or from
+        start) each with its running balance, and the cursor for the next
+        page (or None). A cursor is (date, created_at, type, id, running
+        balance) of the last line.
+        """
+        if cursor:
+            position, opening = cursor[:4], Decimal(cursor[4])
+        else:
+            position, opening = None, self.opening_balance(start)
+
+        select = ', '.join(f'line_{column}' for column in self.COLUMNS)
+        legs = []
+        params = []
+        for name, (date_field, time_field, queryset, columns) in self.sources().items():
+            if position:
+                queryset = queryset.filter(self.position_filter(name, date_field, time_field, position))
+            elif start:
+                queryset = queryset.filter(self.date_filter(date_field, time_field, 'gte', start))
+            # A source dated by its time field is in date order when in time order
+            ordering = [date_field] if date_field else []
+            queryset = self.line_queryset(name, date_field, time_field, queryset, columns).order_by(*ordering, time_field, 'id')[:size + 1]
+            sql, leg_params = queryset.query.sql_with_params()
+            legs.append(f'SELECT {select} FROM ({sql}) AS {name}_lines')
+            params.extend(leg_params)
+
+        # The ORM cannot put a window over a UNION, so the legs it compiled
+        # are combined here
+        order = 'line_date, line_created_at, line_type, line_id'
+        balance_types = ', '.join(['%s'] * len(self.BALANCE_TYPES))
+        sql = (
+            f'SELECT {select}, SUM(CASE WHEN line_type IN ({balance_types}) THEN line_amount ELSE 0 END) '
+            f'OVER (ORDER BY {order} ROWS UNBOUNDED PRECEDING) '
+            f'FROM ({" UNION ALL ".join(legs)}) AS statement_lines ORDER BY {order} LIMIT %s'
+        )
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, list(self.BALANCE_TYPES) + params + [size + 1])
+            rows = db_cursor.fetchall()
+
+        lines = []
+        for *values, running_total in rows[:size]:
+            line = dict(zip(self.COLUMNS, values))
+            line['date'] = self.to_date(line['date'])
+            line['created_at'] = self.to_datetime(line['created_at'])
+            line['amount'] = Decimal(str(line['amount'])).quantize(Decimal('0.01'))
+            line['memo'] = line['type'] not in self.BALANCE_TYPES
+            line['balance'] = (opening + Decimal(str(running_total))).quantize(Decimal('0.01'))
+            lines.append(line)
+
+        next_cursor = None
+        if len(rows) > size:
+            last = lines[-1]
+            next_cursor = [last['date'].isoformat(), last['created_at'].isoformat(), last['type'], last['id'], str(last['balance'])]
+        return opening, lines, next_cursor
+
+    @staticmethod
+    def to_date(value):
+        # Raw cursors skip the ORM converters, and SQLite returns text
+        return value if isinstance(value, date) else DateField().to_python(value)
+
+    @staticmethod
+    def to_datetime(value):
+        if not isinstance(value, datetime):
+            value = DateTimeField().to_python(value)
+        if settings.USE_TZ and timezone.is_naive(value):
+            value = timezone.make_aware(value, dt_timezone.utc)
+        return value
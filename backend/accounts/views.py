@@ -3,10 +3,88 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import USAccount, KenyaAccount
+from rest_framework.exceptions import NotFound
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from finance_tracker.pagination import encode_cursor, decode_cursor
+from .models import USAccount, KenyaAccount, AccountBalanceSnapshot
 from .serializers import USAccountSerializer, KenyaAccountSerializer
+from .utils import AccountStatement
 
-class USAccountViewSet(viewsets.ModelViewSet):
+def parse_date_param(request, name):
+    """Optional YYYY-MM-DD query param; ValueError if present but invalid"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+class BalanceHistoryMixin:
+    """Adds GET <detail>/balance_history/ reading the daily balance snapshots"""
+    DEFAULT_HISTORY_DAYS = 30
+    MAX_HISTORY_DAYS = 3 * 366
+    
+    @action(detail=True, methods=['get'])
+    def balance_history(self, request, pk=None):
+        """End-of-day balances for every day from start to end (YYYY-MM-DD)"""
+        account = self.get_object()
+        try:
+            end = parse_date_param(request, 'end') or timezone.now().date()
+            start = parse_date_param(request, 'start') or end - timedelta(days=self.DEFAULT_HISTORY_DAYS)
+        except ValueError:
+            return Response({'error': 'Dates must be valid YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({'error': 'start must not be after end'}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days > self.MAX_HISTORY_DAYS:
+            return Response({'error': f'At most {self.MAX_HISTORY_DAYS} days per request'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        series = AccountBalanceSnapshot.series(account, start, end)
+        return Response({
+            'account': account.id,
+            'start': start,
+            'end': end,
+            'balances': [{'date': day, 'balance': balance} for day, balance in series],
+        })
+
+class StatementMixin:
+    """Adds GET <detail>/statement/, the account's lines with a running balance"""
+    statement_page_size = api_settings.PAGE_SIZE
+    
+    def parse_statement_cursor(self, value):
+        try:
+            cursor_date, cursor_created, cursor_type, cursor_id, balance = decode_cursor(value)
+            cursor = [parse_date(cursor_date), parse_datetime(cursor_created), cursor_type, int(cursor_id), Decimal(balance)]
+        except (TypeError, ValueError, InvalidOperation):
+            raise NotFound('Invalid cursor')
+        if None in cursor or cursor_type not in AccountStatement.TYPES:
+            raise NotFound('Invalid cursor')
+        return cursor
+    
+    @action(detail=True, methods=['get'])
+    def statement(self, request, pk=None):
+        """Lines oldest first, from ?start=YYYY-MM-DD or a ?cursor= link"""
+        account = self.get_object()
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            cursor = self.parse_statement_cursor(cursor)
+        try:
+            start = parse_date_param(request, 'start')
+        except ValueError:
+            return Response({'error': 'start must be a valid YYYY-MM-DD date'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        opening, lines, next_cursor = AccountStatement(account).page(cursor=cursor, start=start, size=self.statement_page_size)
+        next_link = None
+        if next_cursor:
+            next_link = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(next_cursor))
+        return Response({'account': account.id, 'opening_balance': opening, 'next': next_link, 'results': lines})
+
+class USAccountViewSet(BalanceHistoryMixin, StatementMixin, viewsets.ModelViewSet):
     serializer_class = USAccountSerializer
     permission_classes = [IsAuthenticated]
     
@@ -16,7 +94,7 @@ class USAccountViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class KenyaAccountViewSet(viewsets.ModelViewSet):
+class KenyaAccountViewSet(BalanceHistoryMixin, StatementMixin, viewsets.ModelViewSet):
     serializer_class = KenyaAccountSerializer
     permission_classes = [IsAuthenticated]
     
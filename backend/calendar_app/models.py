@@ -46,6 +46,10 @@ class CalendarEvent(models.Model):
     
     class Meta:
         ordering = ['date', 'time']
+        indexes = [
+            models.Index(fields=['user', 'date', 'time'], name='event_user_date_idx'),
+            models.Index(fields=['user', 'is_recurring', 'date'], name='event_user_recurring_idx'),
+        ]
     
     def get_occurrences(self, start_date, end_date):
         """Get all occurrences of this event between start_date and end_date"""
@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from .models import Category, Budget, BudgetAlert
+from .utils import BudgetEvaluator
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -14,13 +16,23 @@ class CategoryAdmin(admin.ModelAdmin):
             return qs
         return qs.filter(user=request.user)
 
+class BudgetChangeList(ChangeList):
+    def get_results(self, request):
+        super().get_results(request)
+        # Compute spend for the whole page in one query
+        self.result_list = BudgetEvaluator.evaluate(self.result_list)
+
 @admin.register(Budget)
 class BudgetAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'amount', 'period', 'spent_percentage', 'is_active', 'user']
     list_filter = ['period', 'is_active', 'created_at']
+    list_select_related = ['category', 'user']
     search_fields = ['name', 'notes']
     date_hierarchy = 'start_date'
     
+    def get_changelist(self, request, **kwargs):
+        return BudgetChangeList
+    
     def spent_percentage(self, obj):
         return f"{obj.spent_percentage}%"
     spent_percentage.short_description = 'Spent %'
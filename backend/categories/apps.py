@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 class CategoriesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'categories'
\ No newline at end of file
+    name = 'categories'
+    
+    def ready(self):
+        # User is not ours to subclass, so new users are seeded from post_save
+        from . import signals  # noqa: F401
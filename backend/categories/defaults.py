@@ -0,0 +1,22 @@
+# Categories provisioned for new users. Point settings.DEFAULT_CATEGORY_TEMPLATE
+# at another list of dicts with the same keys to change them.
+DEFAULT_CATEGORIES = [
+    # Expense categories
+    {'name': 'Food & Dining', 'category_type': 'expense', 'icon': 'Restaurant', 'color': '#FF5722'},
+    {'name': 'Transportation', 'category_type': 'expense', 'icon': 'DirectionsCar', 'color': '#795548'},
+    {'name': 'Shopping', 'category_type': 'expense', 'icon': 'ShoppingCart', 'color': '#E91E63'},
+    {'name': 'Entertainment', 'category_type': 'expense', 'icon': 'Movie', 'color': '#9C27B0'},
+    {'name': 'Bills & Utilities', 'category_type': 'expense', 'icon': 'Receipt', 'color': '#3F51B5'},
+    {'name': 'Healthcare', 'category_type': 'expense', 'icon': 'LocalHospital', 'color': '#00BCD4'},
+    {'name': 'Education', 'category_type': 'expense', 'icon': 'School', 'color': '#009688'},
+    {'name': 'Personal Care', 'category_type': 'expense', 'icon': 'Spa', 'color': '#4CAF50'},
+    {'name': 'Rent/Mortgage', 'category_type': 'expense', 'icon': 'Home', 'color': '#FF9800'},
+    {'name': 'Insurance', 'category_type': 'expense', 'icon': 'Security', 'color': '#607D8B'},
+    
+    # Income categories
+    {'name': 'Salary', 'category_type': 'income', 'icon': 'Work', 'color': '#4CAF50'},
+    {'name': 'Freelance', 'category_type': 'income', 'icon': 'Computer', 'color': '#2196F3'},
+    {'name': 'Investment', 'category_type': 'income', 'icon': 'TrendingUp', 'color': '#FF9800'},
+    {'name': 'Business', 'category_type': 'income', 'icon': 'Business', 'color': '#9C27B0'},
+    {'name': 'Other Income', 'category_type': 'income', 'icon': 'AttachMoney', 'color': '#607D8B'},
+]
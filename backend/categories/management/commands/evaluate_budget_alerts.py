@@ -0,0 +1,76 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connections
+from categories.models import Budget
+from categories.tasks import evaluate_alerts_for_users
+
+
+def init_worker():
+    import django
+    django.setup()
+    # Never share the parent's database connections with a forked worker
+    connections.close_all()
+
+
+def evaluate_chunk(user_ids, today):
+    return len(user_ids), *evaluate_alerts_for_users(user_ids, today=today)
+
+
+class Command(BaseCommand):
+    help = 'Evaluate every active budget of every user and create the alerts that are due (run from a scheduler)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Users per chunk')
+        parser.add_argument('--workers', type=int, default=1, help='Spread chunks across this many processes')
+        parser.add_argument('--date', help='Evaluate as of this date (YYYY-MM-DD) instead of today')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        today = None
+        if options['date']:
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be positive')
+
+        started = time.monotonic()
+        chunks = self.user_chunks(options['chunk_size'], today)
+        totals = [0, 0, 0]
+
+        if options['workers'] == 1:
+            results = (evaluate_chunk(user_ids, today) for user_ids in chunks)
+            self.collect(results, totals)
+        else:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as pool:
+                self.collect(pool.map(evaluate_chunk, chunks, [today] * len(chunks)), totals)
+
+        users, budgets, alerts = totals
+        elapsed = time.monotonic() - started
+        rate = users / elapsed if elapsed else users
+        self.stdout.write(self.style.SUCCESS(
+            f"Evaluated {budgets} budgets for {users} users in {elapsed:.2f}s "
+            f"({rate:.1f} users/sec); created {alerts} alerts"
+        ))
+
+    def user_chunks(self, chunk_size, today=None):
+        """Ids of users with running budgets, in id-ordered chunks"""
+        user_ids = list(
+            User.objects.filter(
+                id__in=Budget.running(today).values('user_id')
+            ).order_by('id').values_list('id', flat=True)
+        )
+        return [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+
+    def collect(self, results, totals):
+        for users, budgets, alerts in results:
+            totals[0] += users
+            totals[1] += budgets
+            totals[2] += alerts
+            if self.verbosity > 1:
+                self.stdout.write(f"  chunk of {users} users: {budgets} budgets, {alerts} alerts")
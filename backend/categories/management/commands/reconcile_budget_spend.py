@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from categories.models import Budget, BudgetPeriodSpend
+
+class Command(BaseCommand):
+    help = 'Recompute the budget spend ledger from raw expenses and report (or fix) drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Limit to a single username')
+        parser.add_argument('--fix', action='store_true', help='Rewrite drifted budgets from raw expenses')
+        parser.add_argument('--batch-size', type=int, default=500, help='Budgets per batch')
+
+    def handle(self, *args, **options):
+        budgets = Budget.objects.order_by('user_id', 'id')
+        if options['user']:
+            try:
+                budgets = budgets.filter(user=User.objects.get(username=options['user']))
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        batch_size = options['batch_size']
+        checked = 0
+        drifted = 0
+        last_id = 0
+        while True:
+            batch = list(budgets.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+            checked += len(batch)
+
+            expected = BudgetPeriodSpend.expected_rows(batch)
+            stored = {
+                (budget_id, start): amount
+                for budget_id, start, amount in BudgetPeriodSpend.objects.filter(
+                    budget__in=batch
+                ).exclude(amount=0).values_list('budget_id', 'period_start', 'amount')
+            }
+
+            drifted_ids = set()
+            for key in set(expected) | set(stored):
+                if expected.get(key, 0) != stored.get(key, 0):
+                    drifted_ids.add(key[0])
+                    self.stdout.write(
+                        f"  budget {key[0]} period {key[1]}: stored={stored.get(key, 0)} expected={expected.get(key, 0)}"
+                    )
+            drifted += len(drifted_ids)
+
+            if options['fix'] and drifted_ids:
+                BudgetPeriodSpend.rebuild([b for b in batch if b.id in drifted_ids])
+
+        message = f"Checked {checked} budgets, {drifted} drifted"
+        if drifted and not options['fix']:
+            raise CommandError(f"{message}; rerun with --fix to repair")
+        self.stdout.write(self.style.SUCCESS(message + (" (fixed)" if drifted else "")))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import transaction
+from categories.utils import provision_default_categories
+
+class Command(BaseCommand):
+    help = 'Provision the default category template for existing users, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Limit to a single username')
+        parser.add_argument('--only-empty', action='store_true', help='Skip users who already have categories')
+        parser.add_argument('--batch-size', type=int, default=500, help='Users per batch')
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"User '{options['user']}' does not exist")
+        if options['only_empty']:
+            users = users.filter(categories__isnull=True)
+
+        batch_size = options['batch_size']
+        seeded_users = 0
+        created = 0
+        last_id = 0
+        while True:
+            user_ids = list(
+                users.filter(id__gt=last_id).order_by('id').values_list('id', flat=True).distinct()[:batch_size]
+            )
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            with transaction.atomic():
+                result = provision_default_categories(user_ids)
+            seeded_users += len(result)
+            created += sum(len(names) for names in result.values())
+            self.stdout.write(f"  users up to id {last_id}: {sum(len(names) for names in result.values())} categories")
+
+        self.stdout.write(self.style.SUCCESS(f"Created {created} categories for {seeded_users} users"))
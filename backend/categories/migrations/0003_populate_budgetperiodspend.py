@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from django.db import migrations
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncQuarter, TruncWeek, TruncYear
+
+
+TRUNCATIONS = {
+    'daily': lambda: F('date'),
+    'weekly': lambda: TruncWeek('date'),
+    'monthly': lambda: TruncMonth('date'),
+    'quarterly': lambda: TruncQuarter('date'),
+    'yearly': lambda: TruncYear('date'),
+}
+
+
+def period_end(period, start):
+    if period == 'daily':
+        return start
+    if period == 'weekly':
+        return start + timedelta(days=6)
+    months = {'monthly': 1, 'quarterly': 3, 'yearly': 12}[period]
+    month = start.month - 1 + months
+    return start.replace(year=start.year + month // 12, month=month % 12 + 1, day=1) - timedelta(days=1)
+
+
+def populate_budget_spend(apps, schema_editor):
+    Budget = apps.get_model('categories', 'Budget')
+    BudgetPeriodSpend = apps.get_model('categories', 'BudgetPeriodSpend')
+    Expense = apps.get_model('expense', 'Expense')
+
+    totals = {}
+    for budget in Budget.objects.select_related('category').iterator():
+        expenses = Expense.objects.filter(user_id=budget.user_id)
+        if budget.category_id:
+            expenses = expenses.filter(category_fk_id=budget.category_id) | expenses.filter(category=budget.category.name)
+        rows = expenses.annotate(
+            bucket=TRUNCATIONS[budget.period]()
+        ).values('bucket').annotate(total=Sum('amount')).order_by()
+        for row in rows:
+            start = row['bucket']
+            if isinstance(start, datetime):
+                start = start.date()
+            totals[(budget.id, start)] = (period_end(budget.period, start), row['total'])
+
+    BudgetPeriodSpend.objects.bulk_create(
+        [
+            BudgetPeriodSpend(budget_id=budget_id, period_start=start, period_end=end, amount=amount)
+            for (budget_id, start), (end, amount) in totals.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0002_budgetperiodspend'),
+        ('expense', '0004_expense_category_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_budget_spend, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0003_populate_budgetperiodspend'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='budgetalert',
+            index=models.Index(fields=['budget', 'is_read', '-alert_date'], name='alert_budget_read_idx'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+from django.db import migrations
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncQuarter, TruncWeek, TruncYear
+
+
+TRUNCATIONS = {
+    'daily': lambda: F('date'),
+    'weekly': lambda: TruncWeek('date'),
+    'monthly': lambda: TruncMonth('date'),
+    'quarterly': lambda: TruncQuarter('date'),
+    'yearly': lambda: TruncYear('date'),
+}
+
+
+def period_end(period, start):
+    if period == 'daily':
+        return start
+    if period == 'weekly':
+        return start + timedelta(days=6)
+    months = {'monthly': 1, 'quarterly': 3, 'yearly': 12}[period]
+    month = start.month - 1 + months
+    return start.replace(year=start.year + month // 12, month=month % 12 + 1, day=1) - timedelta(days=1)
+
+
+def populate_paths(apps, schema_editor):
+    Category = apps.get_model('categories', 'Category')
+    Budget = apps.get_model('categories', 'Budget')
+    BudgetPeriodSpend = apps.get_model('categories', 'BudgetPeriodSpend')
+    Expense = apps.get_model('expense', 'Expense')
+
+    parents = dict(Category.objects.values_list('id', 'parent_category_id'))
+    paths = {}
+
+    def path_for(category_id, seen=()):
+        if category_id not in paths:
+            parent_id = parents[category_id]
+            if parent_id is None or parent_id in seen:
+                # Roots, and any pre-existing cycle, are cut at this node
+                paths[category_id] = '/'
+            else:
+                paths[category_id] = f'{path_for(parent_id, seen + (category_id,))}{parent_id}/'
+        return paths[category_id]
+
+    categories = list(Category.objects.only('id', 'path'))
+    for category in categories:
+        category.path = path_for(category.id)
+    Category.objects.bulk_update(categories, ['path'], batch_size=1000)
+
+    # Budgets on categories with subcategories now cover the whole subtree
+    subtrees = {}
+    for category_id in parents:
+        for ancestor_id in paths[category_id].strip('/').split('/'):
+            if ancestor_id:
+                subtrees.setdefault(int(ancestor_id), {int(ancestor_id)}).add(category_id)
+    if not subtrees:
+        return
+
+    totals = {}
+    budgets = Budget.objects.filter(category_id__in=subtrees)
+    for budget in budgets.iterator():
+        subtree = subtrees[budget.category_id]
+        names = Category.objects.filter(id__in=subtree).values('name')
+        expenses = Expense.objects.filter(user_id=budget.user_id)
+        expenses = expenses.filter(category_fk_id__in=subtree) | expenses.filter(category__in=names)
+        rows = expenses.annotate(
+            bucket=TRUNCATIONS[budget.period]()
+        ).values('bucket').annotate(total=Sum('amount')).order_by()
+        for row in rows:
+            start = row['bucket']
+            if isinstance(start, datetime):
+                start = start.date()
+            totals[(budget.id, start)] = (period_end(budget.period, start), row['total'])
+
+    BudgetPeriodSpend.objects.filter(budget__in=budgets).delete()
+    BudgetPeriodSpend.objects.bulk_create(
+        [
+            BudgetPeriodSpend(budget_id=budget_id, period_start=start, period_end=end, amount=amount)
+            for (budget_id, start), (end, amount) in totals.items()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0005_category_path'),
+        ('expense', '0005_expense_expense_user_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+    ]
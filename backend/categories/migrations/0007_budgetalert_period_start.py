@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0006_populate_category_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budgetalert',
+            name='period_start',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
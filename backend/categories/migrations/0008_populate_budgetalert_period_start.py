@@ -0,0 +1,43 @@
+from datetime import timedelta
+from django.db import migrations
+from django.utils import timezone
+
+
+def period_start(period, day):
+    if period == 'daily':
+        return day
+    if period == 'weekly':
+        return day - timedelta(days=day.weekday())
+    if period == 'monthly':
+        return day.replace(day=1)
+    if period == 'quarterly':
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    return day.replace(month=1, day=1)
+
+
+def populate_period_start(apps, schema_editor):
+    BudgetAlert = apps.get_model('categories', 'BudgetAlert')
+
+    # The oldest alert of each budget period keeps the key; later
+    # duplicates stay as history with no period
+    seen = set()
+    alerts = []
+    for alert in BudgetAlert.objects.select_related('budget').order_by('alert_date', 'id').iterator():
+        key = (alert.budget_id, period_start(alert.budget.period, timezone.localdate(alert.alert_date)))
+        if key in seen:
+            continue
+        seen.add(key)
+        alert.period_start = key[1]
+        alerts.append(alert)
+    BudgetAlert.objects.bulk_update(alerts, ['period_start'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0007_budgetalert_period_start'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_period_start, migrations.RunPython.noop),
+    ]
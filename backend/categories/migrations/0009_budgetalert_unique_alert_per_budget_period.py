@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('categories', '0008_populate_budgetalert_period_start'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='budgetalert',
+            constraint=models.UniqueConstraint(fields=('budget', 'period_start'), name='unique_alert_per_budget_period'),
+        ),
+    ]
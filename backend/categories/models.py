@@ -1,9 +1,52 @@
-from django.db import models
+import operator
+from functools import reduce
+from django.conf import settings
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
-from datetime import datetime
-from django.db.models import Sum
+from datetime import datetime, timedelta
+from django.db.models import Sum, Value
+from django.db.models.functions import Concat, Substr
+from decimal import Decimal
+
+def path_ids(path):
+    """Ancestor ids stored in a Category.path, root first"""
+    return [int(part) for part in path.strip('/').split('/') if part]
+
+
+def match_legacy_names():
+    """Whether budgets still match expenses by the legacy category text"""
+    return not settings.BUDGET_CATEGORY_FK_ONLY
+
+
+def get_period_dates(period, day):
+    """Start and end dates of the budget period containing day"""
+    if period == 'daily':
+        return day, day
+    elif period == 'weekly':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    elif period == 'monthly':
+        start = day.replace(day=1)
+        if day.month == 12:
+            end = day.replace(year=day.year + 1, month=1, day=1) - timedelta(days=1)
+        else:
+            end = day.replace(month=day.month + 1, day=1) - timedelta(days=1)
+        return start, end
+    elif period == 'quarterly':
+        quarter = (day.month - 1) // 3
+        start = day.replace(month=quarter * 3 + 1, day=1)
+        end_month = quarter * 3 + 3
+        if end_month == 12:
+            end = day.replace(year=day.year + 1, month=1, day=1) - timedelta(days=1)
+        else:
+            end = day.replace(month=end_month + 1, day=1) - timedelta(days=1)
+        return start, end
+    elif period == 'yearly':
+        return day.replace(month=1, day=1), day.replace(month=12, day=31)
+
 
 class Category(models.Model):
     CATEGORY_TYPES = [
@@ -26,6 +69,9 @@ class Category(models.Model):
         blank=True, 
         related_name='subcategories'
     )
+    # Materialized path of ancestor ids, e.g. '/3/17/' for a category under
+    # 17 under 3; '/' for roots. Maintained by save().
+    path = models.CharField(max_length=255, default='/', editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -33,12 +79,122 @@ class Category(models.Model):
         ordering = ['name']
         unique_together = ['user', 'name', 'category_type']
         verbose_name_plural = 'Categories'
+        indexes = [
+            # varchar_pattern_ops lets PostgreSQL use the index for LIKE 'prefix%'
+            models.Index(fields=['path'], name='category_path_idx', opclasses=['varchar_pattern_ops']),
+        ]
     
     def __str__(self):
         if self.parent_category:
             return f"{self.parent_category.name} > {self.name}"
         return self.name
     
+    def save(self, *args, **kwargs):
+        from .utils import CategoryTree
+        
+        previous = None
+        if self.pk:
+            previous = Category.objects.filter(pk=self.pk).values('name', 'path').first()
+        with transaction.atomic():
+            self.path = self.build_path()
+            super().save(*args, **kwargs)
+            if previous is not None:
+                self.update_hierarchy(previous)
+            else:
+                self.claim_legacy_expenses()
+        CategoryTree.invalidate(self.user_id)
+    
+    def claim_legacy_expenses(self):
+        """
+        A new subcategory starts covering legacy expenses already carrying
+        its name, so its ancestors' budget ledgers are rebuilt
+        """
+        from expense.models import Expense
+        
+        if not (self.ancestor_ids and match_legacy_names()):
+            return
+        if Expense.objects.filter(user_id=self.user_id, category=self.name).exists():
+            BudgetPeriodSpend.rebuild(Budget.objects.filter(category_id__in=self.ancestor_ids))
+    
+    def update_hierarchy(self, previous):
+        """Propagate a move or rename to the subtree paths, budget ledgers and rollups"""
+        from dashboard.models import MonthlyRollup
+        
+        moved = previous['path'] != self.path
+        if moved:
+            # Re-root the whole subtree in one statement
+            old_prefix = f"{previous['path']}{self.pk}/"
+            Category.objects.filter(path__startswith=old_prefix).update(
+                path=Concat(Value(self.descendant_prefix), Substr('path', len(old_prefix) + 1))
+            )
+        if previous['name'] != self.name:
+            # Dashboard rollups label expenses by category name
+            MonthlyRollup.rebuild_categories(self.user_id, {previous['name'], self.name})
+        # Budgets on this category and its old and new ancestors cover its
+        # expenses (legacy expenses match by name)
+        renamed = previous['name'] != self.name and match_legacy_names()
+        if moved or renamed:
+            lineage = {self.pk} | set(path_ids(previous['path'])) | set(self.ancestor_ids)
+            BudgetPeriodSpend.rebuild(Budget.objects.filter(category_id__in=lineage))
+    
+    def delete(self, *args, **kwargs):
+        from .utils import CategoryTree
+        
+        from expense.models import Expense
+        from dashboard.models import MonthlyRollup
+        
+        user_id = self.user_id
+        ancestor_ids = path_ids(Category.objects.filter(pk=self.pk).values_list('path', flat=True).first() or '/')
+        with transaction.atomic():
+            # The subtree goes too, and its expenses fall back to their
+            # legacy category text in the dashboard rollups
+            subtree = self.get_descendants(include_self=True)
+            labels = set(subtree.values_list('name', flat=True))
+            labels.update(Expense.objects.filter(category_fk__in=subtree).values_list('category', flat=True).distinct())
+            result = super().delete(*args, **kwargs)
+            MonthlyRollup.rebuild_categories(user_id, labels)
+            # The subtree's expenses no longer roll up into the ancestors
+            if ancestor_ids:
+                BudgetPeriodSpend.rebuild(Budget.objects.filter(category_id__in=ancestor_ids))
+        CategoryTree.invalidate(user_id)
+        return result
+    
+    def build_path(self):
+        """Path for the current parent; rejects moves under the category itself"""
+        if not self.parent_category_id:
+            return '/'
+        parent_path = Category.objects.filter(pk=self.parent_category_id).values_list('path', flat=True).first()
+        if parent_path is None:
+            raise ValidationError({'parent_category': 'Parent category does not exist.'})
+        if self.pk and (self.parent_category_id == self.pk or self.pk in path_ids(parent_path)):
+            raise ValidationError({'parent_category': 'A category cannot be nested under itself.'})
+        return f'{parent_path}{self.parent_category_id}/'
+    
+    @property
+    def ancestor_ids(self):
+        return path_ids(self.path)
+    
+    @property
+    def descendant_prefix(self):
+        """Path prefix shared by every descendant"""
+        return f'{self.path}{self.pk}/'
+    
+    def subtree_filter(self, prefix=''):
+        """
+        Q matching this category and all its descendants, at any depth.
+        prefix points the lookup through a relation, e.g. 'category_fk__'.
+        """
+        return (
+            models.Q(**{f'{prefix}id': self.pk}) |
+            models.Q(**{f'{prefix}path__startswith': self.descendant_prefix})
+        )
+    
+    def get_descendants(self, include_self=False):
+        queryset = Category.objects.filter(path__startswith=self.descendant_prefix)
+        if include_self:
+            queryset = Category.objects.filter(self.subtree_filter())
+        return queryset
+    
     @property
     def full_path(self):
         if self.parent_category:
@@ -87,66 +243,121 @@ class Budget(models.Model):
         ordering = ['-is_active', '-start_date']
         unique_together = ['user', 'category', 'period', 'start_date']
     
+    def save(self, *args, **kwargs):
+        previous = None
+        if self.pk:
+            previous = Budget.objects.filter(pk=self.pk).values('category_id', 'period').first()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Seed the spend ledger for new budgets or when matching rules change
+            if previous != {'category_id': self.category_id, 'period': self.period}:
+                BudgetPeriodSpend.rebuild([self])
+    
     def __str__(self):
         if self.category:
             return f"{self.name} - {self.category.name} ({self.get_period_display()})"
         return f"{self.name} - Overall ({self.get_period_display()})"
     
+    @classmethod
+    def running(cls, today=None):
+        """Active budgets whose start_date/end_date window covers today"""
+        today = today or timezone.now().date()
+        return cls.objects.filter(
+            models.Q(end_date__isnull=True) | models.Q(end_date__gte=today),
+            is_active=True,
+            start_date__lte=today
+        )
+    
     def get_current_period_dates(self):
         """Get start and end dates for the current budget period"""
-        today = timezone.now().date()
-        
-        if self.period == 'daily':
-            return today, today
-        elif self.period == 'weekly':
-            start = today - timezone.timedelta(days=today.weekday())
-            end = start + timezone.timedelta(days=6)
-            return start, end
-        elif self.period == 'monthly':
-            start = today.replace(day=1)
-            if today.month == 12:
-                end = today.replace(year=today.year + 1, month=1, day=1) - timezone.timedelta(days=1)
-            else:
-                end = today.replace(month=today.month + 1, day=1) - timezone.timedelta(days=1)
-            return start, end
-        elif self.period == 'quarterly':
-            quarter = (today.month - 1) // 3
-            start = today.replace(month=quarter * 3 + 1, day=1)
-            end_month = quarter * 3 + 3
-            if end_month > 12:
-                end = today.replace(year=today.year + 1, month=1, day=1) - timezone.timedelta(days=1)
-            else:
-                end = today.replace(month=end_month + 1, day=1) - timezone.timedelta(days=1)
-            return start, end
-        elif self.period == 'yearly':
-            start = today.replace(month=1, day=1)
-            end = today.replace(month=12, day=31)
-            return start, end
+        return get_period_dates(self.period, timezone.now().date())
     
-    def get_spent_amount(self):
-        """Calculate amount spent in current period"""
+    def expense_filter(self):
+        """Q object matching expenses that count against this budget"""
+        if not self.category:
+            return models.Q()
+        # The category's whole subtree counts; check both the old text
+        # field and the new FK field unless running FK-only
+        subtree = Category.objects.filter(self.category.subtree_filter())
+        if not match_legacy_names():
+            return models.Q(category_fk__in=subtree)
+        return models.Q(category__in=subtree.values('name')) | models.Q(category_fk__in=subtree)
+    
+    def compute_spent_amount(self, start_date, end_date):
+        """Sum matching expenses between two dates from the raw expense table"""
         from expense.models import Expense
         
-        start_date, end_date = self.get_current_period_dates()
-        
         query = Expense.objects.filter(
-            user=self.user,
+            self.expense_filter(),
+            user_id=self.user_id,
             date__gte=start_date,
             date__lte=end_date
         )
         
-        if self.category:
-            # Check both old text field and new FK field
-            query = query.filter(
-                models.Q(category=self.category.name) | 
-                models.Q(category_fk=self.category)
-            )
-        
         return query.aggregate(total=Sum('amount'))['total'] or 0
     
+    def get_spent_amount(self):
+        """Amount spent in current period, read from the spend ledger"""
+        start_date, _ = self.get_current_period_dates()
+        spent = self.period_spends.filter(
+            period_start=start_date
+        ).values_list('amount', flat=True).first()
+        return spent or 0
+    
     @property
     def spent_amount(self):
-        return self.get_spent_amount()
+        # Computed once per instance; BudgetEvaluator fills this in bulk
+        if not hasattr(self, '_spent_amount'):
+            self._spent_amount = self.get_spent_amount()
+        return self._spent_amount
+    
+    def get_period_history(self, today=None, limit=None):
+        """
+        Spend for every period from start_date to today (or end_date),
+        oldest first. Reads the spend ledger in one query; periods with
+        no ledger row had no spend.
+        """
+        today = today or timezone.now().date()
+        last_day = min(today, self.end_date) if self.end_date else today
+        if last_day < self.start_date:
+            return []
+        
+        periods = []
+        start, end = get_period_dates(self.period, last_day)
+        first_start = get_period_dates(self.period, self.start_date)[0]
+        while start >= first_start and (limit is None or len(periods) < limit):
+            periods.append((start, end))
+            start, end = get_period_dates(self.period, start - timedelta(days=1))
+        periods.reverse()
+        if not periods:
+            return []
+        
+        spent = dict(
+            self.period_spends.filter(
+                period_start__gte=periods[0][0],
+                period_start__lte=periods[-1][0]
+            ).values_list('period_start', 'amount')
+        )
+        amount = float(self.amount)
+        history = []
+        for start, end in periods:
+            period_spent = float(spent.get(start, 0))
+            history.append({
+                'period_start': start,
+                'period_end': end,
+                'spent': period_spent,
+                'percentage': round(period_spent / amount * 100, 2) if amount else 0,
+                'over_budget': period_spent > amount,
+            })
+        return history
+    
+    @property
+    def forecast(self):
+        # BudgetForecaster fills this in bulk for listings
+        if not hasattr(self, '_forecast'):
+            from .utils import BudgetForecaster
+            BudgetForecaster.forecast([self])
+        return self._forecast
     
     @property
     def remaining_amount(self):
@@ -174,9 +385,296 @@ class BudgetAlert(models.Model):
     amount_spent = models.DecimalField(max_digits=12, decimal_places=2)
     message = models.TextField()
     is_read = models.BooleanField(default=False)
+    # Start of the budget period the alert is for; at most one alert per period
+    period_start = models.DateField(null=True, blank=True)
+    
+    # Largest value percentage_reached (max_digits=5) can hold
+    MAX_PERCENTAGE = 999.99
     
     class Meta:
         ordering = ['-alert_date']
+        indexes = [
+            models.Index(fields=['budget', 'is_read', '-alert_date'], name='alert_budget_read_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['budget', 'period_start'], name='unique_alert_per_budget_period'),
+        ]
+    
+    def __str__(self):
+        return f"Alert for {self.budget.name} - {self.percentage_reached}%"
+    
+    @classmethod
+    def create_for(cls, budgets, today=None):
+        """
+        Alert each budget for its current period with one insert, skipping
+        budgets already alerted this period. Returns the alerts this call
+        inserted.
+        
+        The budget rows are locked for the duration, so concurrent callers
+        alerting the same budgets take turns: each sees the alerts the
+        others committed and inserts, and reports, only its own.
+        """
+        budgets = list(budgets)
+        if not budgets:
+            return []
+        today = today or timezone.now().date()
+        periods = {budget.id: get_period_dates(budget.period, today)[0] for budget in budgets}
+        
+        with transaction.atomic():
+            # In id order, so callers with overlapping budgets cannot deadlock
+            list(Budget.objects.select_for_update().filter(id__in=periods).order_by('id').values_list('id', flat=True))
+            existing = set(
+                cls.objects.filter(
+                    budget_id__in=periods,
+                    period_start__in=set(periods.values())
+                ).values_list('budget_id', 'period_start')
+            )
+            alerts = [
+                cls(
+                    budget=budget,
+                    period_start=periods[budget.id],
+                    # One overflowing value would fail the whole insert
+                    percentage_reached=min(budget.spent_percentage, cls.MAX_PERCENTAGE),
+                    amount_spent=budget.spent_amount,
+                    message=f"Budget '{budget.name}' has reached {budget.spent_percentage}% of the limit!"
+                )
+                for budget in budgets
+                if (budget.id, periods[budget.id]) not in existing
+            ]
+            if not alerts:
+                return []
+            # The unique constraint still guards writers that skip the lock
+            cls.objects.bulk_create(alerts, batch_size=1000, ignore_conflicts=True)
+            
+            # Conflict-ignoring inserts do not return ids; under the lock the
+            # keys that were missing are the ones this call filled
+            inserted = {(alert.budget_id, alert.period_start) for alert in alerts}
+            return [
+                alert for alert in cls.objects.filter(
+                    budget_id__in={budget_id for budget_id, _ in inserted},
+                    period_start__in={period_start for _, period_start in inserted}
+                ).select_related('budget')
+                if (alert.budget_id, alert.period_start) in inserted
+            ]
+
+class BudgetPeriodSpend(models.Model):
+    """
+    Running spend for one budget period, adjusted with F() increments on
+    every expense write so current-period spend is a single-row lookup.
+    """
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='period_spends')
+    period_start = models.DateField()
+    period_end = models.DateField()
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-period_start']
+        unique_together = ['budget', 'period_start']
     
     def __str__(self):
-        return f"Alert for {self.budget.name} - {self.percentage_reached}%"
\ No newline at end of file
+        return f"{self.budget.name} {self.period_start} - {self.period_end}: {self.amount}"
+    
+    @staticmethod
+    def matching_budgets(expense):
+        """Budgets (id, period) an expense counts against"""
+        # The expense's categories and all their ancestors
+        categories = []
+        if expense.category_fk_id:
+            categories.append(models.Q(pk=expense.category_fk_id))
+        if expense.category and match_legacy_names():
+            categories.append(models.Q(user_id=expense.user_id, name=expense.category))
+        lineage = set()
+        if categories:
+            for category_id, path in Category.objects.filter(reduce(operator.or_, categories)).values_list('id', 'path'):
+                lineage.add(category_id)
+                lineage.update(path_ids(path))
+        
+        match = models.Q(category__isnull=True)
+        if lineage:
+            match |= models.Q(category_id__in=lineage)
+        return Budget.objects.filter(match, user_id=expense.user_id).values_list('id', 'period')
+    
+    @staticmethod
+    def budget_scopes(budgets):
+        """
+        (id, period, category_ids, category_names) for each budget: the ids
+        and names of its category's subtree, or None for overall budgets.
+        category_names is empty when budgets match by FK only.
+        """
+        budgets = list(budgets)
+        categories = {
+            category_id: (name, path)
+            for category_id, name, path in Category.objects.filter(
+                user_id__in={b.user_id for b in budgets if b.category_id}
+            ).values_list('id', 'name', 'path')
+        }
+        
+        scopes = []
+        for budget in budgets:
+            if not budget.category_id:
+                scopes.append((budget.id, budget.period, None, None))
+                continue
+            prefix = f'{categories[budget.category_id][1]}{budget.category_id}/'
+            subtree = {
+                category_id: name
+                for category_id, (name, path) in categories.items()
+                if category_id == budget.category_id or path.startswith(prefix)
+            }
+            names = set(subtree.values()) if match_legacy_names() else set()
+            scopes.append((budget.id, budget.period, set(subtree), names))
+        return scopes
+    
+    @classmethod
+    def contributions(cls, expense, sign):
+        """{(budget_id, period_start): (period_end, amount)} for one expense"""
+        date = expense.date
+        if isinstance(date, str):
+            date = datetime.strptime(date, '%Y-%m-%d').date()
+        amount = Decimal(str(expense.amount)) * sign
+        result = {}
+        for budget_id, period in cls.matching_budgets(expense):
+            start, end = get_period_dates(period, date)
+            result[(budget_id, start)] = (end, amount)
+        return result
+    
+    @classmethod
+    def record_change(cls, previous, current):
+        """
+        Apply the difference between two versions of an expense to every
+        affected budget period. Either side may be None.
+        """
+        deltas = {}
+        for expense, sign in ((previous, -1), (current, 1)):
+            if expense is None:
+                continue
+            for key, (end, amount) in cls.contributions(expense, sign).items():
+                _, total = deltas.get(key, (end, Decimal('0')))
+                deltas[key] = (end, total + amount)
+        
+        for (budget_id, start), (end, amount) in deltas.items():
+            if amount:
+                cls.adjust(budget_id, start, end, amount)
+    
+    @staticmethod
+    def collect(expenses, budgets, deltas):
+        """
+        Accumulate spend per (budget_id, period_start) for expenses written
+        in bulk. budgets is the budget_scopes() of the expenses' user.
+        """
+        for expense in expenses:
+            amount = Decimal(str(expense.amount))
+            for budget_id, period, category_ids, category_names in budgets:
+                if category_ids is not None and not (
+                    expense.category_fk_id in category_ids or
+                    expense.category in category_names
+                ):
+                    continue
+                start, end = get_period_dates(period, expense.date)
+                _, total = deltas.get((budget_id, start), (end, Decimal('0')))
+                deltas[(budget_id, start)] = (end, total + amount)
+        return deltas
+    
+    @classmethod
+    def apply_deltas(cls, deltas):
+        for (budget_id, start), (end, amount) in deltas.items():
+            if amount:
+                cls.adjust(budget_id, start, end, amount)
+    
+    @classmethod
+    def adjust(cls, budget_id, period_start, period_end, amount):
+        updated = cls.objects.filter(budget_id=budget_id, period_start=period_start).update(
+            amount=models.F('amount') + amount,
+            updated_at=timezone.now()
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    budget_id=budget_id,
+                    period_start=period_start,
+                    period_end=period_end,
+                    amount=amount
+                )
+        except IntegrityError:
+            # Another writer created the row first
+            cls.objects.filter(budget_id=budget_id, period_start=period_start).update(
+                amount=models.F('amount') + amount,
+                updated_at=timezone.now()
+            )
+    
+    @staticmethod
+    def expected_rows(budgets):
+        """
+        Recompute {(budget_id, period_start): amount} from raw expenses.
+        One grouped query per distinct period type among the budgets.
+        """
+        from expense.models import Expense
+        from django.db.models.functions import TruncWeek, TruncMonth, TruncQuarter, TruncYear
+        
+        truncations = {
+            'daily': models.F('date'),
+            'weekly': TruncWeek('date'),
+            'monthly': TruncMonth('date'),
+            'quarterly': TruncQuarter('date'),
+            'yearly': TruncYear('date'),
+        }
+        
+        budgets = list(budgets)
+        scopes = {
+            budget_id: (category_ids, category_names)
+            for budget_id, _, category_ids, category_names in BudgetPeriodSpend.budget_scopes(budgets)
+        }
+        
+        expected = {}
+        for period in {budget.period for budget in budgets}:
+            period_budgets = [b for b in budgets if b.period == period]
+            rows = Expense.objects.filter(
+                user_id__in={b.user_id for b in period_budgets}
+            ).annotate(
+                bucket=truncations[period]
+            ).values('user_id', 'category_fk_id', 'category', 'bucket').annotate(
+                total=Sum('amount')
+            ).order_by()
+            
+            rows_by_user = {}
+            for row in rows:
+                rows_by_user.setdefault(row['user_id'], []).append(row)
+            
+            for budget in period_budgets:
+                category_ids, category_names = scopes[budget.id]
+                for row in rows_by_user.get(budget.user_id, []):
+                    if category_ids is not None and not (
+                        row['category_fk_id'] in category_ids or
+                        row['category'] in category_names
+                    ):
+                        continue
+                    bucket = row['bucket']
+                    if isinstance(bucket, datetime):
+                        bucket = bucket.date()
+                    key = (budget.id, bucket)
+                    expected[key] = expected.get(key, Decimal('0')) + row['total']
+        return expected
+    
+    @classmethod
+    def rebuild(cls, budgets):
+        """Replace the ledger rows for the given budgets from raw expenses"""
+        budgets = list(budgets)
+        periods = {budget.id: budget.period for budget in budgets}
+        expected = cls.expected_rows(budgets)
+        with transaction.atomic():
+            cls.objects.filter(budget_id__in=periods).delete()
+            cls.objects.bulk_create(
+                [
+                    cls(
+                        budget_id=budget_id,
+                        period_start=start,
+                        period_end=get_period_dates(periods[budget_id], start)[1],
+                        amount=amount
+                    )
+                    for (budget_id, start), amount in expected.items()
+                ],
+                batch_size=1000
+            )
+        return len(expected)
@@ -16,12 +16,29 @@ class CategorySerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
     
+    def validate_parent_category(self, value):
+        if value is None:
+            return value
+        request = self.context.get('request')
+        if request is not None and value.user_id != request.user.id:
+            raise serializers.ValidationError('Parent category not found.')
+        if self.instance is not None and (value.pk == self.instance.pk or self.instance.pk in value.ancestor_ids):
+            raise serializers.ValidationError('A category cannot be nested under itself.')
+        return value
+    
+    def get_children(self, obj):
+        # Views serializing whole trees pass a parent -> children map
+        children = self.context.get('category_children')
+        if children is not None:
+            return children.get(obj.id, [])
+        return list(obj.subcategories.all())
+    
     def get_subcategories(self, obj):
-        if obj.subcategories.exists():
-            return CategorySerializer(obj.subcategories.all(), many=True).data
-        return []
+        return CategorySerializer(self.get_children(obj), many=True, context=self.context).data
     
     def get_has_subcategories(self, obj):
+        if 'category_children' in self.context:
+            return bool(self.context['category_children'].get(obj.id))
         return obj.subcategories.exists()
 
 
@@ -31,10 +48,10 @@ class BudgetAlertSerializer(serializers.ModelSerializer):
     class Meta:
         model = BudgetAlert
         fields = [
-            'id', 'budget', 'budget_name', 'alert_date', 
+            'id', 'budget', 'budget_name', 'alert_date', 'period_start',
             'percentage_reached', 'amount_spent', 'message', 'is_read'
         ]
-        read_only_fields = ['alert_date']
+        read_only_fields = ['alert_date', 'period_start']
 
 
 class BudgetSerializer(serializers.ModelSerializer):
@@ -45,6 +62,10 @@ class BudgetSerializer(serializers.ModelSerializer):
     is_near_limit = serializers.ReadOnlyField()
     category_name = serializers.CharField(source='category.name', read_only=True, allow_null=True)
     recent_alerts = serializers.SerializerMethodField()
+    projected_spend = serializers.SerializerMethodField()
+    projected_overrun_date = serializers.SerializerMethodField()
+    
+    RECENT_ALERTS = 3
     
     class Meta:
         model = Budget
@@ -53,10 +74,19 @@ class BudgetSerializer(serializers.ModelSerializer):
             'period', 'start_date', 'end_date', 'is_active',
             'alert_threshold', 'notes', 'spent_amount', 'remaining_amount',
             'spent_percentage', 'is_over_budget', 'is_near_limit',
+            'projected_spend', 'projected_overrun_date',
             'recent_alerts', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
     
+    def get_projected_spend(self, obj):
+        return obj.forecast['projected_spend']
+    
+    def get_projected_overrun_date(self, obj):
+        return obj.forecast['projected_overrun_date']
+    
     def get_recent_alerts(self, obj):
-        recent_alerts = obj.alerts.filter(is_read=False)[:3]
+        recent_alerts = getattr(obj, 'recent_unread_alerts', None)
+        if recent_alerts is None:
+            recent_alerts = obj.alerts.filter(is_read=False).order_by('-alert_date')[:self.RECENT_ALERTS]
         return BudgetAlertSerializer(recent_alerts, many=True).data
\ No newline at end of file
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+
+@receiver(post_save, sender=User, dispatch_uid='categories.provision_new_user')
+def provision_new_user(sender, instance, created, raw=False, **kwargs):
+    """Give every new user the default category template"""
+    from .utils import provision_default_categories
+    
+    if created and not raw and settings.PROVISION_DEFAULT_CATEGORIES:
+        provision_default_categories([instance.id])
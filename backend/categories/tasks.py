@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.utils import timezone
+from finance_tracker.background import enqueue
+from .models import Budget, BudgetAlert
+from .utils import BudgetEvaluator
+
+
+def create_budget_alerts(budgets, today=None):
+    """Create an alert for each budget past its threshold that has none this period"""
+    return BudgetAlert.create_for(
+        (budget for budget in BudgetEvaluator.evaluate(budgets, today=today) if budget.is_near_limit),
+        today=today
+    )
+
+
+def evaluate_budget_alerts(user_id):
+    """Background job: check every running budget of a user"""
+    budgets = Budget.running().filter(user_id=user_id).select_related('category')
+    return len(create_budget_alerts(budgets))
+
+
+def evaluate_alerts_for_users(user_ids, today=None):
+    """
+    Check the running budgets of many users at once: one query for the
+    budgets, one for their spend and one insert for the alerts.
+    Returns (budgets checked, alerts created).
+    """
+    today = today or timezone.now().date()
+    budgets = list(Budget.running(today).filter(user_id__in=user_ids))
+    return len(budgets), len(create_budget_alerts(budgets, today=today))
+
+
+def schedule_budget_alerts(user_id):
+    """Queue an alert evaluation; bursts of writes for one user share a single run"""
+    enqueue(
+        'categories.tasks.evaluate_budget_alerts',
+        user_id,
+        coalesce_key=f'budget-alerts:{user_id}',
+        delay=settings.BUDGET_ALERT_COALESCE_SECONDS
+    )
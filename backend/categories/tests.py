@@ -1,3 +1,542 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, transaction
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from expense.models import Expense
+from finance_tracker import background
+from .models import Category, Budget, BudgetAlert, BudgetPeriodSpend, get_period_dates
+from .utils import BudgetEvaluator, BudgetForecaster, get_default_category_template, provision_default_categories
 
-# Create your tests here.
+class BudgetPeriodTestCase(TestCase):
+    def test_quarter_boundaries(self):
+        self.assertEqual(
+            get_period_dates('quarterly', date(2024, 11, 15)),
+            (date(2024, 10, 1), date(2024, 12, 31))
+        )
+        self.assertEqual(
+            get_period_dates('quarterly', date(2024, 2, 29)),
+            (date(2024, 1, 1), date(2024, 3, 31))
+        )
+
+    def test_week_crosses_year(self):
+        self.assertEqual(
+            get_period_dates('weekly', date(2025, 1, 1)),
+            (date(2024, 12, 30), date(2025, 1, 5))
+        )
+
+
+class BudgetEvaluatorTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.now().date()
+        self.food = Category.objects.create(user=self.user, name='Food')
+
+    def test_matches_per_budget_queries(self):
+        Expense.objects.create(user=self.user, description='Lunch', amount=30, category_fk=self.food, date=self.today)
+        Expense.objects.create(user=self.user, description='Legacy', amount=12, category='Food', date=self.today)
+        Expense.objects.create(user=self.user, description='Bus', amount=5, date=self.today)
+        Expense.objects.create(user=self.user, description='Old', amount=50, date=self.today - timedelta(days=400))
+
+        budgets = [
+            Budget.objects.create(user=self.user, name=period, category=self.food, amount=100, period=period, start_date=self.today)
+            for period, _ in Budget.BUDGET_PERIODS
+        ]
+        budgets.append(Budget.objects.create(user=self.user, name='Overall', amount=40, start_date=self.today))
+
+        evaluated = BudgetEvaluator.evaluate(Budget.objects.filter(user=self.user))
+        self.assertEqual(len(evaluated), len(budgets))
+        for budget in evaluated:
+            self.assertEqual(budget.spent_amount, budget.compute_spent_amount(*budget.get_current_period_dates()))
+        overall = next(b for b in evaluated if b.category_id is None)
+        self.assertEqual(overall.spent_amount, 47)
+        self.assertTrue(overall.is_over_budget)
+
+    def count_spend_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sum(1 for query in context.captured_queries if 'categories_budgetperiodspend' in query['sql'])
+
+    def test_spend_is_read_once_per_listing(self):
+        Budget.objects.create(user=self.user, name='Food', category=self.food, amount=100, start_date=self.today)
+        self.assertEqual(self.count_spend_queries('/api/budgets/'), 1)
+        self.assertEqual(self.count_spend_queries('/api/budgets/summary/'), 1)
+
+        for i in range(10):
+            category = Category.objects.create(user=self.user, name=f'Category {i}')
+            Budget.objects.create(user=self.user, name=f'Budget {i}', category=category, amount=100, start_date=self.today)
+        self.assertEqual(self.count_spend_queries('/api/budgets/'), 1)
+        self.assertEqual(self.count_spend_queries('/api/budgets/summary/'), 1)
+
+
+class BudgetPeriodSpendTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.today = timezone.now().date()
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.travel = Category.objects.create(user=self.user, name='Travel')
+        self.food_budget = Budget.objects.create(user=self.user, name='Food', category=self.food, amount=100, start_date=self.today)
+        self.travel_budget = Budget.objects.create(user=self.user, name='Travel', category=self.travel, amount=100, start_date=self.today)
+        self.overall = Budget.objects.create(user=self.user, name='Overall', amount=500, period='yearly', start_date=self.today)
+
+    def assertLedgerMatches(self):
+        budgets = Budget.objects.filter(user=self.user)
+        stored = {
+            (budget_id, start): amount
+            for budget_id, start, amount in BudgetPeriodSpend.objects.exclude(amount=0).values_list('budget_id', 'period_start', 'amount')
+        }
+        self.assertEqual(stored, BudgetPeriodSpend.expected_rows(budgets))
+
+    def test_expense_writes_adjust_ledger(self):
+        expense = Expense.objects.create(user=self.user, description='Lunch', amount=30, category_fk=self.food, date=self.today)
+        self.assertEqual(Budget.objects.get(pk=self.food_budget.pk).spent_amount, 30)
+        self.assertLedgerMatches()
+
+        expense.category_fk = self.travel
+        expense.amount = 45
+        expense.save()
+        self.assertEqual(Budget.objects.get(pk=self.food_budget.pk).spent_amount, 0)
+        self.assertEqual(Budget.objects.get(pk=self.travel_budget.pk).spent_amount, 45)
+        self.assertLedgerMatches()
+
+        expense.delete()
+        self.assertEqual(Budget.objects.get(pk=self.overall.pk).spent_amount, 0)
+        self.assertLedgerMatches()
+
+    def test_new_budget_is_seeded(self):
+        Expense.objects.create(user=self.user, description='Legacy', amount=20, category='Books', date=self.today)
+        books = Category.objects.create(user=self.user, name='Books')
+        budget = Budget.objects.create(user=self.user, name='Books', category=books, amount=50, start_date=self.today)
+        self.assertEqual(Budget.objects.get(pk=budget.pk).spent_amount, 20)
+
+    def test_reconcile_command(self):
+        Expense.objects.create(user=self.user, description='Lunch', amount=30, category_fk=self.food, date=self.today)
+        Expense.objects.filter(user=self.user).delete()  # bulk delete bypasses the ledger
+
+        with self.assertRaises(CommandError):
+            call_command('reconcile_budget_spend', stdout=StringIO())
+        call_command('reconcile_budget_spend', '--fix', stdout=StringIO())
+        call_command('reconcile_budget_spend', stdout=StringIO())
+        self.assertLedgerMatches()
+
+
+@override_settings(BACKGROUND_TASK_BACKEND='sync', BUDGET_ALERT_COALESCE_SECONDS=0)
+class BudgetAlertPipelineTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.today = timezone.now().date()
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.budget = Budget.objects.create(user=self.user, name='Food', category=self.food, amount=100, start_date=self.today)
+
+    def test_alert_created_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            Expense.objects.create(user=self.user, description='Dinner', amount=90, category_fk=self.food, date=self.today)
+        self.assertFalse(BudgetAlert.objects.exists())
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(BudgetAlert.objects.filter(budget=self.budget).count(), 1)
+
+    def test_burst_is_coalesced(self):
+        with mock.patch('categories.tasks.create_budget_alerts', return_value=[]) as create_alerts:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    for i in range(5):
+                        Expense.objects.create(user=self.user, description=f'Snack {i}', amount=10, category_fk=self.food, date=self.today)
+        self.assertEqual(create_alerts.call_count, 1)
+
+    def test_returns_only_its_own_alerts(self):
+        other_category = Category.objects.create(user=self.user, name='Fun')
+        other = Budget.objects.create(user=self.user, name='Fun', category=other_category, amount=100, start_date=self.today)
+        first, second = BudgetEvaluator.evaluate([self.budget, other])
+        # Another caller's alert for the other budget, stamped while this call runs
+        BudgetAlert.create_for([second])
+        BudgetAlert.objects.update(alert_date=timezone.now() + timedelta(seconds=5))
+
+        created = BudgetAlert.create_for([first, second])
+        self.assertEqual([alert.budget_id for alert in created], [self.budget.id])
+
+    def test_percentage_is_clamped(self):
+        Expense.objects.create(user=self.user, description='Car', amount=5000, category_fk=self.food, date=self.today)
+        budget = BudgetEvaluator.evaluate([self.budget])[0]
+        alert = BudgetAlert.create_for([budget])[0]
+        alert.refresh_from_db()
+        self.assertEqual(float(alert.percentage_reached), 999.99)
+        self.assertIn('5000.0%', alert.message)
+
+    def test_write_path_skips_budgets_outside_their_dates(self):
+        ended = Budget.objects.create(
+            user=self.user, name='Ended', category=self.food, amount=10,
+            start_date=self.today - timedelta(days=60), end_date=self.today - timedelta(days=30)
+        )
+        upcoming = Budget.objects.create(user=self.user, name='Upcoming', category=self.food, amount=10, start_date=self.today + timedelta(days=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(user=self.user, description='Dinner', amount=90, category_fk=self.food, date=self.today)
+        self.assertEqual(list(BudgetAlert.objects.values_list('budget_id', flat=True)), [self.budget.id])
+
+        # The scheduled run agrees
+        call_command('evaluate_budget_alerts', stdout=StringIO())
+        self.assertFalse(BudgetAlert.objects.filter(budget__in=[ended, upcoming]).exists())
+
+    def test_no_coalescing_across_processes_with_local_cache(self):
+        # The celery worker could not release a key held in this process's cache
+        with mock.patch('finance_tracker.background.get_backend', return_value='celery'), \
+                mock.patch('finance_tracker.background.run_job', create=True) as run_job:
+            for _ in range(2):
+                background._dispatch('categories.tasks.evaluate_budget_alerts', (self.user.id,), f'budget-alerts:{self.user.id}', 0)
+        self.assertEqual(run_job.apply_async.call_count, 2)
+        self.assertEqual(run_job.apply_async.call_args.kwargs['args'][2], None)
+        self.assertIsNone(cache.get(f'budget-alerts:{self.user.id}'))
+
+    def test_one_alert_per_period(self):
+        budgets = [self.budget]
+        for i in range(3):
+            category = Category.objects.create(user=self.user, name=f'Extra {i}')
+            budgets.append(Budget.objects.create(user=self.user, name=f'Extra {i}', category=category, amount=0, start_date=self.today))
+        budgets = BudgetEvaluator.evaluate(budgets)
+
+        # Budget lock, existing keys, one insert and one read-back, however
+        # many budgets (plus the savepoint around them)
+        with self.assertNumQueries(6):
+            created = BudgetAlert.create_for(budgets)
+        self.assertEqual(len(created), 4)
+        self.assertEqual(created[0].period_start, self.budget.get_current_period_dates()[0])
+
+        self.assertEqual(BudgetAlert.create_for(budgets), [])
+        self.assertEqual(BudgetAlert.objects.count(), 4)
+
+        # Next period gets its own alert
+        next_period = self.budget.get_current_period_dates()[1] + timedelta(days=1)
+        self.assertEqual(len(BudgetAlert.create_for(budgets[:1], today=next_period)), 1)
+
+
+@override_settings(PROVISION_DEFAULT_CATEGORIES=False)
+class CategoryTreeTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.dining = Category.objects.create(user=self.user, name='Dining', parent_category=self.food)
+        Category.objects.create(user=self.user, name='Coffee', parent_category=self.dining)
+        Category.objects.create(user=self.user, name='Salary', category_type='income')
+
+    def test_tree_shape(self):
+        response = self.client.get('/api/categories/tree/?type=expense')
+        self.assertEqual([node['name'] for node in response.data], ['Food'])
+        dining = response.data[0]['subcategories'][0]
+        self.assertEqual(dining['full_path'], 'Food > Dining')
+        self.assertTrue(dining['has_subcategories'])
+        self.assertEqual(dining['subcategories'][0]['name'], 'Coffee')
+        self.assertFalse(dining['subcategories'][0]['has_subcategories'])
+
+    def test_tree_is_one_query_then_cached(self):
+        # The version check, then the tree
+        with self.assertNumQueries(2):
+            self.client.get('/api/categories/tree/')
+        with self.assertNumQueries(1):
+            self.client.get('/api/categories/tree/')
+
+        Category.objects.create(user=self.user, name='Snacks', parent_category=self.food)
+        response = self.client.get('/api/categories/tree/')
+        food = next(node for node in response.data if node['name'] == 'Food')
+        self.assertEqual([node['name'] for node in food['subcategories']], ['Dining', 'Snacks'])
+
+        self.dining.delete()
+        response = self.client.get('/api/categories/tree/')
+        food = next(node for node in response.data if node['name'] == 'Food')
+        self.assertEqual([node['name'] for node in food['subcategories']], ['Snacks'])
+
+    def test_writes_in_another_process_are_seen(self):
+        self.client.get('/api/categories/tree/')
+        # A write served by another worker leaves this process's cache alone
+        with mock.patch('categories.utils.CategoryTree.invalidate'):
+            Category.objects.filter(pk=self.dining.pk).update(name='Eating out', updated_at=timezone.now())
+            response = self.client.get('/api/categories/tree/')
+            self.assertEqual(response.data[0]['subcategories'][0]['name'], 'Eating out')
+
+            Category.objects.get(name='Coffee').delete()
+            response = self.client.get('/api/categories/tree/')
+            self.assertEqual(response.data[0]['subcategories'][0]['subcategories'], [])
+
+    def test_list_query_count_independent_of_depth(self):
+        # Page count, page rows and the tree map
+        with self.assertNumQueries(3):
+            self.client.get('/api/categories/')
+        parent = self.dining
+        for i in range(5):
+            parent = Category.objects.create(user=self.user, name=f'Level {i}', parent_category=parent)
+        with self.assertNumQueries(3):
+            self.client.get('/api/categories/')
+
+
+@override_settings(PROVISION_DEFAULT_CATEGORIES=False)
+class CategoryHierarchyTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.now().date()
+        self.food = Category.objects.create(user=self.user, name='Food & Dining')
+        self.restaurants = Category.objects.create(user=self.user, name='Restaurants', parent_category=self.food)
+        self.coffee = Category.objects.create(user=self.user, name='Coffee', parent_category=self.restaurants)
+        self.travel = Category.objects.create(user=self.user, name='Travel')
+        self.budget = Budget.objects.create(user=self.user, name='Food', category=self.food, amount=100, start_date=self.today)
+
+    def assertLedgerMatches(self):
+        for budget in Budget.objects.filter(user=self.user):
+            self.assertEqual(budget.spent_amount, budget.compute_spent_amount(*budget.get_current_period_dates()))
+        stored = {
+            (budget_id, start): amount
+            for budget_id, start, amount in BudgetPeriodSpend.objects.exclude(amount=0).values_list('budget_id', 'period_start', 'amount')
+        }
+        self.assertEqual(stored, BudgetPeriodSpend.expected_rows(Budget.objects.filter(user=self.user)))
+
+    def test_paths_and_descendants(self):
+        self.assertEqual(self.coffee.path, f'/{self.food.id}/{self.restaurants.id}/')
+        self.assertEqual(self.coffee.ancestor_ids, [self.food.id, self.restaurants.id])
+        self.assertEqual(
+            set(self.food.get_descendants().values_list('name', flat=True)),
+            {'Restaurants', 'Coffee'}
+        )
+
+    def test_budget_covers_subtree(self):
+        Expense.objects.create(user=self.user, description='Latte', amount=5, category_fk=self.coffee, date=self.today)
+        Expense.objects.create(user=self.user, description='Legacy', amount=20, category='Restaurants', date=self.today)
+        Expense.objects.create(user=self.user, description='Flight', amount=300, category_fk=self.travel, date=self.today)
+        self.assertEqual(Budget.objects.get(pk=self.budget.pk).spent_amount, 25)
+        self.assertLedgerMatches()
+
+    def test_move_updates_paths_and_budgets(self):
+        travel_budget = Budget.objects.create(user=self.user, name='Travel', category=self.travel, amount=100, start_date=self.today)
+        Expense.objects.create(user=self.user, description='Latte', amount=5, category_fk=self.coffee, date=self.today)
+
+        response = self.client.patch(f'/api/categories/{self.restaurants.id}/', {'parent_category': self.travel.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.coffee.refresh_from_db()
+        self.assertEqual(self.coffee.path, f'/{self.travel.id}/{self.restaurants.id}/')
+        self.assertEqual(Budget.objects.get(pk=self.budget.pk).spent_amount, 0)
+        self.assertEqual(Budget.objects.get(pk=travel_budget.pk).spent_amount, 5)
+        self.assertLedgerMatches()
+
+        # A category cannot move under its own descendant
+        response = self.client.patch(f'/api/categories/{self.restaurants.id}/', {'parent_category': self.coffee.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_new_subcategory_picks_up_legacy_expenses(self):
+        Expense.objects.create(user=self.user, description='Bakery', amount=10, category='Pastries', date=self.today)
+        self.assertEqual(Budget.objects.get(pk=self.budget.pk).spent_amount, 0)
+
+        Category.objects.create(user=self.user, name='Pastries', parent_category=self.restaurants)
+        self.assertEqual(Budget.objects.get(pk=self.budget.pk).spent_amount, 10)
+        self.assertLedgerMatches()
+
+    def test_spending_rollup(self):
+        Expense.objects.create(user=self.user, description='Latte', amount=5, category_fk=self.coffee, date=self.today)
+        Expense.objects.create(user=self.user, description='Dinner', amount=40, category_fk=self.restaurants, date=self.today)
+        Expense.objects.create(user=self.user, description='Old', amount=7, category_fk=self.coffee, date=date(2020, 1, 1))
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/categories/spending/?date_from={self.today.replace(day=1)}')
+        totals = {row['name']: (row['own_total'], row['total']) for row in response.data}
+        self.assertEqual(totals['Food & Dining'], (0, 45))
+        self.assertEqual(totals['Restaurants'], (40, 45))
+        self.assertEqual(totals['Coffee'], (5, 5))
+        self.assertEqual([row['name'] for row in response.data][:3], ['Food & Dining', 'Restaurants', 'Coffee'])
+
+
+class DefaultCategoryProvisioningTestCase(TestCase):
+    template = [
+        {'name': 'Groceries', 'category_type': 'expense', 'icon': 'ShoppingCart', 'color': '#E91E63'},
+        {'name': 'Salary', 'category_type': 'income', 'icon': 'Work', 'color': '#4CAF50'},
+    ]
+
+    def test_new_users_are_seeded(self):
+        user = User.objects.create_user(username='testuser', password='testpass')
+        self.assertEqual(Category.objects.filter(user=user).count(), len(get_default_category_template()))
+
+        client = APIClient()
+        client.force_authenticate(user=user)
+        response = client.post('/api/categories/create_defaults/')
+        self.assertEqual(response.data['categories'], [])
+
+    @override_settings(PROVISION_DEFAULT_CATEGORIES=False)
+    def test_provisioning_is_bulk_and_idempotent(self):
+        users = [User.objects.create_user(username=f'user{i}', password='testpass') for i in range(3)]
+        Category.objects.create(user=users[0], name='Salary', category_type='income')
+
+        with self.assertNumQueries(2):
+            created = provision_default_categories([user.id for user in users], template=self.template)
+        self.assertEqual(created[users[0].id], ['Groceries'])
+        self.assertEqual(Category.objects.filter(user__in=users).count(), 6)
+
+        self.assertEqual(provision_default_categories([user.id for user in users], template=self.template), {})
+
+    @override_settings(PROVISION_DEFAULT_CATEGORIES=False)
+    def test_seed_command_batches(self):
+        users = [User.objects.create_user(username=f'user{i}', password='testpass') for i in range(5)]
+        Category.objects.create(user=users[0], name='Own', category_type='expense')
+
+        call_command('seed_default_categories', '--only-empty', '--batch-size', '2', stdout=StringIO())
+        expected = len(get_default_category_template())
+        self.assertEqual(Category.objects.filter(user=users[0]).count(), 1)
+        for user in users[1:]:
+            self.assertEqual(Category.objects.filter(user=user).count(), expected)
+
+
+class BudgetForecasterTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.travel = Category.objects.create(user=self.user, name='Travel')
+        self.today = date(2024, 6, 10)
+        for month in (3, 4, 5):
+            Expense.objects.create(user=self.user, description='Early', amount=50, category_fk=self.food, date=date(2024, month, 1))
+            Expense.objects.create(user=self.user, description='Late', amount=200, category_fk=self.food, date=date(2024, month, 20))
+        Expense.objects.create(user=self.user, description='Now', amount=100, category='Food', date=date(2024, 6, 5))
+        Expense.objects.create(user=self.user, description='Train', amount=30, category_fk=self.travel, date=date(2024, 6, 3))
+        Expense.objects.create(user=self.user, description='Hotel', amount=30, category_fk=self.travel, date=date(2024, 6, 7))
+        self.food_budget = Budget.objects.create(user=self.user, name='Food', category=self.food, amount=250, start_date=date(2024, 1, 1))
+        self.travel_budget = Budget.objects.create(user=self.user, name='Travel', category=self.travel, amount=50, start_date=date(2024, 1, 1))
+        self.inactive = Budget.objects.create(user=self.user, name='Old', amount=10, start_date=date(2024, 1, 1), is_active=False)
+
+    def test_projection(self):
+        budgets = list(Budget.objects.filter(user=self.user))
+        # Budget scopes and one grouped expense query, however many budgets
+        with self.assertNumQueries(2):
+            BudgetForecaster.forecast(budgets, today=self.today)
+        forecasts = {budget.id: budget.forecast for budget in budgets}
+
+        # 10/30 of the month gone: 1/3 run-rate (10/day) and 2/3 history (200 left on average)
+        food = forecasts[self.food_budget.id]
+        self.assertEqual(food['projected_spend'], 300)
+        self.assertEqual(food['daily_run_rate'], 10)
+        self.assertEqual(food['projected_overrun_date'], date(2024, 6, 25))
+
+        # Already over: the day the running total passed the limit
+        self.assertEqual(forecasts[self.travel_budget.id]['projected_overrun_date'], date(2024, 6, 7))
+        self.assertIsNone(forecasts[self.inactive.id]['projected_spend'])
+
+    def test_exposed_in_api(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.get('/api/budgets/summary/')
+        self.assertIn('projected_total_spend', response.data)
+        response = client.get('/api/budgets/')
+        self.assertIn('projected_overrun_date', response.data['results'][0])
+
+
+class BudgetHistoryTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.food = Category.objects.create(user=self.user, name='Food')
+        for day, amount in [(date(2023, 11, 30), 40), (date(2024, 1, 15), 120), (date(2024, 1, 20), 10), (date(2024, 3, 2), 60)]:
+            Expense.objects.create(user=self.user, description='Meal', amount=amount, category_fk=self.food, date=day)
+
+    def test_monthly_history(self):
+        budget = Budget.objects.create(user=self.user, name='Food', category=self.food, amount=100, start_date=date(2023, 12, 10))
+        with self.assertNumQueries(1):
+            history = budget.get_period_history(today=date(2024, 3, 15))
+        self.assertEqual(
+            [(entry['period_start'], entry['spent']) for entry in history],
+            [(date(2023, 12, 1), 0), (date(2024, 1, 1), 130), (date(2024, 2, 1), 0), (date(2024, 3, 1), 60)]
+        )
+        self.assertTrue(history[1]['over_budget'])
+        self.assertEqual(len(budget.get_period_history(today=date(2024, 3, 15), limit=2)), 2)
+
+    def test_quarterly_history_honors_end_date(self):
+        budget = Budget.objects.create(
+            user=self.user, name='Food', category=self.food, amount=500, period='quarterly',
+            start_date=date(2023, 10, 1), end_date=date(2024, 2, 1)
+        )
+        history = budget.get_period_history(today=date(2024, 6, 1))
+        self.assertEqual(
+            [(entry['period_start'], entry['period_end'], entry['spent']) for entry in history],
+            [(date(2023, 10, 1), date(2023, 12, 31), 40), (date(2024, 1, 1), date(2024, 3, 31), 190)]
+        )
+
+    def test_endpoint(self):
+        budget = Budget.objects.create(user=self.user, name='Food', category=self.food, amount=100, period='yearly', start_date=date(2023, 1, 1))
+        response = self.client.get(f'/api/budgets/{budget.id}/history/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['history'][0]['spent'], 40)
+        self.assertEqual(response.data['history'][1]['spent'], 190)
+        self.assertEqual(response.data['periods_over_budget'], 1)
+        response = self.client.get(f'/api/budgets/{budget.id}/history/?periods=1')
+        self.assertEqual(len(response.data['history']), 1)
+        response = self.client.get(f'/api/budgets/{budget.id}/history/?periods=zero')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class EvaluateBudgetAlertsCommandTestCase(TestCase):
+    def test_bulk_evaluation(self):
+        today = timezone.now().date()
+        for i in range(3):
+            user = User.objects.create_user(username=f'user{i}', password='testpass')
+            category = Category.objects.create(user=user, name='Food')
+            Budget.objects.create(user=user, name='Food', category=category, amount=100, start_date=today)
+            Budget.objects.create(user=user, name='Ended', amount=1, start_date=today - timedelta(days=60), end_date=today - timedelta(days=30))
+            # bulk_create skips the per-write alert job, like a backdated load
+            Expense.objects.bulk_create([
+                Expense(user=user, description='Backdated', amount=50 * i, category_fk=category, date=today)
+            ])
+        call_command('reconcile_budget_spend', '--fix', stdout=StringIO())
+
+        out = StringIO()
+        call_command('evaluate_budget_alerts', '--chunk-size', '2', stdout=out)
+        self.assertIn('for 3 users', out.getvalue())
+        self.assertIn('users/sec', out.getvalue())
+        self.assertEqual(
+            sorted(BudgetAlert.objects.values_list('budget__user__username', flat=True)),
+            ['user2']
+        )
+
+        call_command('evaluate_budget_alerts', stdout=StringIO())
+        self.assertEqual(BudgetAlert.objects.count(), 1)
+
+
+class BudgetExpensesTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.now().date()
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.budget = Budget.objects.create(user=self.user, name='Overall', amount=100, start_date=self.today)
+        Expense.objects.bulk_create([
+            Expense(user=self.user, description=f'Item {i}', amount='0.10', category_fk=self.food if i % 2 else None, date=self.today)
+            for i in range(60)
+        ])
+
+    def test_paginated_with_database_totals(self):
+        url = f'/api/budgets/{self.budget.id}/expenses/'
+        # Budget, totals, page count and one page of expenses with categories
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.data['total'], '6.00')
+        self.assertEqual(response.data['count'], 60)
+        self.assertEqual(len(response.data['expenses']), 50)
+        self.assertEqual({e['category'] for e in response.data['expenses']}, {'Food', 'Uncategorized'})
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['expenses']), 10)
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get(url + '?pagination=cursor')
+        self.assertEqual(len(response.data['expenses']), 50)
+        self.assertIn('cursor=', response.data['next'])
@@ -0,0 +1,359 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+from django.utils import timezone
+from django.db.models import Sum, Max, Count
+from .models import Category, BudgetPeriodSpend, get_period_dates, path_ids
+
+
+class BudgetEvaluator:
+    """Compute current-period spend for many budgets at once"""
+
+    @staticmethod
+    def evaluate(budgets, today=None):
+        """
+        Attach spend for the current period to every budget.
+
+        Current-period rows for all budgets are read from the spend ledger
+        in one query. Returns the budgets as a list.
+        """
+        budgets = list(budgets)
+        if not budgets:
+            return budgets
+
+        today = today or timezone.now().date()
+        period_starts = {
+            period: get_period_dates(period, today)[0]
+            for period in {budget.period for budget in budgets}
+        }
+
+        spent = {
+            (budget_id, start): amount
+            for budget_id, start, amount in BudgetPeriodSpend.objects.filter(
+                budget_id__in=[budget.id for budget in budgets],
+                period_start__in=set(period_starts.values())
+            ).values_list('budget_id', 'period_start', 'amount')
+        }
+
+        for budget in budgets:
+            budget._spent_amount = spent.get((budget.id, period_starts[budget.period]), Decimal('0'))
+
+        return budgets
+
+
+class BudgetForecaster:
+    """
+    Project end-of-period spend and the overrun date for many budgets.
+
+    Each user's expenses over the current and previous HISTORY_PERIODS
+    periods are read in one grouped query and laid out as a daily series
+    per (category, legacy text) group. A membership matrix turns that into
+    one daily series per budget, and every projection is computed on the
+    cumulative sums with NumPy.
+
+    The remaining spend is a blend of the current run-rate and the average
+    spend over the same remaining part of previous periods. The run-rate
+    weighs more as the period progresses.
+    """
+    HISTORY_PERIODS = 3
+    EMPTY = {'projected_spend': None, 'projected_overrun_date': None, 'daily_run_rate': None}
+
+    @classmethod
+    def forecast(cls, budgets, today=None):
+        """Attach a forecast dict to every budget as budget._forecast"""
+        budgets = list(budgets)
+        today = today or timezone.now().date()
+
+        by_user = defaultdict(list)
+        for budget in budgets:
+            budget._forecast = dict(cls.EMPTY)
+            ended = budget.end_date and budget.end_date < today
+            if budget.is_active and not ended and budget.start_date <= today:
+                by_user[budget.user_id].append(budget)
+
+        for user_budgets in by_user.values():
+            cls.forecast_user(user_budgets, today)
+        return budgets
+
+    @classmethod
+    def period_bounds(cls, budget, today):
+        """Current (start, end) and the previous periods, most recent first"""
+        start, end = get_period_dates(budget.period, today)
+        if budget.end_date and budget.end_date < end:
+            end = budget.end_date
+        previous = []
+        day = start
+        for _ in range(cls.HISTORY_PERIODS):
+            previous.append(get_period_dates(budget.period, day - timedelta(days=1)))
+            day = previous[-1][0]
+        return start, end, previous
+
+    @classmethod
+    def daily_series(cls, budgets, window_start, today):
+        """(budgets x days) array of matching spend, one query"""
+        from expense.models import Expense
+
+        rows = Expense.objects.filter(
+            user_id=budgets[0].user_id,
+            date__gte=window_start,
+            date__lte=today
+        ).values('date', 'category_fk_id', 'category').annotate(total=Sum('amount')).order_by()
+
+        groups = {}
+        group_index, day_index, totals = [], [], []
+        for row in rows:
+            key = (row['category_fk_id'], row['category'])
+            group_index.append(groups.setdefault(key, len(groups)))
+            day_index.append((row['date'] - window_start).days)
+            totals.append(float(row['total']))
+
+        days = (today - window_start).days + 1
+        by_group = np.zeros((len(groups), days))
+        np.add.at(by_group, (np.array(group_index, dtype=int), np.array(day_index, dtype=int)), totals)
+
+        # membership[b, g]: whether group g counts against budget b
+        group_fks = np.array([fk if fk is not None else -1 for fk, _ in groups], dtype=np.int64)
+        group_names = np.array([name or '' for _, name in groups], dtype=object)
+        membership = np.ones((len(budgets), len(groups)))
+        for row, (_, _, category_ids, category_names) in enumerate(BudgetPeriodSpend.budget_scopes(budgets)):
+            if category_ids is not None:
+                membership[row] = (
+                    np.isin(group_fks, list(category_ids)) |
+                    np.isin(group_names, list(category_names))
+                )
+
+        first_day = int(np.argmax(by_group.any(axis=0))) if len(groups) else days
+        return membership @ by_group, first_day
+
+    @classmethod
+    def forecast_user(cls, budgets, today):
+        bounds = [cls.period_bounds(budget, today) for budget in budgets]
+        window_start = min(previous[-1][0] for _, _, previous in bounds)
+        series, first_day = cls.daily_series(budgets, window_start, today)
+
+        def index(day):
+            return (day - window_start).days
+
+        # cumulative[b, i] = spend before day i of the window
+        cumulative = np.concatenate([np.zeros((len(budgets), 1)), np.cumsum(series, axis=1)], axis=1)
+        rows = np.arange(len(budgets))
+        today_index = index(today)
+
+        start = np.array([index(start) for start, _, _ in bounds])
+        elapsed = today_index - start + 1
+        total = np.array([(end - start_day).days + 1 for start_day, end, _ in bounds])
+        remaining = total - elapsed
+        amount = np.array([float(budget.amount) for budget in budgets])
+
+        spent = cumulative[rows, today_index + 1] - cumulative[rows, start]
+        run_rate = spent / elapsed
+
+        # Spend over the same remaining fraction of each previous period
+        previous_start = np.array([[index(s) for s, _ in previous] for _, _, previous in bounds])
+        previous_end = np.array([[index(e) for _, e in previous] for _, _, previous in bounds])
+        previous_length = previous_end - previous_start + 1
+        split = previous_start + np.rint(elapsed[:, None] / total[:, None] * previous_length).astype(int)
+        history = cumulative[rows[:, None], previous_end + 1] - cumulative[rows[:, None], split]
+        valid = previous_start >= first_day
+        periods = valid.sum(axis=1)
+        history_mean = np.where(periods > 0, (history * valid).sum(axis=1) / np.maximum(periods, 1), 0)
+
+        weight = np.where(periods > 0, elapsed / total, 1.0)
+        projected_remaining = weight * run_rate * remaining + (1 - weight) * history_mean
+        projected = spent + projected_remaining
+        daily_rate = np.divide(projected_remaining, remaining, out=np.zeros(len(budgets)), where=remaining > 0)
+
+        # Already over: the first day the period's running total passed the limit
+        columns = np.arange(cumulative.shape[1])
+        in_period = (columns > start[:, None]) & (columns <= today_index + 1)
+        over = ((cumulative - cumulative[rows, start][:, None]) > amount[:, None]) & in_period
+        crossed = np.argmax(over, axis=1) - 1
+
+        for row, budget in enumerate(budgets):
+            if spent[row] > amount[row]:
+                overrun = window_start + timedelta(days=int(crossed[row]))
+            elif projected[row] > amount[row] and daily_rate[row] > 0:
+                overrun = today + timedelta(days=math.ceil((amount[row] - spent[row]) / daily_rate[row]))
+            else:
+                overrun = None
+            budget._forecast = {
+                'projected_spend': round(float(projected[row]), 2),
+                'projected_overrun_date': overrun,
+                'daily_run_rate': round(float(run_rate[row]), 2),
+            }
+
+
+class CategoryTree:
+    """A user's categories loaded in one query and indexed by parent"""
+    
+    def __init__(self, user):
+        self.user = user
+        self.categories = list(Category.objects.filter(user=user))
+        by_id = {category.id: category for category in self.categories}
+        
+        self.children = defaultdict(list)
+        self.roots = []
+        for category in self.categories:
+            parent = by_id.get(category.parent_category_id)
+            if parent is None:
+                self.roots.append(category)
+                continue
+            # Prime the FK cache so full_path does not query
+            category.parent_category = parent
+            self.children[parent.id].append(category)
+    
+    def walk(self, nodes=None):
+        """Categories depth-first, parents before their children"""
+        for category in self.roots if nodes is None else nodes:
+            yield category
+            yield from self.walk(self.children.get(category.id, []))
+    
+    def spending(self, start_date=None, end_date=None):
+        """
+        {category_id: (own_total, subtree_total)} of expenses between the
+        dates, where subtree_total includes every descendant. One grouped
+        query; legacy expenses count against the category with their name.
+        """
+        from expense.models import Expense
+        
+        by_name = {}
+        for category in sorted(self.categories, key=lambda c: c.category_type != 'expense'):
+            by_name.setdefault(category.name, category.id)
+        
+        expenses = Expense.objects.filter(user=self.user)
+        if start_date:
+            expenses = expenses.filter(date__gte=start_date)
+        if end_date:
+            expenses = expenses.filter(date__lte=end_date)
+        
+        own = defaultdict(Decimal)
+        for row in expenses.values('category_fk_id', 'category').annotate(total=Sum('amount')).order_by():
+            category_id = row['category_fk_id'] or by_name.get(row['category'])
+            if category_id is not None:
+                own[category_id] += row['total']
+        
+        paths = {category.id: category.path for category in self.categories}
+        subtree = defaultdict(Decimal)
+        for category_id, total in own.items():
+            for ancestor_id in [category_id] + path_ids(paths.get(category_id, '/')):
+                subtree[ancestor_id] += total
+        
+        return {
+            category.id: (own.get(category.id, Decimal('0')), subtree.get(category.id, Decimal('0')))
+            for category in self.categories
+        }
+    
+    @staticmethod
+    def cache_key(user_id):
+        return f'category-tree:{user_id}'
+    
+    @classmethod
+    def invalidate(cls, user_id):
+        cache.delete(cls.cache_key(user_id))
+        # Drop it again at commit, in case a reader cached the old tree meanwhile
+        transaction.on_commit(lambda: cache.delete(cls.cache_key(user_id)))
+    
+    @staticmethod
+    def version(user):
+        """
+        Cheap fingerprint of a user's categories. invalidate() only reaches
+        the cache of the process that made the write (the default cache is
+        per process), so readers check the cached tree against this.
+        """
+        stats = Category.objects.filter(user=user).aggregate(latest=Max('updated_at'), count=Count('id'))
+        return (stats['latest'], stats['count'])
+    
+    @classmethod
+    def serialized(cls, user):
+        """Serialized root categories with nested subcategories, cached per user"""
+        from .serializers import CategorySerializer
+        
+        key = cls.cache_key(user.id)
+        version = cls.version(user)
+        cached = cache.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        tree = cls(user)
+        data = CategorySerializer(tree.roots, many=True, context={'category_children': tree.children}).data
+        data = [dict(node) for node in data]
+        cache.set(key, (version, data), settings.CATEGORY_TREE_CACHE_SECONDS)
+        return data
+
+
+def get_default_category_template():
+    return import_string(settings.DEFAULT_CATEGORY_TEMPLATE)
+
+
+def provision_default_categories(user_ids, template=None, batch_size=1000):
+    """
+    Create the template categories each user is missing.
+
+    Existing (user, name, category_type) rows are read in one query and the
+    rest written with bulk_create; ignore_conflicts covers a concurrent
+    provisioning of the same user. Returns {user_id: [names created]}.
+    """
+    user_ids = list(user_ids)
+    template = get_default_category_template() if template is None else template
+    if not user_ids or not template:
+        return {}
+    
+    existing = set(
+        Category.objects.filter(
+            user_id__in=user_ids,
+            name__in={entry['name'] for entry in template}
+        ).values_list('user_id', 'name', 'category_type')
+    )
+    created = defaultdict(list)
+    rows = []
+    for user_id in user_ids:
+        for entry in template:
+            if (user_id, entry['name'], entry.get('category_type', 'expense')) in existing:
+                continue
+            rows.append(Category(user_id=user_id, **entry))
+            created[user_id].append(entry['name'])
+    
+    Category.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+    for user_id in created:
+        CategoryTree.invalidate(user_id)
+    return dict(created)
+
+
+def resolve_expense_categories(pairs, create_missing=True):
+    """
+    Map (user_id, name) pairs to expense categories, creating the missing
+    ones in bulk. Expense-type categories win over 'both' for a name.
+    Returns {(user_id, name): Category}.
+    """
+    pairs = {(user_id, name) for user_id, name in pairs if name}
+    if not pairs:
+        return {}
+    
+    def lookup():
+        found = {}
+        categories = Category.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            name__in={name for _, name in pairs},
+            category_type__in=['expense', 'both']
+        ).order_by('category_type', 'id')  # 'expense' sorts last, so it wins
+        for category in categories:
+            if (category.user_id, category.name) in pairs:
+                found[(category.user_id, category.name)] = category
+        return found
+    
+    found = lookup()
+    missing = pairs - set(found)
+    if missing and create_missing:
+        Category.objects.bulk_create(
+            [Category(user_id=user_id, name=name, category_type='expense') for user_id, name in missing],
+            ignore_conflicts=True
+        )
+        for user_id in {user_id for user_id, _ in missing}:
+            CategoryTree.invalidate(user_id)
+        found = lookup()
+    return found
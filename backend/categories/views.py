@@ -2,10 +2,16 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q, Sum
+from django.db.models import Q, Sum, Count, Prefetch
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from decimal import Decimal
+from finance_tracker.eager_loading import EagerLoadingMixin
+from finance_tracker.pagination import LedgerPagination
 from .models import Category, Budget, BudgetAlert
 from .serializers import CategorySerializer, BudgetSerializer, BudgetAlertSerializer
+from .utils import BudgetEvaluator, BudgetForecaster, CategoryTree, provision_default_categories
+from .tasks import create_budget_alerts
 
 class CategoryViewSet(viewsets.ModelViewSet):
     serializer_class = CategorySerializer
@@ -29,7 +35,14 @@ class CategoryViewSet(viewsets.ModelViewSet):
         if parents_only and parents_only.lower() == 'true':
             queryset = queryset.filter(parent_category__isnull=True)
         
-        return queryset
+        return queryset.select_related('parent_category')
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'list':
+            # Nested subcategories come from one query instead of one per node
+            context['category_children'] = CategoryTree(self.request.user).children
+        return context
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -37,9 +50,42 @@ class CategoryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def tree(self, request):
         """Get categories in tree structure"""
-        categories = self.get_queryset().filter(parent_category__isnull=True)
-        serializer = self.get_serializer(categories, many=True)
-        return Response(serializer.data)
+        roots = CategoryTree.serialized(request.user)
+        
+        # Same filters as get_queryset(), applied to the cached roots
+        category_type = request.query_params.get('type', None)
+        if category_type:
+            roots = [node for node in roots if node['category_type'] in (category_type, 'both')]
+        
+        is_active = request.query_params.get('is_active', None)
+        if is_active is not None:
+            roots = [node for node in roots if node['is_active'] == (is_active.lower() == 'true')]
+        
+        return Response(roots)
+    
+    @action(detail=False, methods=['get'])
+    def spending(self, request):
+        """Expense totals per category, rolled up over all subcategories"""
+        dates = {}
+        for param in ('date_from', 'date_to'):
+            value = request.query_params.get(param)
+            dates[param] = parse_date(value) if value else None
+            if value and dates[param] is None:
+                return Response({param: 'Use the YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        tree = CategoryTree(request.user)
+        totals = tree.spending(dates['date_from'], dates['date_to'])
+        return Response([
+            {
+                'id': category.id,
+                'name': category.name,
+                'full_path': category.full_path,
+                'parent_category': category.parent_category_id,
+                'own_total': totals[category.id][0],
+                'total': totals[category.id][1],
+            }
+            for category in tree.walk()
+        ])
     
     @action(detail=False, methods=['get'])
     def expense_categories(self, request):
@@ -62,47 +108,31 @@ class CategoryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def create_defaults(self, request):
         """Create default categories for new users"""
-        default_categories = [
-            # Expense categories
-            {'name': 'Food & Dining', 'category_type': 'expense', 'icon': 'Restaurant', 'color': '#FF5722'},
-            {'name': 'Transportation', 'category_type': 'expense', 'icon': 'DirectionsCar', 'color': '#795548'},
-            {'name': 'Shopping', 'category_type': 'expense', 'icon': 'ShoppingCart', 'color': '#E91E63'},
-            {'name': 'Entertainment', 'category_type': 'expense', 'icon': 'Movie', 'color': '#9C27B0'},
-            {'name': 'Bills & Utilities', 'category_type': 'expense', 'icon': 'Receipt', 'color': '#3F51B5'},
-            {'name': 'Healthcare', 'category_type': 'expense', 'icon': 'LocalHospital', 'color': '#00BCD4'},
-            {'name': 'Education', 'category_type': 'expense', 'icon': 'School', 'color': '#009688'},
-            {'name': 'Personal Care', 'category_type': 'expense', 'icon': 'Spa', 'color': '#4CAF50'},
-            {'name': 'Rent/Mortgage', 'category_type': 'expense', 'icon': 'Home', 'color': '#FF9800'},
-            {'name': 'Insurance', 'category_type': 'expense', 'icon': 'Security', 'color': '#607D8B'},
-            
-            # Income categories
-            {'name': 'Salary', 'category_type': 'income', 'icon': 'Work', 'color': '#4CAF50'},
-            {'name': 'Freelance', 'category_type': 'income', 'icon': 'Computer', 'color': '#2196F3'},
-            {'name': 'Investment', 'category_type': 'income', 'icon': 'TrendingUp', 'color': '#FF9800'},
-            {'name': 'Business', 'category_type': 'income', 'icon': 'Business', 'color': '#9C27B0'},
-            {'name': 'Other Income', 'category_type': 'income', 'icon': 'AttachMoney', 'color': '#607D8B'},
-        ]
-        
-        created_categories = []
-        for cat_data in default_categories:
-            category, created = Category.objects.get_or_create(
-                user=request.user,
-                name=cat_data['name'],
-                defaults=cat_data
-            )
-            if created:
-                created_categories.append(category)
+        names = provision_default_categories([request.user.id]).get(request.user.id, [])
+        created_categories = Category.objects.filter(user=request.user, name__in=names)
         
         serializer = self.get_serializer(created_categories, many=True)
         return Response({
-            'message': f'Created {len(created_categories)} default categories',
+            'message': f'Created {len(serializer.data)} default categories',
             'categories': serializer.data
         })
 
 
-class BudgetViewSet(viewsets.ModelViewSet):
+class BudgetViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = BudgetSerializer
     permission_classes = [IsAuthenticated]
+    select_related = ['category']
+    
+    def get_prefetch_related(self):
+        # BudgetSerializer.recent_alerts: the 3 latest unread alerts per budget,
+        # only for actions that serialize budgets
+        if self.action not in ('list', 'retrieve', 'update', 'partial_update', 'summary'):
+            return []
+        return [Prefetch(
+            'alerts',
+            queryset=BudgetAlert.objects.filter(is_read=False).order_by('-alert_date')[:BudgetSerializer.RECENT_ALERTS],
+            to_attr='recent_unread_alerts'
+        )]
     
     def get_queryset(self):
         queryset = Budget.objects.filter(user=self.request.user)
@@ -127,21 +157,28 @@ class BudgetViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            budgets = BudgetForecaster.forecast(BudgetEvaluator.evaluate(page))
+            serializer = self.get_serializer(budgets, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        budgets = BudgetForecaster.forecast(BudgetEvaluator.evaluate(queryset))
+        serializer = self.get_serializer(budgets, many=True)
+        return Response(serializer.data)
+    
     def perform_create(self, serializer):
         budget = serializer.save(user=self.request.user)
         # Check if budget is already over threshold
-        if budget.is_near_limit:
-            BudgetAlert.objects.create(
-                budget=budget,
-                percentage_reached=budget.spent_percentage,
-                amount_spent=budget.spent_amount,
-                message=f"Budget '{budget.name}' has reached {budget.spent_percentage}% of the limit!"
-            )
+        create_budget_alerts([budget])
     
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """Get budget summary for dashboard"""
-        budgets = self.get_queryset().filter(is_active=True)
+        budgets = BudgetForecaster.forecast(BudgetEvaluator.evaluate(self.eager_load(self.get_queryset().filter(is_active=True))))
         
         total_budget = sum(float(budget.amount) for budget in budgets)
         total_spent = sum(float(budget.spent_amount) for budget in budgets)
@@ -149,6 +186,10 @@ class BudgetViewSet(viewsets.ModelViewSet):
         
         over_budget = [budget for budget in budgets if budget.is_over_budget]
         near_limit = [budget for budget in budgets if budget.is_near_limit and not budget.is_over_budget]
+        projected_over = [
+            budget for budget in budgets
+            if budget.forecast['projected_overrun_date'] and not budget.is_over_budget
+        ]
         
         return Response({
             'total_budget': total_budget,
@@ -160,37 +201,42 @@ class BudgetViewSet(viewsets.ModelViewSet):
             'near_limit_count': len(near_limit),
             'over_budget': BudgetSerializer(over_budget, many=True).data,
             'near_limit': BudgetSerializer(near_limit, many=True).data,
+            'projected_total_spend': round(sum(budget.forecast['projected_spend'] or 0 for budget in budgets), 2),
+            'projected_over_budget_count': len(projected_over),
+            'projected_over_budget': BudgetSerializer(projected_over, many=True).data,
         })
     
     @action(detail=False, methods=['post'])
     def check_alerts(self, request):
         """Check all budgets and create alerts if needed"""
-        budgets = self.get_queryset().filter(is_active=True)
-        alerts_created = []
-        
-        for budget in budgets:
-            if budget.is_near_limit:
-                # Check if alert already exists for this period
-                start_date, end_date = budget.get_current_period_dates()
-                existing_alert = budget.alerts.filter(
-                    alert_date__date__gte=start_date,
-                    alert_date__date__lte=end_date
-                ).exists()
-                
-                if not existing_alert:
-                    alert = BudgetAlert.objects.create(
-                        budget=budget,
-                        percentage_reached=budget.spent_percentage,
-                        amount_spent=budget.spent_amount,
-                        message=f"Budget '{budget.name}' has reached {budget.spent_percentage}% of the limit!"
-                    )
-                    alerts_created.append(alert)
+        alerts_created = create_budget_alerts(self.get_queryset().filter(is_active=True))
         
         return Response({
             'alerts_created': len(alerts_created),
             'alerts': BudgetAlertSerializer(alerts_created, many=True).data
         })
     
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """Spend for each past period since the budget started, for charting"""
+        budget = self.get_object()
+        
+        limit = request.query_params.get('periods')
+        if limit is not None:
+            if not limit.isdigit() or int(limit) < 1:
+                return Response({'periods': 'Must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+            limit = int(limit)
+        
+        history = budget.get_period_history(limit=limit)
+        return Response({
+            'budget': budget.id,
+            'period': budget.period,
+            'amount': float(budget.amount),
+            'periods_over_budget': sum(1 for entry in history if entry['over_budget']),
+            'average_spent': round(sum(entry['spent'] for entry in history) / len(history), 2) if history else 0,
+            'history': history,
+        })
+    
     @action(detail=True, methods=['get'])
     def expenses(self, request, pk=None):
         """Get expenses for this budget in current period"""
@@ -200,40 +246,48 @@ class BudgetViewSet(viewsets.ModelViewSet):
         start_date, end_date = budget.get_current_period_dates()
         
         expenses = Expense.objects.filter(
+            budget.expense_filter(),
             user=request.user,
             date__gte=start_date,
             date__lte=end_date
         )
+        totals = expenses.aggregate(total=Sum('amount'), count=Count('id'))
         
-        if budget.category:
-            expenses = expenses.filter(
-                Q(category=budget.category.name) | 
-                Q(category_fk=budget.category)
-            )
-        
-        # Simple serialization
-        expense_data = []
-        for expense in expenses:
-            expense_data.append({
+        paginator = LedgerPagination()
+        page = paginator.paginate_queryset(
+            expenses.select_related('category_fk').order_by('-date', '-created_at', '-id'),
+            request,
+            view=self
+        )
+        expense_data = [
+            {
                 'id': expense.id,
                 'description': expense.description,
                 'amount': str(expense.amount),
                 'date': expense.date,
-                'category': getattr(expense.category_fk, 'name', expense.category) if expense.category_fk else expense.category or 'Uncategorized'
-            })
+                'category': expense.category_fk.name if expense.category_fk else expense.category or 'Uncategorized'
+            }
+            for expense in page
+        ]
+        links = paginator.get_paginated_response(expense_data).data
         
         return Response({
             'period_start': start_date,
             'period_end': end_date,
-            'total': sum(float(e['amount']) for e in expense_data),
-            'count': len(expense_data),
+            # Summed by the database; quantized because SQLite sums in
+            # floating point, and a string keeps it exact
+            'total': str((totals['total'] or Decimal('0')).quantize(Decimal('0.01'))),
+            'count': totals['count'],
+            'next': links['next'],
+            'previous': links['previous'],
             'expenses': expense_data
         })
 
 
-class BudgetAlertViewSet(viewsets.ModelViewSet):
+class BudgetAlertViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = BudgetAlertSerializer
     permission_classes = [IsAuthenticated]
+    select_related = ['budget']
     
     def get_queryset(self):
         return BudgetAlert.objects.filter(budget__user=self.request.user)
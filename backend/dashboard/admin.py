@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import ExchangeRate
 
-# Register your models here.
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ['base_currency', 'quote_currency', 'rate', 'date']
+    list_filter = ['base_currency', 'quote_currency']
+    date_hierarchy = 'date'
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from dashboard.models import MonthlyRollup
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly income/expense rollup from raw rows, or check it for drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Limit to a single username')
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report rows that differ from the raw tables; do not write'
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        if not options['check']:
+            count = MonthlyRollup.rebuild(user=user)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} rollup rows"))
+            return
+
+        expected = MonthlyRollup.expected_rows(user=user)
+        current = MonthlyRollup.current_rows(user=user)
+
+        drift = 0
+        for key in sorted(set(expected) | set(current), key=str):
+            if expected.get(key) != current.get(key):
+                drift += 1
+                self.stdout.write(
+                    f"  {key}: stored={current.get(key)} expected={expected.get(key)}"
+                )
+
+        if drift:
+            raise CommandError(f"{drift} rollup rows have drifted; run rebuild_rollups to fix")
+        self.stdout.write(self.style.SUCCESS(f"Rollup matches raw data ({len(expected)} rows)"))
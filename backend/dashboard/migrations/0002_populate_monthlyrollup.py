@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear
+
+
+def populate_rollups(apps, schema_editor):
+    MonthlyRollup = apps.get_model('dashboard', 'MonthlyRollup')
+    Expense = apps.get_model('expense', 'Expense')
+    Income = apps.get_model('income', 'Income')
+    Transaction = apps.get_model('transaction', 'Transaction')
+
+    sources = [
+        ('expense', Expense.objects.annotate(
+            entry=Value('expense'),
+            cur=Value(settings.FINANCE_TRACKER['DEFAULT_CURRENCY']),
+            label=Coalesce('category_fk__name', 'category', Value(''))
+        )),
+        ('income', Income.objects.annotate(entry=Value('income'), cur=F('currency'), label=Value(''))),
+        ('transaction', Transaction.objects.annotate(entry=F('transaction_type'), cur=F('currency'), label=Value(''))),
+    ]
+
+    rows = []
+    for source, queryset in sources:
+        grouped = queryset.annotate(
+            y=ExtractYear('date'),
+            m=ExtractMonth('date')
+        ).values('user_id', 'entry', 'y', 'm', 'cur', 'label').annotate(
+            sum_amount=Sum('amount'),
+            row_count=Count('id')
+        ).order_by()
+        for row in grouped:
+            rows.append(MonthlyRollup(
+                user_id=row['user_id'],
+                source=source,
+                entry_type=row['entry'],
+                year=row['y'],
+                month=row['m'],
+                currency=row['cur'],
+                category=row['label'],
+                total=row['sum_amount'] or 0,
+                count=row['row_count'],
+            ))
+    MonthlyRollup.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+        ('expense', '0004_expense_category_fk'),
+        ('income', '0002_alter_income_options_alter_income_frequency'),
+        ('transaction', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,254 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.contrib.auth.models import User
+from django.db.models import F, Sum, Count, Value
+from django.db.models.functions import ExtractYear, ExtractMonth, Coalesce
+from django.utils.dateparse import parse_date
+from decimal import Decimal
 
-# Create your models here.
+
+class MonthlyRollup(models.Model):
+    """
+    Per-user monthly totals for income, expenses and transactions.
+    Kept in step with the source rows by their save()/delete() so the
+    dashboard and summaries read O(months) rows instead of O(transactions).
+    """
+    SOURCES = [
+        ('income', 'Income'),
+        ('expense', 'Expense'),
+        ('transaction', 'Transaction'),
+    ]
+
+    ENTRY_TYPES = [
+        ('income', 'Income'),
+        ('expense', 'Expense'),
+        ('transfer', 'Transfer'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_rollups')
+    source = models.CharField(max_length=20, choices=SOURCES)
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    currency = models.CharField(max_length=3)
+    category = models.CharField(max_length=100, blank=True, default='')
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-year', '-month']
+        unique_together = ['user', 'source', 'entry_type', 'year', 'month', 'currency', 'category']
+
+    KEY_FIELDS = ('user_id', 'source', 'entry_type', 'year', 'month', 'currency', 'category')
+
+    def __str__(self):
+        return f"{self.user} {self.source}/{self.entry_type} {self.year}-{self.month:02d} {self.currency}: {self.total}"
+
+    @classmethod
+    def key_for(cls, instance):
+        """Build the rollup key for a source row that defines rollup_key()"""
+        key = instance.rollup_key()
+        date = instance.date
+        if isinstance(date, str):
+            date = parse_date(date)
+        return (
+            instance.user_id,
+            key['source'],
+            key['entry_type'],
+            date.year,
+            date.month,
+            key['currency'],
+            key['category'] or '',
+        )
+
+    @classmethod
+    def adjust(cls, key, amount, count):
+        """Add amount/count to the row for key, creating it if needed"""
+        lookup = dict(zip(cls.KEY_FIELDS, key))
+        updated = cls.objects.filter(**lookup).update(
+            total=F('total') + amount,
+            count=F('count') + count
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(total=amount, count=count, **lookup)
+        except IntegrityError:
+            # Another writer created the row first
+            cls.objects.filter(**lookup).update(
+                total=F('total') + amount,
+                count=F('count') + count
+            )
+
+    @classmethod
+    def record_change(cls, previous, current):
+        """
+        Apply the difference between two versions of a source row.
+        Either side may be None for a create or delete.
+        """
+        if previous is not None and current is not None:
+            old_key = cls.key_for(previous)
+            new_key = cls.key_for(current)
+            if old_key == new_key:
+                delta = Decimal(str(current.amount)) - Decimal(str(previous.amount))
+                if delta:
+                    cls.adjust(new_key, delta, 0)
+                return
+        if previous is not None:
+            cls.adjust(cls.key_for(previous), -Decimal(str(previous.amount)), -1)
+        if current is not None:
+            cls.adjust(cls.key_for(current), Decimal(str(current.amount)), 1)
+
+    @classmethod
+    def collect(cls, instances, deltas):
+        """Accumulate (amount, count) per rollup key for rows written in bulk"""
+        for instance in instances:
+            key = cls.key_for(instance)
+            amount, count = deltas.get(key, (Decimal('0'), 0))
+            deltas[key] = (amount + Decimal(str(instance.amount)), count + 1)
+        return deltas
+
+    @classmethod
+    def apply_deltas(cls, deltas):
+        for key, (amount, count) in deltas.items():
+            cls.adjust(key, amount, count)
+
+    @classmethod
+    def expected_rows(cls, user=None, categories=None):
+        """
+        Recompute the rollup from the raw tables, or only the expense rows
+        labelled with one of the given category names
+        """
+        from django.conf import settings
+        from expense.models import Expense
+        from income.models import Income
+        from transaction.models import Transaction
+
+        default_currency = settings.FINANCE_TRACKER['DEFAULT_CURRENCY']
+        sources = [
+            ('expense', Expense.objects.annotate(
+                entry=Value('expense'),
+                cur=Value(default_currency),
+                label=Coalesce('category_fk__name', 'category', Value(''))
+            )),
+            ('income', Income.objects.annotate(
+                entry=Value('income'),
+                cur=F('currency'),
+                label=Value('')
+            )),
+            ('transaction', Transaction.objects.annotate(
+                entry=F('transaction_type'),
+                cur=F('currency'),
+                label=Value('')
+            )),
+        ]
+
+        if categories is not None:
+            sources = [(source, queryset.filter(label__in=categories)) for source, queryset in sources if source == 'expense']
+
+        rows = {}
+        for source, queryset in sources:
+            if user is not None:
+                queryset = queryset.filter(user=user)
+            grouped = queryset.annotate(
+                y=ExtractYear('date'),
+                m=ExtractMonth('date')
+            ).values('user_id', 'entry', 'y', 'm', 'cur', 'label').annotate(
+                sum_amount=Sum('amount'),
+                row_count=Count('id')
+            ).order_by()
+            for row in grouped:
+                key = (row['user_id'], source, row['entry'], row['y'], row['m'], row['cur'], row['label'])
+                rows[key] = (row['sum_amount'] or Decimal('0'), row['row_count'])
+        return rows
+
+    @classmethod
+    def current_rows(cls, user=None):
+        queryset = cls.objects.all()
+        if user is not None:
+            queryset = queryset.filter(user=user)
+        return {
+            tuple(row[field] for field in cls.KEY_FIELDS): (row['total'], row['count'])
+            for row in queryset.values(*cls.KEY_FIELDS, 'total', 'count')
+            if row['count'] or row['total']
+        }
+
+    @classmethod
+    def rebuild(cls, user=None):
+        """Replace the rollup rows (for one user or everyone) from the raw tables"""
+        expected = cls.expected_rows(user=user)
+        with transaction.atomic():
+            queryset = cls.objects.all()
+            if user is not None:
+                queryset = queryset.filter(user=user)
+            queryset.delete()
+            cls.objects.bulk_create(
+                [
+                    cls(total=total, count=count, **dict(zip(cls.KEY_FIELDS, key)))
+                    for key, (total, count) in expected.items()
+                ],
+                batch_size=1000
+            )
+        return len(expected)
+
+    @classmethod
+    def rebuild_categories(cls, user, names):
+        """
+        Re-key a user's expense rows for the given category names, e.g.
+        after a category is renamed or deleted. Expense rows are labelled
+        by category name, so only the rows under those names can change.
+        """
+        names = {name or '' for name in names}
+        expected = cls.expected_rows(user=user, categories=names)
+        with transaction.atomic():
+            cls.objects.filter(user=user, source='expense', category__in=names).delete()
+            cls.objects.bulk_create(
+                [
+                    cls(total=total, count=count, **dict(zip(cls.KEY_FIELDS, key)))
+                    for key, (total, count) in expected.items()
+                ],
+                batch_size=1000
+            )
+        return len(expected)
+
+
+class ExchangeRate(models.Model):
+    """
+    Locally stored currency rates, one row per pair per day, so reports can
+    convert totals without calling the rates API. 1 base_currency = rate
+    quote_currency.
+    """
+    base_currency = models.CharField(max_length=3)
+    quote_currency = models.CharField(max_length=3)
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+    date = models.DateField()
+
+    class Meta:
+        ordering = ['-date']
+        unique_together = ['base_currency', 'quote_currency', 'date']
+
+    def __str__(self):
+        return f"1 {self.base_currency} = {self.rate} {self.quote_currency} ({self.date})"
+
+    @classmethod
+    def rates_to(cls, currencies, target, on):
+        """
+        Rate converting each of currencies into target, from the latest row
+        on or before the date; inverse pairs are used when that is what is
+        stored. Currencies with no rate are left out. One indexed lookup
+        per currency, however long the rate history.
+        """
+        rates = {}
+        for currency in set(currencies):
+            if currency == target:
+                rates[currency] = Decimal('1')
+                continue
+            row = cls.objects.filter(
+                models.Q(base_currency=currency, quote_currency=target) |
+                models.Q(base_currency=target, quote_currency=currency),
+                date__lte=on
+            ).order_by('-date').values_list('quote_currency', 'rate').first()
+            if row is not None:
+                quote, rate = row
+                rates[currency] = rate if quote == target else 1 / rate
+        return rates
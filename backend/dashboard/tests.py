@@ -1,3 +1,203 @@
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from expense.models import Expense
+from income.models import Income
+from categories.models import Category, Budget
+from transaction.models import Transaction
+from money_transfer.models import MoneyTransfer
+from debt.models import Debt, DebtPayment
+from accounts.models import USAccount, KenyaAccount
+from .models import MonthlyRollup
+from .utils import LedgerFeed
+from .views import LedgerView
 
-# Create your tests here.
+class DashboardTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.now().date()
+
+    def create_budgets(self, count):
+        for i in range(count):
+            category = Category.objects.create(user=self.user, name=f'Category {i}')
+            Budget.objects.create(
+                user=self.user,
+                name=f'Budget {i}',
+                category=category,
+                amount=100,
+                start_date=self.today - timedelta(days=i)
+            )
+            Expense.objects.create(
+                user=self.user,
+                description=f'Expense {i}',
+                amount=90,
+                category_fk=category,
+                date=self.today
+            )
+
+    def test_overview_totals(self):
+        Income.objects.create(user=self.user, source='Salary', amount=1000, date=self.today)
+        Expense.objects.create(user=self.user, description='Lunch', amount=25, date=self.today)
+
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['overview']['total_income'], 1000.0)
+        self.assertEqual(response.data['overview']['monthly_expenses'], 25.0)
+        self.assertEqual(response.data['overview']['net_balance'], 975.0)
+
+    def test_budget_counts(self):
+        self.create_budgets(2)
+        Budget.objects.create(user=self.user, name='Overall', amount=100, start_date=self.today)
+
+        response = self.client.get('/api/dashboard/')
+        budgets = response.data['summary']['budgets']
+        self.assertEqual(budgets['total'], 3)
+        self.assertEqual(budgets['over_budget'], 1)
+        self.assertEqual(budgets['near_limit'], 2)
+
+    def test_query_count_independent_of_budgets(self):
+        # The query count must not grow with the number of budgets
+        self.create_budgets(1)
+        with self.assertNumQueries(7):
+            self.client.get('/api/dashboard/')
+
+        for i in range(1, 10):
+            category = Category.objects.create(user=self.user, name=f'Extra {i}')
+            Budget.objects.create(user=self.user, name=f'Extra {i}', category=category, amount=100, start_date=self.today)
+        with self.assertNumQueries(7):
+            self.client.get('/api/dashboard/')
+
+
+class MonthlyRollupTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.today = timezone.now().date()
+
+    def assertRollupMatches(self):
+        self.assertEqual(
+            MonthlyRollup.current_rows(user=self.user),
+            MonthlyRollup.expected_rows(user=self.user)
+        )
+
+    def test_create_update_delete(self):
+        category = Category.objects.create(user=self.user, name='Food')
+        expense = Expense.objects.create(user=self.user, description='Lunch', amount=25, date=self.today)
+        Income.objects.create(user=self.user, source='Salary', amount=1000, currency='KES', date=self.today)
+        self.assertRollupMatches()
+
+        expense.amount = 40
+        expense.category_fk = category
+        expense.date = self.today - timedelta(days=45)
+        expense.save()
+        self.assertRollupMatches()
+
+        expense.delete()
+        self.assertRollupMatches()
+
+    def test_category_rename_and_delete(self):
+        groceries = Category.objects.create(user=self.user, name='Groceries')
+        snacks = Category.objects.create(user=self.user, name='Snacks', parent_category=groceries)
+        Expense.objects.create(user=self.user, description='Market', amount=30, category_fk=groceries, date=self.today)
+        Expense.objects.create(user=self.user, description='Chips', amount=5, category_fk=snacks, category='Treats', date=self.today)
+        Expense.objects.create(user=self.user, description='Legacy', amount=10, category='Groceries', date=self.today)
+        Expense.objects.create(user=self.user, description='Legacy', amount=7, category='Food stuff', date=self.today)
+
+        groceries.name = 'Food stuff'
+        groceries.save()
+        self.assertRollupMatches()
+        call_command('rebuild_rollups', '--check', stdout=StringIO())
+
+        groceries.delete()
+        self.assertRollupMatches()
+        self.assertEqual(
+            set(MonthlyRollup.objects.filter(source='expense').values_list('category', 'total')),
+            {('Food stuff', 7), ('Groceries', 10), ('', 30), ('Treats', 5)}
+        )
+
+    def test_rebuild_and_check_command(self):
+        Expense.objects.create(user=self.user, description='Lunch', amount=25, date=self.today)
+        MonthlyRollup.objects.update(total=999)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollups', '--check', stdout=StringIO())
+
+        call_command('rebuild_rollups', stdout=StringIO())
+        call_command('rebuild_rollups', '--check', stdout=StringIO())
+        self.assertRollupMatches()
+
+
+class LedgerFeedTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.other = User.objects.create_user(username='other', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.checking = USAccount.objects.create(user=self.user, account_name='Checking', balance=1000)
+        self.mpesa = KenyaAccount.objects.create(user=self.user, account_name='M-Pesa', balance_kes=5000)
+        debt = Debt.objects.create(
+            user=self.user, name='Car loan', principal_amount=1000, interest_rate=0,
+            term_months=10, start_date=date(2024, 1, 1), current_balance=1000
+        )
+        # Several rows per day, spread over the sources
+        for day in range(1, 6):
+            on = date(2024, 3, day)
+            Income.objects.create(user=self.user, source=f'Salary {day}', amount=100, date=on, us_account=self.checking)
+            Expense.objects.create(user=self.user, description=f'Lunch {day}', amount=10, date=on)
+            Transaction.objects.create(
+                user=self.user, transaction_type='expense', amount=20, currency='KES',
+                date=on, description=f'Airtime {day}', kenya_account=self.mpesa
+            )
+            MoneyTransfer.objects.create(
+                user=self.user, from_us_account=self.checking, to_kenya_account=self.mpesa,
+                amount=50, exchange_rate=130, scheduled_date=on
+            )
+            DebtPayment.objects.create(debt=debt, payment_date=on, amount=100)
+        Expense.objects.create(user=self.other, description='Not mine', amount=99, date=date(2024, 3, 3))
+
+    def walk(self, query=''):
+        rows = []
+        url = f'/api/ledger/{query}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            rows.extend(response.data['results'])
+            url = response.data['next']
+        return rows
+
+    def test_pages_merge_every_source_in_order(self):
+        with mock.patch.object(LedgerView, 'page_size', 7):
+            with self.assertNumQueries(len(LedgerFeed.TYPES)):
+                self.client.get('/api/ledger/')
+            rows = self.walk()
+
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(len({(row['type'], row['id']) for row in rows}), 25)
+        keys = [LedgerFeed.sort_key(row) for row in rows]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+        self.assertEqual(rows[0]['date'], date(2024, 3, 5))
+
+        payment = next(row for row in rows if row['type'] == 'debt_payment')
+        self.assertEqual((payment['description'], payment['entry_type'], payment['currency']), ('Car loan', 'expense', 'USD'))
+        transfer = next(row for row in rows if row['type'] == 'transfer')
+        self.assertEqual((transfer['currency'], transfer['us_account']), ('USD', self.checking.id))
+
+    def test_type_and_account_filters(self):
+        rows = self.walk('?type=income,expense')
+        self.assertEqual({row['type'] for row in rows}, {'income', 'expense'})
+        self.assertEqual(len(rows), 10)
+
+        rows = self.walk(f'?kenya_account={self.mpesa.id}')
+        self.assertEqual({row['type'] for row in rows}, {'transaction', 'transfer'})
+        self.assertEqual(len(rows), 10)
+
+        self.assertEqual(self.client.get('/api/ledger/?type=goal').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/ledger/?cursor=nonsense').status_code, status.HTTP_404_NOT_FOUND)
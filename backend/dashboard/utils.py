@@ -0,0 +1,246 @@
+import heapq
+from itertools import islice
+from django.conf import settings
+from django.db.models import Q, Sum, F, Value, Case, When, CharField, IntegerField
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from income.models import Income
+from expense.models import Expense
+from transaction.models import Transaction
+from money_transfer.models import MoneyTransfer
+from debt.models import DebtPayment
+from goals.models import Goal
+from categories.models import Budget, BudgetAlert
+from categories.utils import BudgetEvaluator
+from .models import MonthlyRollup
+
+
+class DashboardAggregator:
+    """Build the dashboard overview in a fixed number of queries"""
+
+    RECENT_LIMIT = 5
+
+    def __init__(self, user):
+        self.user = user
+        self.today = timezone.now().date()
+
+    def ledger_totals(self):
+        """
+        All-time and current-month income and expenses in a single query
+        over the monthly rollup, so the cost grows with months, not rows.
+        """
+        this_month = Q(year=self.today.year, month=self.today.month)
+        is_income = Q(source='income')
+        is_expense = Q(source='expense')
+        totals = MonthlyRollup.objects.filter(
+            user=self.user,
+            source__in=['income', 'expense']
+        ).aggregate(
+            total_income=Sum('total', filter=is_income),
+            monthly_income=Sum('total', filter=is_income & this_month),
+            total_expenses=Sum('total', filter=is_expense),
+            monthly_expenses=Sum('total', filter=is_expense & this_month),
+        )
+        return {key: value or 0 for key, value in totals.items()}
+
+    def recent_expenses(self):
+        return Expense.objects.filter(user=self.user).select_related(
+            'category_fk'
+        ).order_by('-date', '-created_at')[:self.RECENT_LIMIT]
+
+    def recent_income(self):
+        return Income.objects.filter(user=self.user).order_by('-date', '-created_at')[:self.RECENT_LIMIT]
+
+    def summary_counts(self):
+        active_goals = Goal.objects.filter(user=self.user, deadline__gte=self.today).count()
+        unread_alerts = BudgetAlert.objects.filter(budget__user=self.user, is_read=False).count()
+        return active_goals, unread_alerts
+
+    def budget_summary(self):
+        """Over/near-limit counts for all active budgets"""
+        budgets = BudgetEvaluator.evaluate(
+            Budget.objects.filter(user=self.user, is_active=True).select_related('category')
+        )
+        return {
+            'total': len(budgets),
+            'over_budget': sum(1 for b in budgets if b.is_over_budget),
+            'near_limit': sum(1 for b in budgets if b.is_near_limit and not b.is_over_budget)
+        }
+
+    def build(self):
+        totals = self.ledger_totals()
+        total_income = totals['total_income']
+        monthly_income = totals['monthly_income']
+        total_expenses = totals['total_expenses']
+        monthly_expenses = totals['monthly_expenses']
+        active_goals, unread_alerts = self.summary_counts()
+
+        return {
+            'overview': {
+                'total_income': float(total_income),
+                'total_expenses': float(total_expenses),
+                'net_balance': float(total_income - total_expenses),
+                'monthly_income': float(monthly_income),
+                'monthly_expenses': float(monthly_expenses),
+                'monthly_balance': float(monthly_income - monthly_expenses),
+            },
+            'recent_transactions': {
+                'expenses': [
+                    {
+                        'id': e.id,
+                        'description': e.description,
+                        'amount': float(e.amount),
+                        'date': e.date,
+                        'category': e.category_fk.name if e.category_fk else e.category
+                    } for e in self.recent_expenses()
+                ],
+                'income': [
+                    {
+                        'id': i.id,
+                        'source': i.source,
+                        'amount': float(i.amount),
+                        'date': i.date
+                    } for i in self.recent_income()
+                ]
+            },
+            'summary': {
+                'active_goals': active_goals,
+                'unread_alerts': unread_alerts,
+                'budgets': self.budget_summary()
+            }
+        }
+
+
+class LedgerFeed:
+    """
+    One newest-first timeline over every table that moves money.
+
+    A page runs one query per source for at most page_size + 1 rows past
+    the cursor, each an index range scan on (user, date, created_at, id),
+    and k-way merges the results; nothing is materialized beyond that.
+    Rows are ordered by (date, created_at, type, id), all descending, so
+    the position is unique across sources.
+    """
+
+    TYPES = ('income', 'expense', 'transaction', 'transfer', 'debt_payment')
+    COLUMNS = (
+        'id', 'date', 'created_at', 'entry_type', 'description', 'amount',
+        'currency', 'status', 'us_account', 'kenya_account',
+    )
+
+    def __init__(self, user, types=None, us_account=None, kenya_account=None):
+        self.user = user
+        self.types = [name for name in self.TYPES if not types or name in types]
+        self.us_account = us_account
+        self.kenya_account = kenya_account
+
+    def sources(self):
+        """type -> (date field, queryset, column expressions)"""
+        default_currency = Value(settings.FINANCE_TRACKER['DEFAULT_CURRENCY'])
+        no_status = Value(None, output_field=CharField())
+        no_account = Value(None, output_field=IntegerField())
+        return {
+            'income': ('date', Income.objects.filter(user=self.user), {
+                'entry_type': Value('income'), 'description': F('source'),
+                'currency': F('currency'), 'status': F('status'),
+                'us_account': F('us_account_id'), 'kenya_account': F('kenya_account_id'),
+            }),
+            'expense': ('date', Expense.objects.filter(user=self.user), {
+                'entry_type': Value('expense'), 'description': F('description'),
+                'currency': default_currency, 'status': no_status,
+                'us_account': no_account, 'kenya_account': no_account,
+            }),
+            'transaction': ('date', Transaction.objects.filter(user=self.user), {
+                'entry_type': F('transaction_type'), 'description': F('description'),
+                'currency': F('currency'), 'status': no_status,
+                'us_account': F('us_account_id'), 'kenya_account': F('kenya_account_id'),
+            }),
+            'transfer': ('scheduled_date', MoneyTransfer.objects.filter(user=self.user), {
+                'entry_type': Value('transfer'), 'description': F('notes'),
+                'currency': Case(When(from_kenya_account__isnull=False, then=Value('KES')), default=Value('USD')),
+                'status': F('status'),
+                'us_account': F('from_us_account_id'), 'kenya_account': F('from_kenya_account_id'),
+            }),
+            'debt_payment': ('payment_date', DebtPayment.objects.filter(debt__user=self.user), {
+                'entry_type': Value('expense'), 'description': F('debt__name'),
+                'currency': default_currency, 'status': no_status,
+                'us_account': no_account, 'kenya_account': no_account,
+            }),
+        }
+
+    def account_filter(self, name):
+        """Q limiting a source to the requested account, or None to skip the source"""
+        if self.us_account is None and self.kenya_account is None:
+            return Q()
+        condition = Q()
+        for prefix, account_id in [('us', self.us_account), ('kenya', self.kenya_account)]:
+            if account_id is None:
+                continue
+            if name in ('income', 'transaction'):
+                condition &= Q(**{f'{prefix}_account_id': account_id})
+            elif name == 'transfer':
+                condition &= Q(**{f'from_{prefix}_account_id': account_id}) | Q(**{f'to_{prefix}_account_id': account_id})
+            else:
+                # Expenses and debt payments are not tied to an account
+                return None
+        return condition
+
+    @staticmethod
+    def position_filter(name, date_field, cursor):
+        """Rows of this source strictly after the cursor in the merged order"""
+        cursor_date, cursor_created, cursor_type, cursor_id = cursor
+        before = Q(**{f'{date_field}__lt': cursor_date}) | Q(**{date_field: cursor_date, 'created_at__lt': cursor_created})
+        same_time = Q(**{date_field: cursor_date, 'created_at': cursor_created})
+        if name < cursor_type:
+            return before | same_time
+        if name == cursor_type:
+            return before | (same_time & Q(id__lt=cursor_id))
+        return before
+
+    def source_rows(self, name, date_field, queryset, columns, cursor, limit):
+        condition = self.account_filter(name)
+        if condition is None:
+            return []
+        queryset = queryset.filter(condition)
+        if cursor:
+            queryset = queryset.filter(self.position_filter(name, date_field, cursor))
+        columns = {'id': F('id'), 'date': F(date_field), 'created_at': F('created_at'), 'amount': F('amount'), **columns}
+        rows = queryset.order_by(f'-{date_field}', '-created_at', '-id').annotate(
+            **{f'ledger_{column}': expression for column, expression in columns.items()}
+        ).values_list(*[f'ledger_{column}' for column in self.COLUMNS])[:limit]
+        return [{'type': name, **dict(zip(self.COLUMNS, row))} for row in rows]
+
+    @staticmethod
+    def sort_key(row):
+        return row['date'], row['created_at'], row['type'], row['id']
+
+    def page(self, cursor=None, size=50):
+        """Up to size rows after cursor, and the cursor for the next page (or None)"""
+        sources = self.sources()
+        streams = [
+            self.source_rows(name, *sources[name], cursor, size + 1)
+            for name in self.types
+        ]
+        rows = list(islice(heapq.merge(*streams, key=self.sort_key, reverse=True), size + 1))
+        if len(rows) <= size:
+            return rows, None
+        rows = rows[:size]
+        last = rows[-1]
+        return rows, [last['date'].isoformat(), last['created_at'].isoformat(), last['type'], last['id']]
+
+    @staticmethod
+    def parse_cursor(values):
+        """Cursor values from the client back to typed values, or None if malformed"""
+        if not isinstance(values, list) or len(values) != 4:
+            return None
+        cursor_date, cursor_created, cursor_type, cursor_id = values
+        if not all(isinstance(value, str) for value in values[:3]) or not isinstance(cursor_id, int):
+            return None
+        try:
+            cursor_date = parse_date(cursor_date)
+            cursor_created = parse_datetime(cursor_created)
+        except ValueError:
+            return None
+        if cursor_date is None or cursor_created is None:
+            return None
+        return cursor_date, cursor_created, cursor_type, cursor_id
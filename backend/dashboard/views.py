@@ -1,99 +1,53 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum
-from django.utils import timezone
-from datetime import timedelta
-from income.models import Income
-from expense.models import Expense
-from goals.models import Goal
-from categories.models import Budget, BudgetAlert
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from finance_tracker.pagination import encode_cursor, decode_cursor
+from .utils import DashboardAggregator, LedgerFeed
 
 class DashboardView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        user = request.user
-        today = timezone.now().date()
-        month_start = today.replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        # Income statistics
-        total_income = Income.objects.filter(
-            user=user
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        monthly_income = Income.objects.filter(
-            user=user,
-            date__gte=month_start,
-            date__lte=month_end
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Expense statistics
-        total_expenses = Expense.objects.filter(
-            user=user
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        monthly_expenses = Expense.objects.filter(
-            user=user,
-            date__gte=month_start,
-            date__lte=month_end
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Recent transactions
-        recent_expenses = Expense.objects.filter(user=user).order_by('-date', '-created_at')[:5]
-        recent_income = Income.objects.filter(user=user).order_by('-date', '-created_at')[:5]
-        
-        # Goals summary
-        active_goals = Goal.objects.filter(user=user, deadline__gte=today).count()
-        
-        # Budget alerts
-        unread_alerts = BudgetAlert.objects.filter(
-            budget__user=user,
-            is_read=False
-        ).count()
-        
-        # Active budgets
-        active_budgets = Budget.objects.filter(user=user, is_active=True)
-        budgets_summary = {
-            'total': active_budgets.count(),
-            'over_budget': sum(1 for b in active_budgets if b.is_over_budget),
-            'near_limit': sum(1 for b in active_budgets if b.is_near_limit and not b.is_over_budget)
-        }
-        
-        data = {
-            'overview': {
-                'total_income': float(total_income),
-                'total_expenses': float(total_expenses),
-                'net_balance': float(total_income - total_expenses),
-                'monthly_income': float(monthly_income),
-                'monthly_expenses': float(monthly_expenses),
-                'monthly_balance': float(monthly_income - monthly_expenses),
-            },
-            'recent_transactions': {
-                'expenses': [
-                    {
-                        'id': e.id,
-                        'description': e.description,
-                        'amount': float(e.amount),
-                        'date': e.date,
-                        'category': getattr(e.category_fk, 'name', e.category) if e.category_fk else e.category
-                    } for e in recent_expenses
-                ],
-                'income': [
-                    {
-                        'id': i.id,
-                        'source': i.source,
-                        'amount': float(i.amount),
-                        'date': i.date
-                    } for i in recent_income
-                ]
-            },
-            'summary': {
-                'active_goals': active_goals,
-                'unread_alerts': unread_alerts,
-                'budgets': budgets_summary
-            }
-        }
-        
-        return Response(data)
\ No newline at end of file
+        data = DashboardAggregator(request.user).build()
+        return Response(data)
+
+
+class LedgerView(APIView):
+    """
+    Read-only timeline of incomes, expenses, transactions, transfers and
+    debt payments, newest first, with keyset pagination.
+
+    Query params: type (comma-separated, from LedgerFeed.TYPES),
+    us_account / kenya_account (ids), cursor (from the next link).
+    """
+    permission_classes = [IsAuthenticated]
+    page_size = api_settings.PAGE_SIZE
+    
+    def get(self, request):
+        types = [name for name in request.query_params.get('type', '').split(',') if name]
+        unknown = [name for name in types if name not in LedgerFeed.TYPES]
+        if unknown:
+            raise ValidationError({'type': f"Choose from: {', '.join(LedgerFeed.TYPES)}"})
+        
+        accounts = {}
+        for param in ('us_account', 'kenya_account'):
+            value = request.query_params.get(param)
+            if value is not None:
+                if not value.isdigit():
+                    raise ValidationError({param: 'Must be an account id'})
+                accounts[param] = int(value)
+        
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            cursor = LedgerFeed.parse_cursor(decode_cursor(cursor))
+            if cursor is None:
+                raise NotFound('Invalid cursor')
+        
+        rows, next_cursor = LedgerFeed(request.user, types=types, **accounts).page(cursor, self.page_size)
+        next_link = None
+        if next_cursor:
+            next_link = replace_query_param(request.build_absolute_uri(), 'cursor', encode_cursor(next_cursor))
+        return Response({'next': next_link, 'results': rows})
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('debt', '0002_alter_debt_options_alter_debtpayment_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='debtpayment',
+            index=models.Index(fields=['debt', '-payment_date', '-created_at'], name='debtpayment_debt_date_idx'),
+        ),
+    ]
@@ -62,6 +62,9 @@ class DebtPayment(models.Model):
     
     class Meta:
         ordering = ['-payment_date', '-created_at']
+        indexes = [
+            models.Index(fields=['debt', '-payment_date', '-created_at'], name='debtpayment_debt_date_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.principal_payment or not self.interest_payment:
@@ -12,9 +12,11 @@ from dateutil.relativedelta import relativedelta
 from decimal import Decimal
 from .models import Debt, DebtPayment
 from .serializers import DebtSerializer, DebtPaymentSerializer
+from finance_tracker.eager_loading import EagerLoadingMixin
 
-class DebtViewSet(viewsets.ModelViewSet):
+class DebtViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     serializer_class = DebtSerializer
+    prefetch_related = ['payments']
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
@@ -0,0 +1,57 @@
+from collections import defaultdict
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import transaction
+from categories.utils import resolve_expense_categories
+from expense.models import Expense
+
+class Command(BaseCommand):
+    help = (
+        'Point Expense.category_fk at the category named by the legacy text column, '
+        'creating missing categories. Safe to interrupt and rerun; each batch commits on its own.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Limit to a single username')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Expenses per batch')
+        parser.add_argument('--start-after', type=int, default=0, help='Resume after this expense id')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without writing')
+
+    def handle(self, *args, **options):
+        # Only expenses still missing the FK are read, so a rerun picks up
+        # where the last one stopped
+        expenses = Expense.objects.filter(category_fk__isnull=True, category__isnull=False).exclude(category='')
+        if options['user']:
+            try:
+                expenses = expenses.filter(user=User.objects.get(username=options['user']))
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        batch_size = options['batch_size']
+        last_id = options['start_after']
+        updated = 0
+        while True:
+            batch = list(
+                expenses.filter(id__gt=last_id).order_by('id').values_list('id', 'user_id', 'category')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+
+            if options['dry_run']:
+                updated += len(batch)
+                continue
+
+            with transaction.atomic():
+                categories = resolve_expense_categories((user_id, name) for _, user_id, name in batch)
+                ids_by_category = defaultdict(list)
+                for expense_id, user_id, name in batch:
+                    ids_by_category[categories[(user_id, name)].id].append(expense_id)
+                # The category keeps the text's name, so rollup labels and
+                # budget ledgers are unchanged by the update
+                for category_id, expense_ids in ids_by_category.items():
+                    updated += Expense.objects.filter(id__in=expense_ids).update(category_fk_id=category_id)
+            self.stdout.write(f"  backfilled through expense id {last_id}")
+
+        verb = 'Would backfill' if options['dry_run'] else 'Backfilled'
+        self.stdout.write(self.style.SUCCESS(f"{verb} category_fk on {updated} expenses"))
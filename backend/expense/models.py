@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.conf import settings
 from django.contrib.auth.models import User
 
 class Expense(models.Model):
@@ -19,44 +20,49 @@ class Expense(models.Model):
 
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['user', '-date', '-created_at', '-id'], name='expense_user_date_idx'),
+            models.Index(fields=['user', 'category_fk', 'date'], name='expense_user_category_idx'),
+        ]
 
     def __str__(self):
         return f"{self.description} - ${self.amount}"
     
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Check budgets after saving expense
-        from categories.models import Budget, BudgetAlert
+    def rollup_key(self):
+        """Key fields for dashboard.MonthlyRollup"""
+        return {
+            'source': 'expense',
+            'entry_type': 'expense',
+            'currency': settings.FINANCE_TRACKER['DEFAULT_CURRENCY'],
+            'category': self.category_fk.name if self.category_fk_id else self.category,
+        }
+    
+    def delete(self, *args, **kwargs):
+        from dashboard.models import MonthlyRollup
+        from categories.models import BudgetPeriodSpend
         
-        # Check overall budget
-        overall_budgets = Budget.objects.filter(
-            user=self.user,
-            category__isnull=True,
-            is_active=True
-        )
+        with transaction.atomic():
+            MonthlyRollup.record_change(self, None)
+            BudgetPeriodSpend.record_change(self, None)
+            return super().delete(*args, **kwargs)
+    
+    def save(self, *args, **kwargs):
+        from dashboard.models import MonthlyRollup
+        from categories.models import BudgetPeriodSpend, match_legacy_names
+        from categories.utils import resolve_expense_categories
         
-        # Check category-specific budgets
-        if self.category_fk:
-            category_budgets = Budget.objects.filter(
-                user=self.user,
-                category=self.category_fk,
-                is_active=True
-            )
-            overall_budgets = overall_budgets | category_budgets
+        with transaction.atomic():
+            if self.category and not self.category_fk_id and not match_legacy_names():
+                # Budgets only see category_fk, so give text-only expenses one
+                key = (self.user_id, self.category)
+                self.category_fk = resolve_expense_categories([key])[key]
+            previous = None
+            if self.pk:
+                previous = Expense.objects.select_related('category_fk').filter(pk=self.pk).first()
+            super().save(*args, **kwargs)
+            MonthlyRollup.record_change(previous, self)
+            BudgetPeriodSpend.record_change(previous, self)
         
-        for budget in overall_budgets:
-            if budget.is_near_limit:
-                # Check if alert already exists for this period
-                start_date, end_date = budget.get_current_period_dates()
-                existing_alert = budget.alerts.filter(
-                    alert_date__date__gte=start_date,
-                    alert_date__date__lte=end_date
-                ).exists()
-                
-                if not existing_alert:
-                    BudgetAlert.objects.create(
-                        budget=budget,
-                        percentage_reached=budget.spent_percentage,
-                        amount_spent=budget.spent_amount,
-                        message=f"Budget '{budget.name}' has reached {budget.spent_percentage}% of the limit after expense: {self.description}"
-                    )
\ No newline at end of file
+        # Budget alerts are evaluated in the background
+        from categories.tasks import schedule_budget_alerts
+        schedule_budget_alerts(self.user_id)
\ No newline at end of file
@@ -1,3 +1,223 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from categories.models import Category, Budget, BudgetPeriodSpend
+from dashboard.models import MonthlyRollup
+from .models import Expense
+from .utils import ExpenseImporter
 
-# Create your tests here.
+
+class ExpenseImportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.food = Category.objects.create(user=self.user, name='Food')
+        self.budget = Budget.objects.create(user=self.user, name='Food', category=self.food, amount=500, start_date=date(2024, 1, 1))
+        self.overall = Budget.objects.create(user=self.user, name='Overall', amount=1000, start_date=date(2024, 1, 1))
+
+    def upload(self, content, name='statement.csv', query=''):
+        return self.client.post(
+            f'/api/expenses/import/{query}',
+            {'file': SimpleUploadedFile(name, content.encode(), content_type='text/csv')},
+            format='multipart'
+        )
+
+    def test_import_csv(self):
+        content = (
+            'Date,Description,Amount,Category\n'
+            '2024-03-01,Groceries,45.50,food\n'
+            '03/02/2024,Bus pass,30,Transport\n'
+            'not a date,Broken,10,Food\n'
+            '2024-03-03,,5,Food\n'
+            '\n'
+            '2024-04-01,Dinner,"1,020.00",Food\n'
+        )
+        with mock.patch('categories.tasks.schedule_budget_alerts') as schedule:
+            response = self.upload(content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['imported'], 3)
+        self.assertEqual(response.data['skipped'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [4, 5])
+        schedule.assert_called_once_with(self.user.id)
+
+        groceries = Expense.objects.get(description='Groceries')
+        self.assertEqual(groceries.amount, 45.5)
+        self.assertEqual(groceries.category_fk, self.food)
+        self.assertEqual(Expense.objects.get(description='Bus pass').category, 'Transport')
+
+        # Aggregates applied in bulk match a full recompute
+        self.assertEqual(MonthlyRollup.current_rows(user=self.user), MonthlyRollup.expected_rows(user=self.user))
+        stored = {
+            (budget_id, start): amount
+            for budget_id, start, amount in BudgetPeriodSpend.objects.exclude(amount=0).values_list('budget_id', 'period_start', 'amount')
+        }
+        self.assertEqual(stored, BudgetPeriodSpend.expected_rows(Budget.objects.filter(user=self.user)))
+
+    def test_import_xlsx(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Date', 'Description', 'Amount', 'Category'])
+        sheet.append([date(2024, 3, 1), 'Groceries', 45.5, 'Food'])
+        sheet.append(['03/02/2024', 'Bus pass', '30', 'Transport'])
+        sheet.append(['not a date', 'Broken', 10, 'Food'])
+        content = BytesIO()
+        workbook.save(content)
+
+        with mock.patch('categories.tasks.schedule_budget_alerts'):
+            response = self.client.post(
+                '/api/expenses/import/',
+                {'file': SimpleUploadedFile('statement.xlsx', content.getvalue())},
+                format='multipart'
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [4])
+        groceries = Expense.objects.get(description='Groceries')
+        self.assertEqual((groceries.date, groceries.amount, groceries.category_fk), (date(2024, 3, 1), Decimal('45.50'), self.food))
+        self.assertEqual(MonthlyRollup.current_rows(user=self.user), MonthlyRollup.expected_rows(user=self.user))
+
+    def test_chunked_writes(self):
+        rows = ''.join(f'2024-03-{i % 28 + 1:02d},Item {i},1,Food\n' for i in range(25))
+        with mock.patch.object(ExpenseImporter, 'CHUNK_SIZE', 10), \
+                mock.patch('categories.tasks.schedule_budget_alerts'):
+            response = self.upload('date,description,amount,category\n' + rows)
+        self.assertEqual(response.data['imported'], 25)
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 25)
+        self.assertEqual(BudgetPeriodSpend.objects.get(budget=self.budget).amount, 25)
+
+    def test_rejects_bad_files(self):
+        response = self.upload('date,description\n2024-03-01,Lunch\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.upload('anything', name='statement.exe')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Expense.objects.exists())
+
+    def test_unsigned_export_skips_refunds(self):
+        content = (
+            'date,description,amount,category\n'
+            '2024-03-01,Groceries,45.50,Food\n'
+            '2024-03-02,Store refund,-12.00,Food\n'
+            '2024-03-03,Bus pass,30,Transport\n'
+        )
+        with mock.patch('categories.tasks.schedule_budget_alerts'):
+            response = self.upload(content)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3])
+        self.assertEqual(
+            sorted(Expense.objects.values_list('description', 'amount')),
+            [('Bus pass', Decimal('30.00')), ('Groceries', Decimal('45.50'))]
+        )
+
+    def test_signed_export_skips_credits(self):
+        content = (
+            'date,description,amount,category\n'
+            '2024-03-01,Salary,2500.00,\n'
+            '2024-03-02,Groceries,-45.50,Food\n'
+            '2024-03-03,Bank fee,(12.00),\n'
+            '2024-03-04,Store refund,12.00,Food\n'
+        )
+        with mock.patch('categories.tasks.schedule_budget_alerts'):
+            response = self.upload(content, query='?amounts=signed')
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 5])
+        self.assertEqual(
+            sorted(Expense.objects.values_list('description', 'amount')),
+            [('Bank fee', Decimal('12.00')), ('Groceries', Decimal('45.50'))]
+        )
+
+        response = self.upload(content, query='?amounts=both')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rejects_unreadable_csv(self):
+        content = 'date,description,amount\n2024-03-01,Caf\xe9 cr\xe8me,4.50\n'.encode('cp1252')
+        response = self.client.post(
+            '/api/expenses/import/',
+            {'file': SimpleUploadedFile('statement.csv', content, content_type='text/csv')},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('UTF-8', response.data['error'])
+
+        response = self.upload('date,description,amount\n2024-03-01,"' + 'x' * 200000 + '",1\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Expense.objects.exists())
+
+
+class ExpenseExportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.other = User.objects.create_user(username='other', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.food = Category.objects.create(user=self.user, name='Food')
+        Expense.objects.create(user=self.user, description='Lunch, downtown', amount=12, category_fk=self.food, date=date(2024, 3, 2))
+        Expense.objects.create(user=self.user, description='Legacy', amount=8, category='Food', date=date(2024, 3, 1))
+        Expense.objects.create(user=self.user, description='Bus', amount=3, date=date(2024, 4, 1))
+        Expense.objects.create(user=self.other, description='Not mine', amount=99, date=date(2024, 3, 1))
+
+    def export(self, query=''):
+        response = self.client.get(f'/api/expenses/export/{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        lines = self.export().splitlines()
+        self.assertEqual(lines[0], 'id,date,description,amount,category')
+        self.assertEqual([line.split(',')[1] for line in lines[1:]], ['2024-03-01', '2024-03-02', '2024-04-01'])
+        self.assertIn('"Lunch, downtown",12.00,Food', lines[2])
+
+    def test_filters(self):
+        self.assertEqual(len(self.export('?category=food').splitlines()), 3)
+        self.assertEqual(len(self.export(f'?category={self.food.id}').splitlines()), 2)
+        self.assertEqual(len(self.export('?date_from=2024-03-02&date_to=2024-03-31').splitlines()), 2)
+
+        response = self.client.get('/api/expenses/export/?date_from=March')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CategoryBackfillTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.today = date.today()
+        self.food = Category.objects.create(user=self.user, name='Food')
+        for description, category in [('Lunch', 'Food'), ('Bus', 'Transport'), ('Train', 'Transport'), ('Misc', '')]:
+            Expense.objects.create(user=self.user, description=description, amount=10, category=category, date=self.today)
+        self.budget = Budget.objects.create(user=self.user, name='Food', category=self.food, amount=100, start_date=self.today)
+
+    def test_backfill_is_batched_and_resumable(self):
+        lunch = Expense.objects.get(description='Lunch')
+        rollups = MonthlyRollup.current_rows(user=self.user)
+
+        call_command('backfill_category_fk', '--batch-size', '1', '--start-after', str(lunch.id), stdout=StringIO())
+        self.assertIsNone(Expense.objects.get(pk=lunch.pk).category_fk)
+        transport = Category.objects.get(user=self.user, name='Transport', category_type='expense')
+        self.assertEqual(Expense.objects.filter(category_fk=transport).count(), 2)
+
+        call_command('backfill_category_fk', stdout=StringIO())
+        self.assertEqual(Expense.objects.get(pk=lunch.pk).category_fk, self.food)
+        self.assertIsNone(Expense.objects.get(description='Misc').category_fk)
+        self.assertEqual(Category.objects.filter(user=self.user, name='Transport').count(), 1)
+        self.assertEqual(MonthlyRollup.current_rows(user=self.user), rollups)
+
+    @override_settings(BUDGET_CATEGORY_FK_ONLY=True)
+    def test_fk_only_matching(self):
+        self.assertEqual(Budget.objects.get(pk=self.budget.pk).compute_spent_amount(self.today, self.today), 0)
+        call_command('backfill_category_fk', stdout=StringIO())
+        call_command('reconcile_budget_spend', '--fix', stdout=StringIO())
+        self.assertEqual(Budget.objects.get(pk=self.budget.pk).spent_amount, 10)
+
+        # New text-only expenses are given a category on save
+        expense = Expense.objects.create(user=self.user, description='Dinner', amount=5, category='Food', date=self.today)
+        self.assertEqual(expense.category_fk, self.food)
+        self.assertEqual(Budget.objects.get(pk=self.budget.pk).spent_amount, 15)
+        self.assertNotIn('"expense_expense"."category" IN', str(Expense.objects.filter(self.budget.expense_filter()).query))
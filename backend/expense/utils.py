@@ -1,6 +1,10 @@
+import csv
+import io
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Sum
-from decimal import Decimal
-from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from datetime import date, datetime, timedelta
 
 class BudgetMonitor:
     """Monitor and validate budget status for expenses"""
@@ -34,4 +38,235 @@ class BudgetMonitor:
         elif total_with_current <= category_budget:
             return 'within_budget'
         else:
-            return 'over_budget'
\ No newline at end of file
+            return 'over_budget'
+
+
+class ImportFileError(Exception):
+    """The uploaded file cannot be read as an expense import"""
+
+
+class ExpenseImporter:
+    """
+    Stream a CSV/XLSX bank export into expenses.
+
+    Rows are parsed one at a time, validated and written with bulk_create
+    in chunks, so memory stays bounded by the chunk size. Rollup and budget
+    ledger deltas are accumulated in memory and applied once at the end,
+    followed by a single budget alert evaluation.
+
+    Expected columns (case-insensitive): date, description, amount and an
+    optional category, matched by name to the user's categories.
+    
+    amounts says how the file signs its amounts: 'unsigned' (expenses are
+    positive) or 'signed' (debits are negative). Rows of the other sign
+    are credits or refunds and are reported as row errors, not imported.
+    """
+    
+    CHUNK_SIZE = 1000
+    MAX_ERRORS = 100
+    DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%d.%m.%Y']
+    REQUIRED_COLUMNS = {'date', 'description', 'amount'}
+    AMOUNT_CONVENTIONS = ('unsigned', 'signed')
+    
+    def __init__(self, user, amounts='unsigned'):
+        if amounts not in self.AMOUNT_CONVENTIONS:
+            raise ImportFileError(f"amounts must be one of: {', '.join(self.AMOUNT_CONVENTIONS)}")
+        self.user = user
+        self.amounts = amounts
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+    
+    # -- reading --------------------------------------------------------
+    
+    @classmethod
+    def file_type(cls, upload):
+        extension = upload.name.rsplit('.', 1)[-1].lower() if '.' in upload.name else ''
+        allowed = [t for t in settings.FINANCE_TRACKER['ALLOWED_FILE_TYPES'] if t != 'pdf']
+        if extension not in allowed:
+            raise ImportFileError(f"Unsupported file type '{extension}'. Allowed: {', '.join(allowed)}")
+        if upload.size > settings.FINANCE_TRACKER['MAX_UPLOAD_SIZE']:
+            raise ImportFileError('File is too large')
+        return extension
+    
+    @staticmethod
+    def _header(values):
+        return [str(value or '').strip().lower() for value in values]
+    
+    def read_csv(self, upload):
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        reader = csv.reader(stream)
+        try:
+            header = self._header(next(reader, []))
+            for values in reader:
+                yield dict(zip(header, values))
+        except UnicodeDecodeError:
+            raise ImportFileError('CSV files must be UTF-8 encoded; re-export the file as UTF-8')
+        except csv.Error as e:
+            raise ImportFileError(f'Malformed CSV at line {reader.line_num}: {e}')
+    
+    def read_xlsx(self, upload):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ImportFileError('XLSX import requires the openpyxl package')
+        workbook = load_workbook(upload.file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = self._header(next(rows, []))
+            for values in rows:
+                yield dict(zip(header, values))
+        finally:
+            workbook.close()
+    
+    def read_xls(self, upload):
+        try:
+            import xlrd
+        except ImportError:
+            raise ImportFileError('XLS import requires the xlrd package')
+        sheet = xlrd.open_workbook(file_contents=upload.read(), on_demand=True).sheet_by_index(0)
+        header = self._header(sheet.row_values(0)) if sheet.nrows else []
+        for index in range(1, sheet.nrows):
+            values = sheet.row_values(index)
+            row = dict(zip(header, values))
+            if isinstance(row.get('date'), float):
+                row['date'] = xlrd.xldate_as_datetime(row['date'], sheet.book.datemode)
+            yield row
+    
+    def rows(self, upload):
+        reader = getattr(self, f'read_{self.file_type(upload)}')
+        rows = reader(upload)
+        first = next(rows, None)
+        if first is None:
+            return
+        missing = self.REQUIRED_COLUMNS - set(first)
+        if missing:
+            raise ImportFileError(f"Missing columns: {', '.join(sorted(missing))}")
+        yield first
+        yield from rows
+    
+    # -- validation -----------------------------------------------------
+    
+    def parse_date(self, value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        value = str(value or '').strip()
+        for date_format in self.DATE_FORMATS:
+            try:
+                return datetime.strptime(value, date_format).date()
+            except ValueError:
+                continue
+        raise ValueError(f"Invalid date '{value}'")
+    
+    @staticmethod
+    def parse_amount(value):
+        if isinstance(value, (int, float, Decimal)):
+            amount = Decimal(str(value))
+        else:
+            cleaned = str(value or '').strip().replace(',', '').replace('$', '')
+            if cleaned.startswith('(') and cleaned.endswith(')'):
+                cleaned = '-' + cleaned[1:-1]  # accounting-style negatives
+            try:
+                amount = Decimal(cleaned)
+            except InvalidOperation:
+                raise ValueError(f"Invalid amount '{value}'")
+        amount = amount.quantize(Decimal('0.01'))
+        if abs(amount) >= Decimal('100000000'):
+            raise ValueError(f"Amount '{value}' is too large")
+        return amount
+    
+    def expense_amount(self, value):
+        amount = self.parse_amount(value)
+        if self.amounts == 'signed':
+            amount = -amount
+        if amount < 0:
+            raise ValueError(f"Amount '{value}' is a credit or refund, not an expense")
+        return amount
+    
+    def build(self, row, categories):
+        from .models import Expense
+        from categories.models import match_legacy_names
+        from categories.utils import resolve_expense_categories
+        
+        description = str(row.get('description') or '').strip()[:255]
+        if not description:
+            raise ValueError('Description is required')
+        
+        category_name = str(row.get('category') or '').strip()[:100]
+        category = categories.get(category_name.lower()) if category_name else None
+        if category_name and category is None and not match_legacy_names():
+            # Budgets only see category_fk, so unknown names get a category
+            key = (self.user.id, category_name)
+            category = resolve_expense_categories([key])[key]
+            categories[category_name.lower()] = category
+        return Expense(
+            user=self.user,
+            description=description,
+            amount=self.expense_amount(row.get('amount')),
+            date=self.parse_date(row.get('date')),
+            category_fk=category,
+            category=None if category else (category_name or None),
+        )
+    
+    def add_error(self, row_number, message):
+        self.skipped += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append({'row': row_number, 'error': message})
+    
+    # -- writing --------------------------------------------------------
+    
+    def run(self, upload):
+        from .models import Expense
+        from categories.models import Category, Budget, BudgetPeriodSpend
+        from categories.tasks import schedule_budget_alerts
+        from dashboard.models import MonthlyRollup
+        
+        categories = {
+            category.name.lower(): category
+            for category in Category.objects.filter(
+                user=self.user,
+                category_type__in=['expense', 'both']
+            ).only('id', 'name')
+        }
+        budgets = BudgetPeriodSpend.budget_scopes(
+            Budget.objects.filter(user=self.user).only('id', 'user_id', 'period', 'category_id')
+        )
+        rollup_deltas = {}
+        spend_deltas = {}
+        
+        def flush(chunk):
+            Expense.objects.bulk_create(chunk, batch_size=self.CHUNK_SIZE)
+            MonthlyRollup.collect(chunk, rollup_deltas)
+            BudgetPeriodSpend.collect(chunk, budgets, spend_deltas)
+            self.imported += len(chunk)
+        
+        with transaction.atomic():
+            chunk = []
+            # Row 1 is the header
+            for row_number, row in enumerate(self.rows(upload), start=2):
+                if not any(str(value or '').strip() for value in row.values()):
+                    continue
+                try:
+                    chunk.append(self.build(row, categories))
+                except ValueError as e:
+                    self.add_error(row_number, str(e))
+                    continue
+                if len(chunk) >= self.CHUNK_SIZE:
+                    flush(chunk)
+                    chunk = []
+            if chunk:
+                flush(chunk)
+            
+            MonthlyRollup.apply_deltas(rollup_deltas)
+            BudgetPeriodSpend.apply_deltas(spend_deltas)
+        
+        if self.imported:
+            schedule_budget_alerts(self.user.id)
+        
+        return {
+            'imported': self.imported,
+            'skipped': self.skipped,
+            'errors': self.errors,
+        }
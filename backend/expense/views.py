@@ -1,14 +1,61 @@
-from rest_framework import viewsets
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from django.db.models import Q
+from django.db.models.functions import Coalesce
 from .models import Expense
 from .serializers import ExpenseSerializer
+from .utils import ExpenseImporter, ImportFileError
+from finance_tracker.eager_loading import EagerLoadingMixin
+from finance_tracker.export import ExportMixin
+from finance_tracker.pagination import LedgerPagination
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+class ExpenseViewSet(EagerLoadingMixin, ExportMixin, viewsets.ModelViewSet):
     serializer_class = ExpenseSerializer
+    select_related = ['category_fk']
     permission_classes = [IsAuthenticated]
+    pagination_class = LedgerPagination
+    export_fields = [
+        ('id', 'id'),
+        ('date', 'date'),
+        ('description', 'description'),
+        ('amount', 'amount'),
+        ('category', Coalesce('category_fk__name', 'category')),
+    ]
     
     def get_queryset(self):
         return Expense.objects.filter(user=self.request.user)
     
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        serializer.save(user=self.request.user)
+    
+    def filter_export_queryset(self, queryset):
+        queryset = super().filter_export_queryset(queryset)
+        category = self.request.query_params.get('category')
+        if category:
+            # Category id, or a name matching the category or legacy text
+            if category.isdigit():
+                queryset = queryset.filter(category_fk_id=category)
+            else:
+                queryset = queryset.filter(Q(category_fk__name__iexact=category) | Q(category__iexact=category))
+        return queryset
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def import_file(self, request):
+        """
+        Bulk import expenses from an uploaded CSV/XLSX bank export.
+        ?amounts=signed for exports that list debits as negative numbers
+        (default unsigned: expenses are positive).
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            result = ExpenseImporter(request.user, amounts=request.query_params.get('amounts', 'unsigned')).run(upload)
+        except ImportFileError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(result, status=status.HTTP_201_CREATED)
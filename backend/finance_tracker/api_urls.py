@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 # Import views
-from dashboard.views import DashboardView
+from dashboard.views import DashboardView, LedgerView
 from income.views import IncomeViewSet
 from expense.views import ExpenseViewSet
 from transaction.views import TransactionViewSet
@@ -35,6 +35,7 @@ router.register(r'budget-alerts', BudgetAlertViewSet, basename='budget-alert')
 urlpatterns = [
     path('', include(router.urls)),
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('ledger/', LedgerView.as_view(), name='ledger'),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
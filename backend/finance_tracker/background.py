@@ -0,0 +1,127 @@
+"""
+Background job dispatch.
+
+Jobs are referenced by dotted path so they can be sent to Celery. The
+backend is chosen by settings.BACKGROUND_TASK_BACKEND:
+
+- 'sync': run inline once the current transaction commits (the default)
+- 'celery': send to the Celery worker (needs the celery package)
+- 'thread': run in an in-process thread pool, for development only; jobs
+  still queued or delayed are lost when the process exits, e.g. when
+  gunicorn recycles a worker
+
+Coalescing keys live in the default cache. Celery workers release them
+from their own process, so with a per-process cache (LocMemCache) and
+the celery backend, jobs are not coalesced.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+from finance_tracker import celery_app
+
+logger = logging.getLogger('finance_tracker')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_TASK_WORKERS,
+                thread_name_prefix='background'
+            )
+    return _executor
+
+
+def get_backend():
+    backend = settings.BACKGROUND_TASK_BACKEND
+    if backend == 'celery' and celery_app is None:
+        logger.warning("BACKGROUND_TASK_BACKEND is 'celery' but celery is not installed; running jobs inline")
+        return 'sync'
+    return backend
+
+
+def can_coalesce(backend):
+    """Whether the process running a job can release its coalescing key"""
+    if backend == 'celery' and isinstance(caches['default'], LocMemCache):
+        logger.warning("BACKGROUND_TASK_BACKEND is 'celery' but the cache is per process; jobs are not coalesced")
+        return False
+    return True
+
+
+def execute(path, args, coalesce_key=None):
+    """Run a job; releases its coalescing key first so later writes schedule a new run"""
+    if coalesce_key:
+        cache.delete(coalesce_key)
+    try:
+        return import_string(path)(*args)
+    except Exception:
+        logger.exception(f"Background job {path} failed")
+        raise
+
+
+if celery_app is not None:
+    run_job = celery_app.task(name='finance_tracker.background.run_job')(execute)
+
+
+def _run_in_thread(path, args, coalesce_key):
+    close_old_connections()
+    try:
+        execute(path, args, coalesce_key)
+    except Exception:
+        pass  # already logged
+    finally:
+        close_old_connections()
+
+
+def _dispatch(path, args, coalesce_key, delay):
+    backend = get_backend()
+    if coalesce_key and not can_coalesce(backend):
+        coalesce_key = None
+    if coalesce_key and not cache.add(coalesce_key, True, timeout=delay + 60):
+        # A run for this key is already queued and will see this write
+        return
+
+    if backend == 'sync':
+        execute(path, args, coalesce_key)
+    elif backend == 'celery':
+        run_job.apply_async(args=[path, list(args), coalesce_key], countdown=delay)
+    else:
+        executor = _get_executor()
+        if delay:
+            timer = threading.Timer(delay, executor.submit, args=[_run_in_thread, path, args, coalesce_key])
+            timer.daemon = True
+            timer.start()
+        else:
+            executor.submit(_run_in_thread, path, args, coalesce_key)
+
+
+def enqueue(path, *args, coalesce_key=None, delay=0):
+    """
+    Run the callable at path with args in the background once the current
+    transaction commits. Calls sharing a coalesce_key that arrive while a
+    run is still queued are dropped, so a burst becomes one job; delay
+    (seconds) widens that window.
+    """
+    connection = transaction.get_connection()
+    if coalesce_key and connection.in_atomic_block:
+        # Already queued by an earlier write in this same transaction
+        for callback in connection.run_on_commit:
+            if getattr(callback[1], 'coalesce_key', None) == coalesce_key:
+                return
+
+    def dispatch():
+        _dispatch(path, args, coalesce_key, delay)
+    dispatch.coalesce_key = coalesce_key
+    transaction.on_commit(dispatch)
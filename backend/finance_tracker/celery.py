@@ -0,0 +1,15 @@
+"""
+Celery application for background jobs.
+
+Start a worker with: celery -A finance_tracker worker
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'finance_tracker.settings')
+
+app = Celery('finance_tracker')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.conf.imports = ('finance_tracker.background',)
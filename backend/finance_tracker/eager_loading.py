@@ -0,0 +1,35 @@
+class EagerLoadingMixin:
+    """
+    Applies a viewset's select_related/prefetch_related needs to every
+    queryset it serializes, so nested fields never query once per row.
+
+    Viewsets declare the relations their serializer reads next to
+    serializer_class:
+
+        select_related = ['category_fk']
+        prefetch_related = [Prefetch('alerts', queryset=..., to_attr='...')]
+
+    They are applied in filter_queryset(), which list, retrieve, update and
+    destroy all go through; custom actions serializing their own querysets
+    call eager_load() directly.
+    """
+    select_related = []
+    prefetch_related = []
+
+    def get_select_related(self):
+        return list(self.select_related)
+
+    def get_prefetch_related(self):
+        return list(self.prefetch_related)
+
+    def eager_load(self, queryset):
+        select_related = self.get_select_related()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        prefetch_related = self.get_prefetch_related()
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    def filter_queryset(self, queryset):
+        return self.eager_load(super().filter_queryset(queryset))
@@ -0,0 +1,163 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def encode_cursor(payload):
+    data = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError):
+        raise NotFound('Invalid cursor')
+
+
+def cursor_value(value):
+    """Make an ordering value JSON-safe; Django parses ISO strings back in filters"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def keyset_filter(ordering, values, reverse=False):
+    """
+    Q selecting rows strictly after values in ordering (or strictly
+    before when reverse), e.g. for ('-date', '-id'):
+    date < d OR (date = d AND id < i)
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        lookup = 'lt' if descending != reverse else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a composite, unique ordering. Each page is an
+    indexed range scan from the cursor, with no COUNT(*) or OFFSET, so
+    deep pages cost the same as the first and cursors stay stable when
+    rows are inserted.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    ordering = ('-date', '-created_at', '-id')
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'cursor_ordering', self.ordering))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering_fields = self.get_ordering(view)
+        names = [field.lstrip('-') for field in self.ordering_fields]
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        self.reverse = False
+        position = None
+        if cursor:
+            position = decode_cursor(cursor)
+            if not isinstance(position, dict) or not isinstance(position.get('v'), list) or len(position['v']) != len(names):
+                raise NotFound('Invalid cursor')
+            self.reverse = bool(position.get('r'))
+
+        ordering = reverse_ordering(self.ordering_fields) if self.reverse else self.ordering_fields
+        try:
+            if position is not None:
+                queryset = queryset.filter(keyset_filter(self.ordering_fields, position['v'], self.reverse))
+            rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        except (DjangoValidationError, ValueError, TypeError):
+            # Cursor values that do not parse for the ordering fields
+            raise NotFound('Invalid cursor')
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not self.reverse else True
+        self.has_previous = bool(cursor) if not self.reverse else has_more
+        self.first_values = [cursor_value(getattr(rows[0], name)) for name in names] if rows else None
+        self.last_values = [cursor_value(getattr(rows[-1], name)) for name in names] if rows else None
+        return rows
+
+    def _link(self, values, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encode_cursor({'v': values, 'r': reverse}))
+
+    def get_next_link(self):
+        if not self.has_next or self.last_values is None:
+            return None
+        return self._link(self.last_values, False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first_values is None:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self._link(self.first_values, True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class LedgerPagination(PageNumberPagination):
+    """
+    Page-number pagination by default; clients opt in to keyset
+    pagination with ?pagination=cursor (or by following a ?cursor= link).
+    """
+    cursor_class = KeysetPagination
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get('pagination') == 'cursor' or
+            self.cursor_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
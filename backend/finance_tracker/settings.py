@@ -250,6 +250,29 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Background jobs: 'sync' (inline after commit, the default), 'celery' (needs
+# the celery package, a broker and, for coalescing, a shared cache such as
+# Redis) or 'thread' (in-process pool, for development only: jobs still queued
+# are lost when a web worker is recycled)
+BACKGROUND_TASK_BACKEND = config('BACKGROUND_TASK_BACKEND', default='sync')
+BACKGROUND_TASK_WORKERS = config('BACKGROUND_TASK_WORKERS', default=4, cast=int)
+
+# Expense writes for the same user within this window share one alert evaluation
+BUDGET_ALERT_COALESCE_SECONDS = config('BUDGET_ALERT_COALESCE_SECONDS', default=2, cast=int)
+
+# Serialized category trees are cached per user, dropped on category writes
+# and checked against the categories' latest updated_at and count on read
+CATEGORY_TREE_CACHE_SECONDS = config('CATEGORY_TREE_CACHE_SECONDS', default=60 * 60, cast=int)
+
+# Match budgets on Expense.category_fk only, ignoring the legacy category
+# text. Enable after running backfill_category_fk, then run
+# reconcile_budget_spend --fix.
+BUDGET_CATEGORY_FK_ONLY = config('BUDGET_CATEGORY_FK_ONLY', default=False, cast=bool)
+
+# New users get this list of categories (a dotted path) when they are created
+PROVISION_DEFAULT_CATEGORIES = config('PROVISION_DEFAULT_CATEGORIES', default=True, cast=bool)
+DEFAULT_CATEGORY_TEMPLATE = config('DEFAULT_CATEGORY_TEMPLATE', default='categories.defaults.DEFAULT_CATEGORIES')
+
 
 # Logging configuration
 LOGGING = {
@@ -0,0 +1,109 @@
+import shutil
+import tempfile
+from datetime import date
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.core.files.base import ContentFile
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from categories.models import Category, Budget, BudgetAlert
+from debt.models import Debt, DebtPayment
+from expense.models import Expense
+from projects.models import Project, ProjectDocument
+
+
+@override_settings(PROVISION_DEFAULT_CATEGORIES=False)
+class ListQueryCountTestCase(TestCase):
+    """List endpoints run the same number of queries however many rows they serialize"""
+    SIZES = (1, 10, 100)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.today = date.today()
+
+    def assertConstantQueries(self, url, create_rows):
+        counts = {}
+        created = 0
+        for size in self.SIZES:
+            create_rows(created, size)
+            created = size
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts[size] = len(queries)
+        self.assertEqual(len(set(counts.values())), 1, f'{url} query counts by row count: {counts}')
+
+    def test_expenses(self):
+        def create_rows(start, stop):
+            for i in range(start, stop):
+                category = Category.objects.create(user=self.user, name=f'Category {i}')
+                Expense.objects.create(user=self.user, description=f'Item {i}', amount=1, category_fk=category, date=self.today)
+        self.assertConstantQueries('/api/expenses/', create_rows)
+
+    def test_budgets(self):
+        def create_rows(start, stop):
+            for i in range(start, stop):
+                category = Category.objects.create(user=self.user, name=f'Category {i}')
+                budget = Budget.objects.create(user=self.user, name=f'Budget {i}', category=category, amount=100, start_date=self.today)
+                BudgetAlert.objects.bulk_create([
+                    BudgetAlert(budget=budget, percentage_reached=80, amount_spent=80, message='Near limit')
+                    for _ in range(4)
+                ])
+        self.assertConstantQueries('/api/budgets/', create_rows)
+        self.assertConstantQueries('/api/budget-alerts/', lambda start, stop: None)
+
+        budget = self.client.get('/api/budgets/').data['results'][0]
+        self.assertEqual(len(budget['recent_alerts']), 3)
+
+    def test_debts(self):
+        def create_rows(start, stop):
+            for i in range(start, stop):
+                debt = Debt.objects.create(
+                    user=self.user, name=f'Loan {i}', principal_amount=1000, interest_rate=5,
+                    term_months=12, start_date=self.today, current_balance=1000
+                )
+                DebtPayment.objects.bulk_create([
+                    DebtPayment(debt=debt, payment_date=self.today, amount=100) for _ in range(2)
+                ])
+        self.assertConstantQueries('/api/debts/', create_rows)
+
+    def test_projects(self):
+        def create_rows(start, stop):
+            for i in range(start, stop):
+                parent = None
+                # Three levels of nesting, each with a document
+                for level in range(3):
+                    parent = Project.objects.create(
+                        user=self.user, name=f'Project {i}.{level}', budget=100,
+                        start_date=self.today, parent_project=parent
+                    )
+                    document = ProjectDocument(project=parent, name='Plan', uploaded_by=self.user)
+                    document.file.save('plan.pdf', ContentFile(b'%PDF-1.4'), save=True)
+        self.assertConstantQueries('/api/projects/', create_rows)
+
+        project = self.client.get('/api/projects/').data['results'][0]
+        self.assertEqual(len(project['sub_projects'][0]['sub_projects'][0]['documents']), 1)
+
+    def test_categories(self):
+        def create_rows(start, stop):
+            for i in range(start, stop):
+                parent = Category.objects.create(user=self.user, name=f'Category {i}')
+                Category.objects.create(user=self.user, name=f'Subcategory {i}', parent_category=parent)
+        self.assertConstantQueries('/api/categories/', create_rows)
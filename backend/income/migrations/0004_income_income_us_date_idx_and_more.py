@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('income', '0003_income_income_user_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['us_account', 'date', 'created_at', 'id'], name='income_us_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['kenya_account', 'date', 'created_at', 'id'], name='income_kenya_date_idx'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from accounts.models import USAccount, KenyaAccount
 
@@ -37,6 +37,37 @@ class Income(models.Model):
     
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['user', '-date', '-created_at', '-id'], name='income_user_date_idx'),
+            models.Index(fields=['user', 'status', 'date'], name='income_user_status_idx'),
+            # Account statements
+            models.Index(fields=['us_account', 'date', 'created_at', 'id'], name='income_us_date_idx'),
+            models.Index(fields=['kenya_account', 'date', 'created_at', 'id'], name='income_kenya_date_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.source} - {self.amount} {self.currency} ({self.status})"
\ No newline at end of file
+        return f"{self.source} - {self.amount} {self.currency} ({self.status})"
+    
+    def rollup_key(self):
+        """Key fields for dashboard.MonthlyRollup"""
+        return {
+            'source': 'income',
+            'entry_type': 'income',
+            'currency': self.currency,
+            'category': '',
+        }
+    
+    def save(self, *args, **kwargs):
+        from dashboard.models import MonthlyRollup
+        
+        with transaction.atomic():
+            previous = Income.objects.filter(pk=self.pk).first() if self.pk else None
+            super().save(*args, **kwargs)
+            MonthlyRollup.record_change(previous, self)
+    
+    def delete(self, *args, **kwargs):
+        from dashboard.models import MonthlyRollup
+        
+        with transaction.atomic():
+            MonthlyRollup.record_change(self, None)
+            return super().delete(*args, **kwargs)
\ No newline at end of file
@@ -6,11 +6,23 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 from .models import Income
 from .serializers import IncomeSerializer
+from finance_tracker.export import ExportMixin
+from finance_tracker.pagination import LedgerPagination
 from transaction.models import Transaction
 
-class IncomeViewSet(viewsets.ModelViewSet):
+class IncomeViewSet(ExportMixin, viewsets.ModelViewSet):
     serializer_class = IncomeSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = LedgerPagination
+    export_fields = [
+        ('id', 'id'),
+        ('date', 'date'),
+        ('source', 'source'),
+        ('amount', 'amount'),
+        ('currency', 'currency'),
+        ('frequency', 'frequency'),
+        ('status', 'status'),
+    ]
     
     def get_queryset(self):
         return Income.objects.filter(user=self.request.user)
@@ -18,6 +30,14 @@ class IncomeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
+    def filter_export_queryset(self, queryset):
+        # Income has no category; the source plays that role
+        queryset = super().filter_export_queryset(queryset)
+        source = self.request.query_params.get('source')
+        if source:
+            queryset = queryset.filter(source__iexact=source)
+        return queryset
+    
     @action(detail=False, methods=['get'])
     def upcoming(self, request):
         """Get income that will be deposited in the next 10 days"""
@@ -0,0 +1,86 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from django.db import connections, OperationalError
+from django.db.models import Sum
+from django.utils import timezone
+from accounts.models import USAccount
+from money_transfer.models import MoneyTransfer
+
+
+def complete(transfer_id, retries=50):
+    """Complete one transfer from a worker thread; True if this call completed it"""
+    try:
+        for _ in range(retries):
+            try:
+                MoneyTransfer.objects.get(pk=transfer_id).complete_transfer()
+                return True
+            except ValueError:
+                # Completed by another worker first
+                return False
+            except OperationalError as e:
+                # SQLite reports contention as a lock error instead of waiting
+                if 'locked' not in str(e):
+                    raise
+                time.sleep(random.uniform(0.001, 0.01))
+        raise CommandError(f'Transfer {transfer_id} still locked after {retries} attempts')
+    finally:
+        connections.close_all()
+
+
+def complete_concurrently(transfer_ids, threads):
+    """Complete every transfer across threads; returns how many calls completed one"""
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return sum(pool.map(complete, transfer_ids))
+
+
+class Command(BaseCommand):
+    help = 'Measure completed transfers per second when many workers complete transfers between a few accounts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transfers', type=int, default=500, help='Transfers to complete')
+        parser.add_argument('--accounts', type=int, default=4, help='Accounts the transfers move money between (fewer means more contention)')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent workers')
+
+    def handle(self, *args, **options):
+        if min(options['transfers'], options['threads']) < 1 or options['accounts'] < 2:
+            raise CommandError('Need at least 1 transfer, 1 thread and 2 accounts')
+
+        # A throwaway user keeps the benchmark rows apart from real data
+        user = User.objects.create_user(username=f'transfer-benchmark-{int(time.time() * 1000)}')
+        try:
+            self.run(user, options)
+        finally:
+            user.delete()
+
+    def run(self, user, options):
+        accounts = [
+            USAccount.objects.create(user=user, account_name=f'Benchmark {i}', balance=Decimal('1000000.00'))
+            for i in range(options['accounts'])
+        ]
+        transfers = []
+        for _ in range(options['transfers']):
+            source, target = random.sample(accounts, 2)
+            transfers.append(MoneyTransfer(
+                user=user, from_us_account=source, to_us_account=target,
+                amount=Decimal(random.randint(1, 10000)) / 100, scheduled_date=timezone.now().date()
+            ))
+        transfer_ids = [transfer.id for transfer in MoneyTransfer.objects.bulk_create(transfers)]
+        opening = USAccount.objects.filter(user=user).aggregate(total=Sum('balance'))['total']
+
+        started = time.monotonic()
+        completed = complete_concurrently(transfer_ids, options['threads'])
+        elapsed = time.monotonic() - started
+
+        closing = USAccount.objects.filter(user=user).aggregate(total=Sum('balance'))['total']
+        rate = completed / elapsed if elapsed else completed
+        self.stdout.write(
+            f"Completed {completed}/{len(transfer_ids)} transfers over {options['accounts']} accounts "
+            f"with {options['threads']} threads in {elapsed:.2f}s ({rate:.1f} transfers/sec)"
+        )
+        if completed != len(transfer_ids) or closing != opening:
+            raise CommandError(f'Balances not conserved: {opening} before, {closing} after')
+        self.stdout.write(self.style.SUCCESS(f'Balances conserved ({closing})'))
@@ -0,0 +1,29 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from money_transfer.tasks import execute_due_transfers
+
+
+class Command(BaseCommand):
+    help = 'Complete every pending transfer scheduled on or before today (run from a scheduler; safe to run on several hosts at once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Execute transfers due on or before this date (YYYY-MM-DD) instead of today')
+        parser.add_argument('--batch-size', type=int, default=500, help='Transfers read per batch')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        started = time.monotonic()
+        completed, failed = execute_due_transfers(today=today, batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Completed {completed} scheduled transfers, {failed} failed, in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('money_transfer', '0002_alter_moneytransfer_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['user', '-scheduled_date', '-created_at', '-id'], name='transfer_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['status', 'scheduled_date'], name='transfer_status_date_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('money_transfer', '0003_moneytransfer_transfer_user_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['from_us_account', 'scheduled_date', 'created_at', 'id'], name='transfer_from_us_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['to_us_account', 'scheduled_date', 'created_at', 'id'], name='transfer_to_us_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['from_kenya_account', 'scheduled_date', 'created_at', 'id'], name='transfer_from_kenya_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['to_kenya_account', 'scheduled_date', 'created_at', 'id'], name='transfer_to_kenya_date_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('money_transfer', '0004_moneytransfer_transfer_from_us_date_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='moneytransfer',
+            name='transfer_from_us_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='moneytransfer',
+            name='transfer_to_us_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='moneytransfer',
+            name='transfer_from_kenya_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='moneytransfer',
+            name='transfer_to_kenya_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['from_us_account', 'completed_at', 'id'], name='transfer_from_us_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['to_us_account', 'completed_at', 'id'], name='transfer_to_us_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['from_kenya_account', 'completed_at', 'id'], name='transfer_from_kenya_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moneytransfer',
+            index=models.Index(fields=['to_kenya_account', 'completed_at', 'id'], name='transfer_to_kenya_done_idx'),
+        ),
+    ]
@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction, DatabaseError
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.utils import timezone
-from accounts.models import USAccount, KenyaAccount
+from accounts.models import USAccount, KenyaAccount, AccountBalanceSnapshot
 from decimal import Decimal
 
 class MoneyTransfer(models.Model):
@@ -43,47 +44,86 @@ class MoneyTransfer(models.Model):
     
     class Meta:
         ordering = ['-scheduled_date', '-created_at']
+        indexes = [
+            models.Index(fields=['user', '-scheduled_date', '-created_at', '-id'], name='transfer_user_date_idx'),
+            models.Index(fields=['status', 'scheduled_date'], name='transfer_status_date_idx'),
+            # Account statements, which date transfers by completion
+            models.Index(fields=['from_us_account', 'completed_at', 'id'], name='transfer_from_us_done_idx'),
+            models.Index(fields=['to_us_account', 'completed_at', 'id'], name='transfer_to_us_done_idx'),
+            models.Index(fields=['from_kenya_account', 'completed_at', 'id'], name='transfer_from_kenya_done_idx'),
+            models.Index(fields=['to_kenya_account', 'completed_at', 'id'], name='transfer_to_kenya_done_idx'),
+        ]
+    
+    def balance_changes(self):
+        """{(account model, account id): amount} this transfer adds to each balance"""
+        changes = {}
+        if self.from_us_account_id:
+            changes[(USAccount, self.from_us_account_id)] = -self.amount
+        elif self.from_kenya_account_id:
+            changes[(KenyaAccount, self.from_kenya_account_id)] = -self.amount
+        
+        # Add to destination account (considering exchange rate)
+        net_amount = self.amount - self.fee
+        if self.to_us_account_id:
+            key = (USAccount, self.to_us_account_id)
+            converted_amount = net_amount / self.exchange_rate if self.from_kenya_account_id else net_amount
+        elif self.to_kenya_account_id:
+            key = (KenyaAccount, self.to_kenya_account_id)
+            converted_amount = net_amount * self.exchange_rate if self.from_us_account_id else net_amount
+        else:
+            return changes
+        changes[key] = changes.get(key, 0) + converted_amount
+        return changes
+    
+    @staticmethod
+    def apply_balance_changes(changes):
+        """
+        Add each amount to its account balance with an F() update, so no
+        balance is read into Python and overwritten. Rows are updated in
+        (model, id) order so concurrent callers lock them in the same
+        sequence and cannot deadlock. Call inside transaction.atomic().
+        """
+        now = timezone.now()
+        for (model, account_id), amount in sorted(changes.items(), key=lambda item: (item[0][0].__name__, item[0][1])):
+            model.objects.filter(pk=account_id).update(
+                **{model.balance_field: F(model.balance_field) + amount},
+                updated_at=now
+            )
+        AccountBalanceSnapshot.record_accounts(
+            us_account_ids=[account_id for model, account_id in changes if model is USAccount],
+            kenya_account_ids=[account_id for model, account_id in changes if model is KenyaAccount],
+        )
     
     def complete_transfer(self):
         """Execute the transfer and update account balances"""
         if self.status != 'pending':
             raise ValueError("Only pending transfers can be completed")
         
+        now = timezone.now()
         try:
-            # Deduct from source account
-            if self.from_us_account:
-                self.from_us_account.balance -= self.amount
-                self.from_us_account.save()
-            elif self.from_kenya_account:
-                self.from_kenya_account.balance_kes -= self.amount
-                self.from_kenya_account.save()
-            
-            # Add to destination account (considering exchange rate)
-            net_amount = self.amount - self.fee
-            
-            if self.to_us_account:
-                if self.from_kenya_account:  # KES to USD
-                    converted_amount = net_amount / self.exchange_rate
-                else:  # USD to USD
-                    converted_amount = net_amount
-                self.to_us_account.balance += converted_amount
-                self.to_us_account.save()
-            elif self.to_kenya_account:
-                if self.from_us_account:  # USD to KES
-                    converted_amount = net_amount * self.exchange_rate
-                else:  # KES to KES
-                    converted_amount = net_amount
-                self.to_kenya_account.balance_kes += converted_amount
-                self.to_kenya_account.save()
-            
-            self.status = 'completed'
-            self.completed_at = timezone.now()
-            self.save()
-            
-        except Exception as e:
+            with transaction.atomic():
+                # Claim the transfer first: a concurrent completion of the
+                # same transfer finds it no longer pending and gives up
+                claimed = MoneyTransfer.objects.filter(pk=self.pk, status='pending').update(
+                    status='completed', completed_at=now, updated_at=now
+                )
+                if not claimed:
+                    raise ValueError("Only pending transfers can be completed")
+                self.apply_balance_changes(self.balance_changes())
+        except (ValueError, DatabaseError):
+            # Not completed, or rolled back and still pending
+            raise
+        except Exception:
+            MoneyTransfer.objects.filter(pk=self.pk, status='pending').update(status='failed', updated_at=timezone.now())
             self.status = 'failed'
-            self.save()
-            raise e
+            raise
+        
+        self.status = 'completed'
+        self.completed_at = now
+        # Accounts already loaded on this instance would hold stale balances
+        for name in ('from_us_account', 'from_kenya_account', 'to_us_account', 'to_kenya_account'):
+            if self._meta.get_field(name).is_cached(self) and getattr(self, name) is not None:
+                getattr(self, name).refresh_from_db()
     
     def __str__(self):
         from_acc = self.from_us_account or self.from_kenya_account
@@ -0,0 +1,85 @@
+import logging
+from collections import defaultdict
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import MoneyTransfer
+
+logger = logging.getLogger('finance_tracker')
+
+
+def execute_transfer_group(transfer_ids, now):
+    """
+    Complete one source account's due transfers in a single transaction:
+    claim the ones still pending, add up their balance changes and apply
+    them with one F() update per account. Transfers whose amounts cannot
+    be converted, or that have lost their source account, are marked
+    failed. Returns (completed, failed).
+    """
+    with transaction.atomic():
+        pending = MoneyTransfer.objects.filter(id__in=transfer_ids, status='pending')
+        if connection.features.has_select_for_update_skip_locked:
+            # Leave rows another runner is working on to that runner
+            pending = pending.select_for_update(skip_locked=True)
+        candidate_ids = list(pending.values_list('id', flat=True))
+
+        # The conditional update is the claim: rows another runner completed
+        # in the meantime are no longer pending, and the ones this run
+        # claimed are the ones stamped with its timestamp
+        MoneyTransfer.objects.filter(id__in=candidate_ids, status='pending').update(
+            status='completed', completed_at=now, updated_at=now
+        )
+        claimed = list(MoneyTransfer.objects.filter(id__in=candidate_ids, status='completed', completed_at=now).only(
+            'id', 'amount', 'fee', 'exchange_rate',
+            'from_us_account', 'from_kenya_account', 'to_us_account', 'to_kenya_account',
+        ))
+
+        changes = defaultdict(int)
+        failed_ids = []
+        for transfer in claimed:
+            try:
+                if not (transfer.from_us_account_id or transfer.from_kenya_account_id):
+                    raise ValueError('Transfer has no source account')
+                transfer_changes = transfer.balance_changes()
+            except (ValueError, ArithmeticError) as e:
+                logger.warning(f"Scheduled transfer {transfer.id} failed: {e}")
+                failed_ids.append(transfer.id)
+                continue
+            for key, amount in transfer_changes.items():
+                changes[key] += amount
+
+        if failed_ids:
+            MoneyTransfer.objects.filter(id__in=failed_ids).update(status='failed', completed_at=None, updated_at=now)
+        MoneyTransfer.apply_balance_changes(changes)
+    return len(claimed) - len(failed_ids), len(failed_ids)
+
+
+def execute_due_transfers(today=None, batch_size=500):
+    """
+    Complete every pending transfer scheduled on or before today, a batch
+    at a time, one transaction per source account. Safe to run from
+    several processes at once. Returns (completed, failed).
+    """
+    today = today or timezone.now().date()
+    completed = failed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            MoneyTransfer.objects.filter(
+                status='pending', scheduled_date__lte=today, id__gt=last_id
+            ).order_by('id').values_list('id', 'from_us_account_id', 'from_kenya_account_id')[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+
+        groups = defaultdict(list)
+        for transfer_id, from_us_account_id, from_kenya_account_id in batch:
+            key = ('us', from_us_account_id) if from_us_account_id else ('kenya', from_kenya_account_id)
+            groups[key].append(transfer_id)
+
+        now = timezone.now()
+        for transfer_ids in groups.values():
+            done, errors = execute_transfer_group(transfer_ids, now)
+            completed += done
+            failed += errors
+    return completed, failed
@@ -1,3 +1,158 @@
-from django.test import TestCase
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, connections, OperationalError
+from django.core.management import call_command
+from django.contrib.auth.models import User
+from django.utils import timezone
+from accounts.models import USAccount, KenyaAccount
+from .models import MoneyTransfer
+from .tasks import execute_due_transfers
+from .management.commands.benchmark_transfers import complete_concurrently
 
-# Create your tests here.
+
+class CompleteTransferTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.checking = USAccount.objects.create(user=self.user, account_name='Checking', balance=1000)
+        self.mpesa = KenyaAccount.objects.create(user=self.user, account_name='M-Pesa', balance_kes=0)
+        self.today = timezone.now().date()
+
+    def test_completes_with_conversion(self):
+        transfer = MoneyTransfer.objects.create(
+            user=self.user, from_us_account=self.checking, to_kenya_account=self.mpesa,
+            amount=100, fee=2, exchange_rate=130, scheduled_date=self.today
+        )
+        transfer.complete_transfer()
+        self.assertEqual(transfer.from_us_account.balance, 900)
+        self.assertEqual(KenyaAccount.objects.get(pk=self.mpesa.pk).balance_kes, 12740)
+        self.assertEqual(MoneyTransfer.objects.get(pk=transfer.pk).status, 'completed')
+
+        # A stale copy of the same transfer cannot complete it again
+        stale = MoneyTransfer.objects.get(pk=transfer.pk)
+        stale.status = 'pending'
+        with self.assertRaises(ValueError):
+            stale.complete_transfer()
+        self.assertEqual(USAccount.objects.get(pk=self.checking.pk).balance, 900)
+
+    def test_failure_rolls_back(self):
+        transfer = MoneyTransfer.objects.create(
+            user=self.user, from_kenya_account=self.mpesa, to_us_account=self.checking,
+            amount=100, exchange_rate=0, scheduled_date=self.today
+        )
+        with self.assertRaises(ArithmeticError):
+            transfer.complete_transfer()
+        self.assertEqual(MoneyTransfer.objects.get(pk=transfer.pk).status, 'failed')
+        self.assertEqual(KenyaAccount.objects.get(pk=self.mpesa.pk).balance_kes, 0)
+        self.assertEqual(USAccount.objects.get(pk=self.checking.pk).balance, 1000)
+
+
+class ConcurrentTransferTestCase(TransactionTestCase):
+    def test_concurrent_completions_conserve_balances(self):
+        user = User.objects.create_user(username='testuser', password='testpass')
+        accounts = [USAccount.objects.create(user=user, account_name=f'Account {i}', balance=1000) for i in range(3)]
+        expected = {account.id: Decimal('1000') for account in accounts}
+        transfer_ids = []
+        for i in range(30):
+            source, target = accounts[i % 3], accounts[(i + 1) % 3] if i % 2 else accounts[(i + 2) % 3]
+            amount = Decimal(i + 1)
+            transfer = MoneyTransfer.objects.create(
+                user=user, from_us_account=source, to_us_account=target,
+                amount=amount, scheduled_date=timezone.now().date()
+            )
+            transfer_ids.append(transfer.id)
+            expected[source.id] -= amount
+            expected[target.id] += amount
+
+        # Every transfer is submitted twice; each completes exactly once
+        completed = complete_concurrently(transfer_ids * 2, threads=8)
+        self.assertEqual(completed, 30)
+        self.assertEqual(dict(USAccount.objects.values_list('id', 'balance')), expected)
+        self.assertEqual(MoneyTransfer.objects.filter(status='completed').count(), 30)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_transfers', '--transfers', '20', '--threads', '4', stdout=out)
+        self.assertIn('transfers/sec', out.getvalue())
+        self.assertIn('Balances conserved', out.getvalue())
+        self.assertFalse(User.objects.exists())
+
+
+class ScheduledTransferTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.checking = USAccount.objects.create(user=self.user, account_name='Checking', balance=1000)
+        self.savings = USAccount.objects.create(user=self.user, account_name='Savings', balance=0)
+        self.mpesa = KenyaAccount.objects.create(user=self.user, account_name='M-Pesa', balance_kes=1000)
+        self.today = timezone.now().date()
+
+    def transfer(self, days_ago=0, **kwargs):
+        return MoneyTransfer.objects.create(user=self.user, scheduled_date=self.today - timedelta(days=days_ago), **kwargs)
+
+    def test_executes_due_transfers_in_bulk(self):
+        for days_ago in range(5):
+            self.transfer(days_ago, from_us_account=self.checking, to_us_account=self.savings, amount=10)
+        self.transfer(1, from_us_account=self.checking, to_kenya_account=self.mpesa, amount=10, exchange_rate=130)
+        self.transfer(0, from_kenya_account=self.mpesa, to_us_account=self.savings, amount=130, exchange_rate=130)
+        broken = self.transfer(0, from_kenya_account=self.mpesa, to_us_account=self.checking, amount=50, exchange_rate=0)
+        future = self.transfer(-1, from_us_account=self.checking, to_us_account=self.savings, amount=10)
+        done = self.transfer(2, from_us_account=self.checking, to_us_account=self.savings, amount=10, status='completed')
+
+        with CaptureQueriesContext(connection) as queries:
+            out = StringIO()
+            call_command('execute_scheduled_transfers', stdout=out)
+        self.assertIn('Completed 7 scheduled transfers, 1 failed', out.getvalue())
+
+        self.assertEqual(USAccount.objects.get(pk=self.checking.pk).balance, 940)
+        self.assertEqual(USAccount.objects.get(pk=self.savings.pk).balance, 51)
+        self.assertEqual(KenyaAccount.objects.get(pk=self.mpesa.pk).balance_kes, 2170)
+        self.assertEqual(MoneyTransfer.objects.get(pk=broken.pk).status, 'failed')
+        self.assertEqual(MoneyTransfer.objects.get(pk=future.pk).status, 'pending')
+        self.assertEqual(MoneyTransfer.objects.get(pk=done.pk).completed_at, None)
+
+        # One aggregated update per account touched by each source account's group
+        account_updates = [query for query in queries.captured_queries if query['sql'].startswith('UPDATE "accounts_')]
+        self.assertEqual(len(account_updates), 5)
+
+        self.assertEqual(execute_due_transfers(), (0, 0))
+
+
+class ConcurrentScheduledTransferTestCase(TransactionTestCase):
+    def run_executor(self):
+        try:
+            for _ in range(50):
+                try:
+                    return execute_due_transfers(batch_size=7)
+                except OperationalError as e:
+                    # SQLite reports contention as a lock error instead of waiting
+                    if 'locked' not in str(e):
+                        raise
+                    time.sleep(0.005)
+            self.fail('Database still locked after 50 attempts')
+        finally:
+            connections.close_all()
+
+    def test_runners_on_several_hosts_apply_each_transfer_once(self):
+        user = User.objects.create_user(username='testuser', password='testpass')
+        accounts = [USAccount.objects.create(user=user, account_name=f'Account {i}', balance=1000) for i in range(4)]
+        for i in range(40):
+            MoneyTransfer.objects.create(
+                user=user, from_us_account=accounts[i % 4], to_us_account=accounts[(i + 1) % 4],
+                amount=i + 1, scheduled_date=timezone.now().date()
+            )
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda _: self.run_executor(), range(4)))
+
+        self.assertEqual(MoneyTransfer.objects.filter(status='completed').count(), 40)
+        balances = dict(USAccount.objects.values_list('id', 'balance'))
+        self.assertEqual(sum(balances.values()), 4000)
+        expected = {account.id: Decimal('1000') for account in accounts}
+        for i in range(40):
+            expected[accounts[i % 4].id] -= i + 1
+            expected[accounts[(i + 1) % 4].id] += i + 1
+        self.assertEqual(balances, expected)
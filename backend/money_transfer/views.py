@@ -7,10 +7,13 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import MoneyTransfer
 from .serializers import MoneyTransferSerializer
+from finance_tracker.pagination import LedgerPagination
 
 class MoneyTransferViewSet(viewsets.ModelViewSet):
     serializer_class = MoneyTransferSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = LedgerPagination
+    cursor_ordering = ('-scheduled_date', '-created_at', '-id')
     
     def get_queryset(self):
         return MoneyTransfer.objects.filter(user=self.request.user)
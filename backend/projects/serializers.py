@@ -26,8 +26,12 @@ class ProjectSerializer(serializers.ModelSerializer):
                   'end_date', 'parent_project', 'sub_projects', 'documents', 'progress']
     
     def get_sub_projects(self, obj):
-        sub_projects = obj.sub_projects.all()
-        return ProjectSerializer(sub_projects, many=True).data
+        children = self.context.get('project_children')
+        if children is not None:
+            sub_projects = children.get(obj.id, [])
+        else:
+            sub_projects = obj.sub_projects.all()
+        return ProjectSerializer(sub_projects, many=True, context=self.context).data
     
     def get_progress(self, obj):
         # Calculate progress based on date or task completion
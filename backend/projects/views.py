@@ -3,17 +3,34 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
+from collections import defaultdict
+from finance_tracker.eager_loading import EagerLoadingMixin
 from .models import Project, ProjectDocument
 from .serializers import ProjectSerializer, ProjectDocumentSerializer
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = ProjectSerializer
     parser_classes = (MultiPartParser, FormParser)
+    prefetch_related = ['documents']
     
     def get_queryset(self):
         return Project.objects.filter(user=self.request.user, parent_project__isnull=True)
     
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ('list', 'retrieve'):
+            # Every level of sub_projects comes from one query (plus one for
+            # their documents) instead of one per node
+            children = defaultdict(list)
+            sub_projects = Project.objects.filter(
+                user=self.request.user, parent_project__isnull=False
+            ).prefetch_related('documents')
+            for project in sub_projects:
+                children[project.parent_project_id].append(project)
+            context['project_children'] = children
+        return context
+    
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transaction', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='transaction',
+            options={'ordering': ['-date', '-created_at']},
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from accounts.models import USAccount, KenyaAccount
 
@@ -29,5 +29,39 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['user', '-date', '-created_at', '-id'], name='transaction_user_date_idx'),
+            models.Index(fields=['user', 'transaction_type', 'currency'], name='transaction_user_type_idx'),
+            # Account statements
+            models.Index(fields=['us_account', 'date', 'created_at', 'id'], name='transaction_us_date_idx'),
+            models.Index(fields=['kenya_account', 'date', 'created_at', 'id'], name='transaction_kenya_date_idx'),
+        ]
+    
     def __str__(self):
-        return f"{self.transaction_type} - {self.amount} {self.currency} - {self.date}"
\ No newline at end of file
+        return f"{self.transaction_type} - {self.amount} {self.currency} - {self.date}"
+    
+    def rollup_key(self):
+        """Key fields for dashboard.MonthlyRollup"""
+        return {
+            'source': 'transaction',
+            'entry_type': self.transaction_type,
+            'currency': self.currency,
+            'category': '',
+        }
+    
+    def save(self, *args, **kwargs):
+        from dashboard.models import MonthlyRollup
+        
+        with transaction.atomic():
+            previous = Transaction.objects.filter(pk=self.pk).first() if self.pk else None
+            super().save(*args, **kwargs)
+            MonthlyRollup.record_change(previous, self)
+    
+    def delete(self, *args, **kwargs):
+        from dashboard.models import MonthlyRollup
+        
+        with transaction.atomic():
+            MonthlyRollup.record_change(self, None)
+            return super().delete(*args, **kwargs)
\ No newline at end of file
@@ -1,9 +1,15 @@
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 from django.test import TestCase
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
 from .models import Transaction
 from accounts.models import USAccount
+from dashboard.models import ExchangeRate
+from finance_tracker.pagination import KeysetPagination, encode_cursor
 
 class TransactionTestCase(TestCase):
     def setUp(self):
@@ -72,4 +78,180 @@ class TransactionTestCase(TestCase):
         # Test that unauthenticated users can't access the API
         self.client.force_authenticate(user=None)
         response = self.client.get('/api/transactions/')
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class CursorPaginationTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for i in range(7):
+            Transaction.objects.create(
+                user=self.user,
+                transaction_type='expense',
+                amount=10 + i,
+                currency='USD',
+                date='2024-01-15' if i < 4 else '2024-01-10',
+                description=f'Transaction {i}'
+            )
+
+    def fetch_all(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    @mock.patch.object(KeysetPagination, 'page_size', 3)
+    def test_walks_every_row_once_in_order(self):
+        expected = list(Transaction.objects.filter(user=self.user).order_by('-date', '-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(self.fetch_all('/api/transactions/?pagination=cursor'), expected)
+
+    @mock.patch.object(KeysetPagination, 'page_size', 3)
+    def test_cursor_is_stable_when_rows_are_inserted(self):
+        first = self.client.get('/api/transactions/?pagination=cursor')
+        seen = [row['id'] for row in first.data['results']]
+
+        # A newer row must not shift the following pages
+        Transaction.objects.create(
+            user=self.user, transaction_type='income', amount=5,
+            currency='USD', date='2024-02-01', description='New'
+        )
+        seen += self.fetch_all(first.data['next'])
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    @mock.patch.object(KeysetPagination, 'page_size', 3)
+    def test_previous_link(self):
+        first = self.client.get('/api/transactions/?pagination=cursor')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [row['id'] for row in back.data['results']],
+            [row['id'] for row in first.data['results']]
+        )
+
+    def test_page_number_remains_default(self):
+        response = self.client.get('/api/transactions/')
+        self.assertEqual(response.data['count'], 7)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/transactions/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor(self):
+        tampered = [
+            {'v': 'not-a-list'},
+            {'v': ['2024-01-15', '2024-01-15T00:00:00Z']},
+            {'v': [None, None, None]},
+            {'v': [{}, '2024-01-15T00:00:00Z', 1]},
+            {'v': ['2024-01-15', 'yesterday', 1]},
+            {'v': ['2024-01-15', '2024-01-15T00:00:00Z', 'one']},
+            {'v': ['2024-01-15', '2024-01-15T00:00:00Z', [1]], 'r': True},
+            ['2024-01-15', '2024-01-15T00:00:00Z', 1],
+        ]
+        for payload in tampered:
+            response = self.client.get(f'/api/transactions/?cursor={encode_cursor(payload)}')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, payload)
+
+
+class TransactionExportTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_jsonl_export(self):
+        Transaction.objects.create(user=self.user, transaction_type='income', amount=100, date='2024-01-05', description='Pay')
+        Transaction.objects.create(user=self.user, transaction_type='expense', amount=40, date='2024-01-06', description='Rent')
+
+        response = self.client.get('/api/transactions/export/?export_format=jsonl&transaction_type=expense')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['description'], 'Rent')
+        self.assertEqual(rows[0]['amount'], '40.00')
+
+        response = self.client.get('/api/transactions/export/?export_format=xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TransactionSummaryTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for transaction_type, amount, currency, day in [
+            ('income', 1000, 'USD', date(2024, 3, 1)),
+            ('expense', 200, 'USD', date(2024, 3, 4)),
+            ('income', 50000, 'KES', date(2024, 3, 4)),
+            ('expense', 10000, 'KES', date(2024, 4, 2)),
+            ('transfer', 100, 'USD', date(2024, 4, 2)),
+        ]:
+            Transaction.objects.create(
+                user=self.user, transaction_type=transaction_type, amount=amount,
+                currency=currency, date=day, description=transaction_type
+            )
+
+    def test_totals_split_by_currency(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/transactions/summary/')
+        totals = response.data['totals']
+        self.assertEqual(totals['USD']['income'], 1000)
+        self.assertEqual(totals['USD']['net'], 800)
+        self.assertEqual(totals['USD']['transfer'], 100)
+        self.assertEqual(totals['KES']['net'], 40000)
+        self.assertEqual(totals['KES']['count'], 2)
+
+        # The original flat keys stay, summed over currencies
+        self.assertEqual(
+            [response.data[key] for key in ('total_income', 'total_expenses', 'total_transfers', 'net_amount')],
+            [51000, 10200, 100, 40800]
+        )
+
+    def test_date_range_and_buckets(self):
+        response = self.client.get('/api/transactions/summary/?start=2024-03-02&end=2024-04-30&group_by=month')
+        self.assertEqual(response.data['totals']['USD']['income'], 0)
+        self.assertEqual(
+            [(period['period'], set(period['totals'])) for period in response.data['periods']],
+            [(date(2024, 3, 1), {'USD', 'KES'}), (date(2024, 4, 1), {'USD', 'KES'})]
+        )
+
+        response = self.client.get('/api/transactions/summary/?group_by=week')
+        self.assertEqual([period['period'] for period in response.data['periods']], [date(2024, 2, 26), date(2024, 3, 4), date(2024, 4, 1)])
+
+        # Rollup-backed monthly buckets match the raw table
+        from_rollup = self.client.get('/api/transactions/summary/?group_by=month').data['periods']
+        from_rows = self.client.get('/api/transactions/summary/?start=2024-01-01&group_by=month').data['periods']
+        self.assertEqual(from_rollup, from_rows)
+
+        self.assertEqual(self.client.get('/api/transactions/summary/?group_by=year').status_code, status.HTTP_400_BAD_REQUEST)
+        for query in ('start=yesterday', 'end=2024-13-45'):
+            response = self.client.get(f'/api/transactions/summary/?{query}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_converted_total(self):
+        response = self.client.get('/api/transactions/summary/?base_currency=USD')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        ExchangeRate.objects.create(base_currency='USD', quote_currency='KES', rate=100, date=date(2024, 1, 1))
+        ExchangeRate.objects.create(base_currency='USD', quote_currency='KES', rate=125, date=date(2024, 3, 1))
+        response = self.client.get('/api/transactions/summary/?base_currency=usd&end=2024-12-31')
+        self.assertEqual(response.data['base_currency'], 'USD')
+        self.assertEqual(response.data['converted_totals']['net'], Decimal('1120.00'))
+
+        # Inverse of the stored pair, as of the end date
+        response = self.client.get('/api/transactions/summary/?base_currency=KES&end=2024-03-31')
+        self.assertEqual(response.data['converted_totals']['income'], Decimal('175000.00'))
+
+    def test_missing_rate_lookup_is_bounded(self):
+        ExchangeRate.objects.bulk_create([
+            ExchangeRate(base_currency='USD', quote_currency='KES', rate=100 + i % 30, date=date(2020, 1, 1) + timedelta(days=i))
+            for i in range(500)
+        ])
+        with self.assertNumQueries(2):
+            rates = ExchangeRate.rates_to(['USD', 'KES', 'EUR'], 'USD', date(2024, 1, 1))
+        self.assertEqual(set(rates), {'USD', 'KES'})
@@ -5,13 +5,32 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum
+from rest_framework.exceptions import ValidationError
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import date
+from decimal import Decimal
+from dashboard.models import MonthlyRollup, ExchangeRate
 from .models import Transaction
 from .serializers import TransactionSerializer
+from finance_tracker.export import ExportMixin
+from finance_tracker.pagination import LedgerPagination
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ExportMixin, viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = LedgerPagination
+    SUMMARY_BUCKETS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+    export_fields = [
+        ('id', 'id'),
+        ('date', 'date'),
+        ('transaction_type', 'transaction_type'),
+        ('description', 'description'),
+        ('amount', 'amount'),
+        ('currency', 'currency'),
+    ]
     
     def get_queryset(self):
         return Transaction.objects.filter(user=self.request.user)
@@ -19,18 +38,106 @@ class TransactionViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
+    def filter_export_queryset(self, queryset):
+        queryset = super().filter_export_queryset(queryset)
+        transaction_type = self.request.query_params.get('transaction_type')
+        if transaction_type:
+            queryset = queryset.filter(transaction_type=transaction_type)
+        return queryset
+    
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        """Get transaction summary statistics"""
-        transactions = self.get_queryset()
+        """
+        Totals per transaction type and currency, in one grouped query.
+
+        Query params: start, end (YYYY-MM-DD), group_by=day|week|month for
+        per-period buckets, and base_currency to add totals converted with
+        the stored exchange rates as of end (or today). The flat
+        total_income, total_expenses, total_transfers and net_amount keys
+        of the original summary are kept, summed over all currencies as
+        before; per-currency totals are under totals.
+        """
+        dates = {}
+        for param in ('start', 'end'):
+            value = request.query_params.get(param)
+            try:
+                dates[param] = parse_date(value) if value else None
+            except ValueError:
+                dates[param] = None
+            if value and dates[param] is None:
+                return Response({param: 'Use the YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+        start, end = dates['start'], dates['end']
+        group_by = request.query_params.get('group_by')
+        if group_by and group_by not in self.SUMMARY_BUCKETS:
+            raise ValidationError({'group_by': f"Choose one of: {', '.join(self.SUMMARY_BUCKETS)}"})
+        base_currency = request.query_params.get('base_currency', '').upper()
+        
+        totals = {}
+        buckets = {}
+        for period, transaction_type, currency, amount, count in self.summary_rows(start, end, group_by):
+            targets = [totals]
+            if group_by:
+                targets.append(buckets.setdefault(period, {}))
+            for by_currency in targets:
+                entry = by_currency.setdefault(currency, {'income': Decimal('0'), 'expense': Decimal('0'), 'transfer': Decimal('0'), 'count': 0})
+                entry[transaction_type] += amount
+                entry['count'] += count
+        for by_currency in [totals] + list(buckets.values()):
+            for entry in by_currency.values():
+                entry['net'] = entry['income'] - entry['expense']
         
         summary = {
-            'total_income': transactions.filter(transaction_type='income').aggregate(Sum('amount'))['amount__sum'] or 0,
-            'total_expenses': transactions.filter(transaction_type='expense').aggregate(Sum('amount'))['amount__sum'] or 0,
-            'total_transfers': transactions.filter(transaction_type='transfer').aggregate(Sum('amount'))['amount__sum'] or 0,
-            'net_amount': 0
+            'total_income': sum((entry['income'] for entry in totals.values()), Decimal('0')),
+            'total_expenses': sum((entry['expense'] for entry in totals.values()), Decimal('0')),
+            'total_transfers': sum((entry['transfer'] for entry in totals.values()), Decimal('0')),
+            'net_amount': sum((entry['net'] for entry in totals.values()), Decimal('0')),
+            'start': start,
+            'end': end,
+            'totals': totals,
         }
+        if group_by:
+            summary['group_by'] = group_by
+            summary['periods'] = [{'period': period, 'totals': buckets[period]} for period in sorted(buckets)]
         
-        summary['net_amount'] = summary['total_income'] - summary['total_expenses']
+        if base_currency:
+            as_of = end or timezone.now().date()
+            rates = ExchangeRate.rates_to(totals, base_currency, as_of)
+            missing = sorted(set(totals) - set(rates))
+            if missing:
+                raise ValidationError({'base_currency': f"No exchange rate to {base_currency} on or before {as_of} for: {', '.join(missing)}"})
+            summary['base_currency'] = base_currency
+            summary['rates'] = rates
+            summary['converted_totals'] = {
+                key: (sum((entry[key] * rates[currency] for currency, entry in totals.items()), Decimal('0'))).quantize(Decimal('0.01'))
+                for key in ('income', 'expense', 'transfer', 'net')
+            }
+        
+        return Response(summary)
+    
+    def summary_rows(self, start, end, group_by):
+        """(period, transaction_type, currency, total, count) per group"""
+        if start is None and end is None and group_by in (None, 'month'):
+            # Unfiltered totals come from the monthly rollup instead of
+            # scanning every transaction
+            fields = ['entry_type', 'currency'] + (['year', 'month'] if group_by else [])
+            rows = MonthlyRollup.objects.filter(
+                user=self.request.user,
+                source='transaction'
+            ).values(*fields).annotate(amount=Sum('total'), rows=Sum('count')).order_by()
+            for row in rows:
+                period = date(row['year'], row['month'], 1) if group_by else None
+                yield period, row['entry_type'], row['currency'], Decimal(row['amount']).quantize(Decimal('0.01')), row['rows']
+            return
         
-        return Response(summary)
\ No newline at end of file
+        queryset = self.get_queryset()
+        if start:
+            queryset = queryset.filter(date__gte=start)
+        if end:
+            queryset = queryset.filter(date__lte=end)
+        fields = ['transaction_type', 'currency']
+        if group_by:
+            queryset = queryset.annotate(period=self.SUMMARY_BUCKETS[group_by]('date'))
+            fields.append('period')
+        rows = queryset.values(*fields).annotate(amount=Sum('amount'), rows=Count('id')).order_by()
+        for row in rows:
+            yield row.get('period'), row['transaction_type'], row['currency'], Decimal(row['amount']).quantize(Decimal('0.01')), row['rows']
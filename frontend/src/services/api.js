@@ -92,6 +92,7 @@ export const authAPI = {
 // Dashboard API
 export const dashboardAPI = {
   getDashboard: () => api.get('/dashboard/'),
+  getLedger: (params) => api.get('/ledger/', { params }),
 };
 
 // Income API